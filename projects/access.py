@@ -0,0 +1,151 @@
+# projects/access.py
+"""
+Who may see and change what, decided from one map per user of
+{organization id: role}.
+
+- Any member of an organization sees it, its projects and their
+  requirements; everything else does not exist for them (404).
+- Admins and members change a project's requirements, categories,
+  objectives and links; viewers only look (403).
+- A project is deleted by its creator or an organization admin, a
+  requirement also by its own creator.
+
+The map is read in one query and kept on the user object, which lives as
+long as the request. When the cache backend is shared by every worker it is
+also cached across requests, and dropped once a change to the user's
+memberships commits; a per-process cache is not used, since other workers
+would keep a revoked membership.
+"""
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+
+from requirements import caching
+from requirements.models import Requirement
+
+from .models import Organization, OrganizationMember, Project
+
+CHANGE_ROLES = ('admin', 'member')
+CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id):
+    return f'projects:access:{user_id}'
+
+
+def roles(user):
+    """{organization id: role} of the user's memberships"""
+    if not user.is_authenticated:
+        return {}
+    found = getattr(user, '_organization_roles', None)
+    if found is None:
+        shared = caching.is_shared()
+        found = cache.get(_cache_key(user.pk)) if shared else None
+        if found is None:
+            found = dict(OrganizationMember.objects.filter(user=user).values_list('organization_id', 'role'))
+            if shared:
+                cache.set(_cache_key(user.pk), found, CACHE_TIMEOUT)
+        user._organization_roles = found
+    return found
+
+
+def organizations(user, roles_in=None):
+    """The organizations the user belongs to, optionally only with one of `roles_in`"""
+    return Organization.objects.filter(pk__in=_organization_ids(user, roles_in))
+
+
+def projects(user, queryset=None, roles_in=None):
+    """`queryset` (all projects by default) narrowed to the user's organizations"""
+    queryset = Project.objects.all() if queryset is None else queryset
+    return queryset.filter(organization_id__in=_organization_ids(user, roles_in))
+
+
+def requirements(user, queryset):
+    """`queryset` of requirements narrowed to the user's organizations"""
+    return queryset.filter(project__organization_id__in=_organization_ids(user))
+
+
+def _organization_ids(user, roles_in=None):
+    return sorted(
+        organization_id for organization_id, role in roles(user).items()
+        if roles_in is None or role in roles_in
+    )
+
+
+def can_change(user, project):
+    return roles(user).get(project.organization_id) in CHANGE_ROLES
+
+
+def can_delete_project(user, project):
+    return project.created_by_id == user.pk or roles(user).get(project.organization_id) == 'admin'
+
+
+def can_delete_requirement(user, requirement):
+    return requirement.created_by_id == user.pk or can_delete_project(user, requirement.project)
+
+
+def memberships_changed(sender, instance, **kwargs):
+    """post_save and post_delete receiver for OrganizationMember"""
+    key = _cache_key(instance.user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class ProjectAccessMixin:
+    """
+    For views of one project, named by the `project_url_kwarg` URL argument:
+    loads it once per request as `self.project` (also the view's object), or
+    answers 404 when the user may not see it and 403 when `change` is set and
+    they may not change it
+    """
+    project_url_kwarg = 'project_id'
+    change = False
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.project = get_object_or_404(
+                projects(request.user, Project.objects.select_related('organization')),
+                pk=self.kwargs[self.project_url_kwarg],
+            )
+            if self.change and not can_change(request.user, self.project):
+                raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_object(self, queryset=None):
+        return self.project
+
+
+class RequirementAccessMixin:
+    """
+    For views of one requirement (the `pk` URL argument), loaded once per
+    request with what its pages show by `get_requirement()`, which also sets
+    `self.project`: 404 when the user may not see it, 403 when `change` is
+    set and they may not change it
+    """
+    change = False
+    requirement = None
+
+    def get_queryset(self):
+        return requirements(self.request.user, Requirement.objects.select_related(
+            'project', 'project__organization', 'category', 'parent', 'created_by', 'updated_by'
+        ))
+
+    def get_requirement(self):
+        if self.requirement is None:
+            requirement = get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+            if self.change and not can_change(self.request.user, requirement.project):
+                raise PermissionDenied
+            self.requirement = requirement
+            self.project = requirement.project
+        return self.requirement
+
+    def get_object(self, queryset=None):
+        return self.get_requirement()
+
+
+class OrganizationMemberRequiredMixin(UserPassesTestMixin):
+    """For views of one organization (the `pk` URL argument), open to its members"""
+
+    def test_func(self):
+        return self.kwargs['pk'] in roles(self.request.user)
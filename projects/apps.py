@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
+
+    def ready(self):
+        from . import access
+        from .models import OrganizationMember
+        post_save.connect(access.memberships_changed, sender=OrganizationMember)
+        post_delete.connect(access.memberships_changed, sender=OrganizationMember)
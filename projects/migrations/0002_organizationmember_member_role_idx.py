@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='organizationmember',
+            index=models.Index(fields=['user', 'organization', 'role'], name='member_role_idx'),
+        ),
+    ]
@@ -23,6 +23,10 @@ class OrganizationMember(models.Model):
     
     class Meta:
         unique_together = ('user', 'organization')
+        indexes = [
+            # Membership and role checks read only this index
+            models.Index(fields=['user', 'organization', 'role'], name='member_role_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.organization.name} ({self.role})"
@@ -3,9 +3,15 @@ from django.urls import reverse
 from django.contrib.auth.models import User
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.contrib.auth import get_user
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
 
+from projects import access
 from projects.models import Organization, OrganizationMember, Project
 from projects.forms import OrganizationForm, ProjectForm
+from requirements.models import Requirement
 
 
 class ProjectsBaseTestCase(TestCase):
@@ -243,6 +249,108 @@ class ViewTests(ProjectsBaseTestCase):
         self.assertEqual(response.context['projects'].count(), 1)
 
 
+class AccessTests(ProjectsBaseTestCase):
+    """Test the per-user access map and the checks built on it"""
+    
+    def setUp(self):
+        super().setUp()
+        self.viewer = User.objects.create_user(username='viewer_user', password='password123')
+        OrganizationMember.objects.create(user=self.viewer, organization=self.organization, role='viewer')
+        self.outsider = User.objects.create_user(username='outsider', password='password123')
+        self.other_org = Organization.objects.create(name='Other Organization')
+        OrganizationMember.objects.create(user=self.outsider, organization=self.other_org, role='admin')
+        self.requirement = Requirement.objects.create(
+            title='Access Requirement', description='Description',
+            project=self.project, created_by=self.regular_user
+        )
+    
+    def login(self, user):
+        self.client.login(username=user.username, password='password123')
+    
+    def test_roles_read_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(access.roles(self.viewer), {self.organization.pk: 'viewer'})
+            access.roles(self.viewer)
+        self.assertEqual(list(access.projects(self.outsider)), [])
+        self.assertEqual(list(access.organizations(self.admin_user, access.CHANGE_ROLES)), [self.organization])
+    
+    def test_outsiders_see_nothing(self):
+        self.login(self.outsider)
+        for url in (
+            reverse('project-detail', kwargs={'pk': self.project.pk}),
+            reverse('requirement-list', kwargs={'project_id': self.project.pk}),
+            reverse('traceability-matrix', kwargs={'project_id': self.project.pk}),
+            reverse('export-requirements', kwargs={'project_id': self.project.pk}),
+            reverse('requirement-detail', kwargs={'pk': self.requirement.pk}),
+            reverse('requirement-impact', kwargs={'pk': self.requirement.pk}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(reverse('organization-detail', kwargs={'pk': self.organization.pk}))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('requirement-search'), {'q': 'Access'})
+        self.assertEqual(list(response.context['results']), [])
+    
+    def test_viewers_only_look(self):
+        self.login(self.viewer)
+        self.assertEqual(self.client.get(reverse('requirement-detail', kwargs={'pk': self.requirement.pk})).status_code, 200)
+        for url in (
+            reverse('requirement-create', kwargs={'project_id': self.project.pk}),
+            reverse('requirement-update', kwargs={'pk': self.requirement.pk}),
+            reverse('category-create', kwargs={'project_id': self.project.pk}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.post(
+            reverse('requirement-status-update', kwargs={'pk': self.requirement.pk, 'status': 'Approved'})
+        )
+        self.assertEqual(response.status_code, 403)
+        self.requirement.refresh_from_db()
+        self.assertEqual(self.requirement.status, 'Draft')
+        
+        self.login(self.regular_user)
+        self.assertEqual(
+            self.client.get(reverse('requirement-update', kwargs={'pk': self.requirement.pk})).status_code, 200
+        )
+    
+    def test_delete_rules(self):
+        # Members delete their own requirements, not projects
+        self.login(self.regular_user)
+        response = self.client.post(reverse('project-delete', kwargs={'pk': self.project.pk}))
+        self.assertRedirects(response, reverse('project-detail', kwargs={'pk': self.project.pk}))
+        self.assertTrue(Project.objects.filter(pk=self.project.pk).exists())
+        self.client.post(reverse('requirement-delete', kwargs={'pk': self.requirement.pk}))
+        self.assertFalse(Requirement.objects.filter(pk=self.requirement.pk).exists())
+        
+        self.login(self.admin_user)
+        self.client.post(reverse('project-delete', kwargs={'pk': self.project.pk}))
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+    
+    def test_one_authorization_query(self):
+        self.login(self.regular_user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('requirement-detail', kwargs={'pk': self.requirement.pk}))
+        self.assertEqual(response.status_code, 200)
+        member_queries = [query for query in ctx.captured_queries if 'projects_organizationmember' in query['sql']]
+        self.assertEqual(len(member_queries), 1)
+    
+    def test_cached_across_requests_when_shared(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with mock.patch('requirements.caching.is_shared', return_value=True):
+            access.roles(self.fresh(self.outsider))
+            with self.assertNumQueries(0):
+                access.roles(self.fresh(self.outsider))
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                OrganizationMember.objects.create(user=self.outsider, organization=self.organization, role='member')
+            self.assertEqual(access.roles(self.fresh(self.outsider))[self.organization.pk], 'member')
+    
+    def fresh(self, user):
+        """A copy of `user` without the roles kept on the object"""
+        return User(pk=user.pk, username=user.username)
+
+
 class EdgeCaseTests(ProjectsBaseTestCase):
     """Test edge cases and authorization scenarios"""
     
@@ -1,5 +1,5 @@
 # projects/views.py
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy, reverse
@@ -8,7 +8,10 @@ from django.contrib.auth import login
 from .models import Organization, OrganizationMember, Project
 from .forms import OrganizationForm, ProjectForm, OrganizationMemberForm, UserRegistrationForm
 import json
-from requirements.models import Requirement
+from requirements import rows, stats
+from requirements.conditional import ConditionalGetMixin
+from . import access
+from .access import OrganizationMemberRequiredMixin, ProjectAccessMixin
 from django.core.exceptions import PermissionDenied
 
 def register(request):
@@ -29,17 +32,15 @@ class DashboardView(LoginRequiredMixin, ListView):
     context_object_name = 'organizations'
     
     def get_queryset(self):
-        user = self.request.user
-        return Organization.objects.filter(members__user=user).distinct()
+        return access.organizations(self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user_orgs = self.get_queryset()
         
         # Get recent projects across all user organizations
-        context['recent_projects'] = Project.objects.filter(
-            organization__in=user_orgs
-        ).order_by('-updated_at')[:5]
+        context['recent_projects'] = stats.for_projects(access.projects(
+            self.request.user, Project.objects.select_related('organization')
+        ).order_by('-updated_at')[:5])
         
         return context
 
@@ -49,35 +50,13 @@ class OrganizationListView(LoginRequiredMixin, ListView):
     context_object_name = 'organizations'
     
     def get_queryset(self):
-        user = self.request.user
-        return Organization.objects.filter(members__user=user).distinct()
+        return access.organizations(self.request.user)
 
-class OrganizationDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+class OrganizationDetailView(LoginRequiredMixin, OrganizationMemberRequiredMixin, DetailView):
     model = Organization
     template_name = 'projects/organization_detail.html'
     context_object_name = 'organization'
     
-    def test_func(self):
-        """
-        Check if the user is a member of the organization
-        """
-        try:
-            # Get the organization
-            organization = get_object_or_404(Organization, pk=self.kwargs['pk'])
-            
-            # Check if the current user is a member of this organization
-            is_member = organization.members.filter(user=self.request.user).exists()
-            
-            if not is_member:
-                # Log the failure for debugging
-                print(f"User {self.request.user} is not a member of organization {organization}")
-                return False
-            
-            return True
-        except Exception as e:
-            print(f"Error in test_func: {e}")
-            return False
-    
     def handle_no_permission(self):
         """
         Override to provide more explicit handling of permission denial
@@ -93,11 +72,11 @@ class OrganizationDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView
         """
         Filter organizations to only those the user is a member of
         """
-        return Organization.objects.filter(members__user=self.request.user).distinct()
+        return access.organizations(self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['projects'] = self.object.projects.all()
+        context['projects'] = stats.for_projects(self.object.projects.all())
         context['members'] = self.object.members.all()
         return context
 
@@ -126,33 +105,46 @@ class ProjectListView(LoginRequiredMixin, ListView):
     context_object_name = 'projects'
     
     def get_queryset(self):
-        user = self.request.user
-        user_orgs = Organization.objects.filter(members__user=user).distinct()
-        return Project.objects.filter(organization__in=user_orgs)
+        return access.projects(self.request.user)
 
-class ProjectDetailView(LoginRequiredMixin, DetailView):
+class ProjectDetailView(LoginRequiredMixin, ProjectAccessMixin, ConditionalGetMixin, DetailView):
     model = Project
     template_name = 'projects/project_detail.html'
     context_object_name = 'project'
+    project_url_kwarg = 'pk'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['requirements'] = self.object.requirements.all().order_by('status', '-priority')
-        context['categories'] = self.object.categories.all()
+        # Counts come from the maintained stats row, not from the requirements table
+        project_stats = stats.for_project(self.object)
+        facets = project_stats.facets()
+        context['stats'] = project_stats
+        context['facets'] = facets
+        cached = self.get_project_cache().get_or_set('project-detail', self.get_listings)
+        context['requirements'] = cached['requirements']
+        context['objectives'] = cached['objectives']
+        context['categories'] = facets.for_categories(cached['categories'])
         
         # Prepare data for the chart
-        status_labels = []
-        status_counts = []
-        
-        for status, display in Requirement.STATUS_CHOICES:
-            status_labels.append(display)
-            status_counts.append(self.object.requirements.filter(status=status).count())
+        status_labels, status_counts = facets.chart_data('status')
         
         # Convert lists to JSON strings for JavaScript
         context['status_labels'] = json.dumps(status_labels)
         context['status_counts'] = json.dumps(status_counts)
         
         return context
+    
+    def get_listings(self):
+        """The requirement, objective and category lists of the page, cached per project version"""
+        requirements = rows.annotate(self.object.requirements.all(), 'category_name')
+        return {
+            'requirements': list(rows.values(
+                requirements, 'id', 'identifier', 'title', 'category_name', 'status', 'priority',
+                'descendant_count', 'descendant_done_count'
+            ).order_by('status_rank', 'priority_rank')[:10]),
+            'objectives': list(self.object.objectives.all()),
+            'categories': list(self.object.categories.all()),
+        }
 
 class ProjectCreateView(LoginRequiredMixin, CreateView):
     model = Project
@@ -161,11 +153,8 @@ class ProjectCreateView(LoginRequiredMixin, CreateView):
     
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        # Only show organizations where user is a member
-        user = self.request.user
-        form.fields['organization'].queryset = Organization.objects.filter(
-            members__user=user
-        ).distinct()
+        # Only show organizations where the user may add projects
+        form.fields['organization'].queryset = access.organizations(self.request.user, access.CHANGE_ROLES)
         return form
     
     def form_valid(self, form):
@@ -173,28 +162,16 @@ class ProjectCreateView(LoginRequiredMixin, CreateView):
         messages.success(self.request, 'Project created successfully!')
         return super().form_valid(form)
 
-class ProjectDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class ProjectDeleteView(LoginRequiredMixin, ProjectAccessMixin, UserPassesTestMixin, DeleteView):
     model = Project
     template_name = 'projects/project_confirm_delete.html'
+    project_url_kwarg = 'pk'
     
     def test_func(self):
         """
         Check if the user is the project creator or an admin of the organization
         """
-        project = self.get_object()
-        user = self.request.user
-        
-        # Check if user is project creator
-        if project.created_by == user:
-            return True
-            
-        # Check if user is an admin in the organization
-        is_admin = project.organization.members.filter(
-            user=user, 
-            role='admin'
-        ).exists()
-        
-        return is_admin
+        return access.can_delete_project(self.request.user, self.project)
     
     def handle_no_permission(self):
         if self.request.user.is_authenticated:
@@ -85,6 +85,34 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Per-project data is cached under version tokens kept in the database
+# (requirements/caching.py), so each worker's memory cache stays correct.
+# Set REQMANAGER_CACHE_DIR to share one file-based cache between workers.
+
+CACHE_DIR = os.environ.get('REQMANAGER_CACHE_DIR')
+
+if CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'requirements.cache_backends.FileCache',
+            'LOCATION': CACHE_DIR,
+            'TIMEOUT': 60 * 60,
+            'OPTIONS': {'MAX_ENTRIES': 5000, 'MAX_SIZE': 512 * 1024 * 1024},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'requirements.cache_backends.MemoryCache',
+            'LOCATION': 'reqmanager',
+            'TIMEOUT': 60 * 60,
+            'OPTIONS': {'MAX_ENTRIES': 1000, 'MAX_SIZE': 128 * 1024 * 1024},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -140,3 +168,7 @@ LOGOUT_REDIRECT_URL = '/login/'
 
 # Optional setting to enable/disable requirement history tracking
 REQUIREMENTS_TRACK_HISTORY = True
+
+# Projects with more requirements than this get a virtual-scrolling
+# traceability matrix that loads tiles on demand
+REQUIREMENTS_MATRIX_VIRTUAL_THRESHOLD = 500
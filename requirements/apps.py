@@ -1,6 +1,33 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
 
 
 class RequirementsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'requirements'
+
+    def ready(self):
+        from projects.models import Organization, Project
+        from . import caching, graph, hierarchy, impact, rollup, search, stats
+        from .models import ProjectObjective, Requirement, RequirementCategory
+        post_migrate.connect(search.install_after_migrate, sender=self)
+        pre_delete.connect(stats.requirement_deleted, sender=Requirement)
+        # The rollup reads the ancestors the hierarchy receiver is about to cut off
+        pre_delete.connect(rollup.requirement_deleted, sender=Requirement)
+        pre_delete.connect(hierarchy.requirement_deleted, sender=Requirement)
+        pre_delete.connect(stats.objective_deleted, sender=ProjectObjective)
+        pre_delete.connect(stats.category_deleted, sender=RequirementCategory)
+        m2m_changed.connect(stats.objective_links_changed, sender=Requirement.objectives.through)
+        post_save.connect(graph.requirement_saved, sender=Requirement)
+        post_delete.connect(graph.requirement_deleted, sender=Requirement)
+        m2m_changed.connect(graph.related_links_changed, sender=Requirement.related_requirements.through)
+        graph.graph_changed.connect(impact.graph_changed)
+        post_save.connect(caching.requirement_saved, sender=Requirement)
+        post_save.connect(caching.project_saved, sender=Project)
+        post_save.connect(caching.organization_saved, sender=Organization)
+        for model in (RequirementCategory, ProjectObjective):
+            post_save.connect(caching.project_item_saved, sender=model)
+        for model in (Requirement, RequirementCategory, ProjectObjective):
+            post_delete.connect(caching.project_item_deleted, sender=model)
+        for through in (Requirement.objectives.through, Requirement.related_requirements.through):
+            m2m_changed.connect(caching.links_changed, sender=through)
@@ -0,0 +1,109 @@
+# requirements/audit.py
+"""
+Change audit pipeline. This is the only place that writes RequirementHistory.
+
+Changes are queued while a `collect()` block is open and written with a single
+bulk_create when the outermost block exits, inside the same transaction as
+the changes themselves. Entries queued in a nested block that raises are
+dropped together with its savepoint.
+"""
+from contextlib import contextmanager
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Requirement, RequirementHistory
+
+AUDITED_FIELDS = ('status', 'title', 'description', 'priority', 'category', 'parent')
+
+_state = threading.local()
+
+
+def is_enabled():
+    return getattr(settings, 'REQUIREMENTS_TRACK_HISTORY', True)
+
+
+@contextmanager
+def collect():
+    """Batch every history entry recorded inside the block into one insert"""
+    depth = getattr(_state, 'depth', 0)
+    if depth == 0:
+        _state.pending = []
+    mark = len(_state.pending)
+    _state.depth = depth + 1
+    try:
+        with transaction.atomic():
+            yield
+            if depth == 0 and _state.pending:
+                RequirementHistory.objects.bulk_create(_state.pending)
+    except BaseException:
+        del _state.pending[mark:]
+        raise
+    finally:
+        _state.depth = depth
+        if depth == 0:
+            _state.pending = []
+
+
+def diff(requirement):
+    """
+    Return {field: [old, new]} for the audited fields that changed since the
+    requirement was loaded. Foreign keys are reported by id.
+    """
+    if requirement._state.adding:
+        return {}
+
+    attnames = {name: Requirement._meta.get_field(name).attname for name in AUDITED_FIELDS}
+    if requirement.has_snapshot():
+        old_values = {name: requirement.previous(name) for name in AUDITED_FIELDS}
+    else:
+        # Instances built by hand have no snapshot, so read the old values once
+        row = Requirement.objects.filter(pk=requirement.pk).values(*attnames.values()).first()
+        if row is None:
+            return {}
+        old_values = {name: row[attname] for name, attname in attnames.items()}
+
+    changes = {}
+    for name, attname in attnames.items():
+        new_value = getattr(requirement, attname)
+        if old_values[name] != new_value:
+            changes[name] = [old_values[name], new_value]
+    return changes
+
+
+def describe(changes):
+    """Build the human readable note shown in the requirement history"""
+    parts = []
+    if 'status' in changes:
+        old, new = changes['status']
+        parts.append(f"Status changed from {old} to {new}")
+    if 'priority' in changes:
+        old, new = changes['priority']
+        parts.append(f"Priority changed from {old} to {new}")
+    updated = [name for name in AUDITED_FIELDS if name in changes and name not in ('status', 'priority')]
+    if updated:
+        parts.append(f"Updated {', '.join(updated)}")
+    return '; '.join(parts)
+
+
+def record(requirement, changes, user=None, notes=''):
+    """Queue a history entry for a requirement"""
+    if not is_enabled():
+        return
+
+    entry = RequirementHistory(
+        requirement=requirement,
+        status=requirement.status,
+        changed_by=user,
+        notes=notes or describe(changes),
+        changes=changes,
+    )
+    if getattr(_state, 'depth', 0):
+        _state.pending.append(entry)
+    else:
+        entry.save()
+
+
+def record_creation(requirement, user=None):
+    record(requirement, {}, user, notes=f"Requirement created with status: {requirement.status}")
@@ -0,0 +1,130 @@
+# requirements/cache_backends.py
+"""
+Cache backends for the per-project caches (see caching.py). Both evict the
+least recently used entries first and cap the cache by entry count and by
+total size:
+
+- MemoryCache: Django's local-memory cache, which is already LRU by entry
+  count, also keeping the pickled size of its entries under MAX_SIZE.
+  Each worker process has its own.
+- FileCache: Django's file-based cache, shared by every worker on a host.
+  Reads refresh a file's modification time, and culling removes the least
+  recently used files rather than random ones.
+
+OPTIONS take Django's MAX_ENTRIES and CULL_FREQUENCY plus MAX_SIZE in
+bytes (0, the default, means no size cap). An entry larger than MAX_SIZE
+on its own is not stored.
+"""
+import os
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Entry sizes per cache name, shared like LocMemCache's own storage
+_sizes = {}
+
+_MISSING = object()
+
+
+class MemoryCache(LocMemCache):
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_size = int(params.get('OPTIONS', {}).get('MAX_SIZE', 0))
+        self._entry_sizes = _sizes.setdefault(name, {})
+
+    @property
+    def size(self):
+        """Total pickled size of the entries, in bytes"""
+        return sum(self._entry_sizes.values())
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._delete(key)
+        if self._max_size and len(value) > self._max_size:
+            return
+        super()._set(key, value, timeout)
+        self._entry_sizes[key] = len(value)
+        if self._max_size:
+            size = self.size
+            while size > self._max_size:
+                # The entry just stored is the most recently used, so it goes last
+                oldest = next(reversed(self._cache))
+                size -= self._entry_sizes.get(oldest, 0)
+                self._delete(oldest)
+
+    def incr(self, key, delta=1, version=None):
+        value = super().incr(key, delta, version)
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            # Stored again in place; touch() only changes the expiry, so keeps the size
+            if key in self._cache:
+                self._entry_sizes[key] = len(self._cache[key])
+        return value
+
+    def _cull(self):
+        if self._cull_frequency == 0:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._entry_sizes.clear()
+            return
+        for _ in range(len(self._cache) // self._cull_frequency):
+            self._delete(next(reversed(self._cache)))
+
+    def _delete(self, key):
+        self._entry_sizes.pop(key, None)
+        return super()._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._entry_sizes.clear()
+
+
+class FileCache(FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._max_size = int(params.get('OPTIONS', {}).get('MAX_SIZE', 0))
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except FileNotFoundError:
+            pass  # Removed by another process since
+        return value
+
+    def _entries(self):
+        """(last used, size, path) of every cache file, least recently used first"""
+        entries = []
+        for path in self._list_cache_files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    @property
+    def size(self):
+        """Total size of the cache files, in bytes"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _cull(self):
+        entries = self._entries()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        too_many = len(entries) >= self._max_entries
+        if not too_many and not (self._max_size and size > self._max_size):
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        remove = len(entries) // self._cull_frequency if too_many else 0
+        for position, (_, entry_size, path) in enumerate(entries):
+            if position >= remove and not (self._max_size and size > self._max_size):
+                break
+            self._delete(path)
+            size -= entry_size
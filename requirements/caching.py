@@ -0,0 +1,225 @@
+# requirements/caching.py
+"""
+Per-project caching of computed data.
+
+Cache keys carry the project's version token, so a change never has to
+find the entries it makes stale: it replaces the token (`bump()`) and the
+old entries are simply never read again, leaving the cache by LRU. Tokens
+live in the database (ProjectCacheVersion) so every worker process agrees
+on them whatever the cache backend, and they are random rather than
+counted up so a bump rolled back with its transaction cannot be reused
+for other data. Other transactions see a bump only once it commits.
+
+Two scopes:
+
+- 'data': anything shown about a project, its organization and its
+  requirements, categories, objectives and links; bumped by the receivers
+  below. conditional.py also makes HTTP validators of it
+- 'graph': the dependency structure only (graph.py bumps it with 'data'),
+  so relabelling a requirement keeps the cached graph
+
+Bulk writers that bypass signals (the matrix batch editor, and through
+`graph.invalidate()` the importer and hierarchy.move_subtree) bump
+themselves. Hits and misses are counted per cache name; `manage.py
+cache_stats` shows them.
+"""
+from collections import Counter
+import hashlib
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+
+from . import singleflight
+from .models import ProjectCacheVersion, new_cache_version
+from .stats import removes_project
+
+SCOPES = ('data', 'graph')
+CACHE_TIMEOUT = 60 * 60
+
+# Every cached thing has a name, which its hit and miss counts are kept under
+NAMES = (
+    'project-detail', 'requirement-list', 'requirement-facets', 'matrix', 'matrix-tile',
+    'export', 'graph', 'impact', 'impact-links',
+)
+
+# Counts are added up in the process and written to the cache in batches
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 10
+
+_MISSING = object()
+_counts = Counter()
+_last_flush = time.monotonic()
+
+
+def is_shared():
+    """Whether every worker process sees the same cache"""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def version(project_id, scope='data'):
+    """The token naming the current state of a project's cached data"""
+    field = f'{scope}_version'
+    token = ProjectCacheVersion.objects.filter(project_id=project_id).values_list(field, flat=True).first()
+    if token is None:
+        token = getattr(ProjectCacheVersion.objects.get_or_create(project_id=project_id)[0], field)
+    return token
+
+
+def freshness(project_id):
+    """
+    (data token, time it was set) of a project, or None before its first
+    cached read (or when there is no such project)
+    """
+    return ProjectCacheVersion.objects.filter(project_id=project_id).values_list(
+        'data_version', 'data_changed_at'
+    ).first()
+
+
+def bump(project_id, *scopes, previous=False):
+    """
+    Give a project new tokens for `scopes` (default 'data'), making its
+    cached data for them stale. Returns {scope: (old token, new token)};
+    the old tokens are only read with `previous=True`, else they are None.
+    """
+    scopes = scopes or ('data',)
+    tokens = {f'{scope}_version': new_cache_version() for scope in scopes}
+    old = dict.fromkeys(scopes)
+    changes = dict(tokens, data_changed_at=timezone.now()) if 'data' in scopes else tokens
+    versions = ProjectCacheVersion.objects.filter(project_id=project_id)
+    with transaction.atomic(savepoint=False):
+        if previous:
+            row = versions.select_for_update().values_list(*tokens).first()
+            if row is not None:
+                old = dict(zip(scopes, row))
+        if not versions.update(**changes):
+            _, created = ProjectCacheVersion.objects.get_or_create(project_id=project_id, defaults=changes)
+            if not created:
+                versions.update(**changes)  # Created by someone else in between
+    return {scope: (old[scope], tokens[f'{scope}_version']) for scope in scopes}
+
+
+class ProjectCache:
+    """A project's cached data at one version (by default the current one)"""
+
+    def __init__(self, project_id, scope='data', at=None):
+        self.project_id = project_id
+        self.scope = scope
+        self.version = at if at is not None else version(project_id, scope)
+
+    def key(self, name, *parts):
+        """Cache key of `name`; `parts` (e.g. query parameters) tell variants apart"""
+        key = f'requirements:{self.scope}:{self.project_id}:{self.version}:{name}'
+        if parts:
+            key += ':' + hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+        return key
+
+    def get(self, name, *parts, default=None, counted=True):
+        """The cached value of `name`; `counted=False` for internal reads that are not page hits"""
+        value = cache.get(self.key(name, *parts), _MISSING)
+        if counted:
+            count(name, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, name, value, *parts, timeout=CACHE_TIMEOUT):
+        cache.set(self.key(name, *parts), value, timeout)
+
+    def get_or_set(self, name, compute, *parts, timeout=CACHE_TIMEOUT):
+        """
+        The cached value of `name`, computed and stored on a miss. Concurrent
+        misses compute it once (see singleflight.py); other processes wait
+        for it only when the cache backend is shared with them.
+        """
+        key = self.key(name, *parts)
+        value = cache.get(key, _MISSING)
+        count(name, value is not _MISSING)
+        if value is _MISSING:
+            def compute_and_set():
+                value = compute()
+                cache.set(key, value, timeout)
+                return value
+
+            value = singleflight.run(
+                key, compute_and_set, lambda: cache.get(key, singleflight.MISSING),
+                across_processes=is_shared(),
+            )
+        return value
+
+
+def _counter_key(name, outcome):
+    return f'requirements:cache-counts:{name}:{outcome}'
+
+
+def count(name, hit):
+    _counts[(name, 'hits' if hit else 'misses')] += 1
+    if sum(_counts.values()) >= FLUSH_EVERY or time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush_counts()
+
+
+def flush_counts():
+    """Add this process's counts to the shared ones in the cache"""
+    global _last_flush
+    pending = dict(_counts)
+    _counts.clear()
+    _last_flush = time.monotonic()
+    for (name, outcome), number in pending.items():
+        key = _counter_key(name, outcome)
+        if not cache.add(key, number, None):
+            try:
+                cache.incr(key, number)
+            except ValueError:
+                cache.set(key, number, None)  # Evicted in between
+
+
+def counts():
+    """{name: {'hits', 'misses'}} for every cache name, including unflushed counts"""
+    flush_counts()
+    keys = {(name, outcome): _counter_key(name, outcome) for name in NAMES for outcome in ('hits', 'misses')}
+    stored = cache.get_many(keys.values())
+    totals = {name: {'hits': 0, 'misses': 0} for name in NAMES}
+    for (name, outcome), key in keys.items():
+        totals[name][outcome] = stored.get(key, 0)
+    return totals
+
+
+def reset_counts():
+    _counts.clear()
+    cache.delete_many([_counter_key(name, outcome) for name in NAMES for outcome in ('hits', 'misses')])
+
+
+def requirement_saved(sender, instance, created, **kwargs):
+    bump(instance.project_id)
+    if not created and instance.has_snapshot() and instance.previous('project') != instance.project_id:
+        bump(instance.previous('project'))
+
+
+def project_item_saved(sender, instance, **kwargs):
+    """post_save receiver for requirements' categories and objectives"""
+    bump(instance.project_id)
+
+
+def project_item_deleted(sender, instance, origin=None, **kwargs):
+    """post_delete receiver for requirements, categories and objectives"""
+    if removes_project(origin):
+        return
+    bump(instance.project_id)
+
+
+def project_saved(sender, instance, created, **kwargs):
+    """post_save receiver for projects, whose own fields the pages show too"""
+    if not created:
+        bump(instance.pk)
+
+
+def organization_saved(sender, instance, created, **kwargs):
+    if not created:
+        for project_id in instance.projects.values_list('pk', flat=True):
+            bump(project_id)
+
+
+def links_changed(sender, instance, action, **kwargs):
+    """m2m_changed receiver for Requirement.objectives and related_requirements, from either side"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump(instance.project_id)
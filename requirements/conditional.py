@@ -0,0 +1,55 @@
+# requirements/conditional.py
+"""
+Conditional GET for project pages.
+
+A project's data token (see caching.py) changes with anything shown about
+it, so together with the user it makes a strong ETag, and the time it was
+set a Last-Modified date. ConditionalGetMixin reads both in one indexed
+lookup before the view does any work and answers 304 Not Modified when the
+client's copy is current; otherwise the view runs, reusing the token for
+its cached data, and the headers are added to the response.
+
+Responses are private to the user and always revalidated, so neither
+browsers nor a shared proxy serve another user's page or a stale one.
+A page shown with flash messages is neither answered with 304 nor given
+validators: the messages are not part of the token, so a 304 would drop
+them and a later one would bring them back.
+"""
+from calendar import timegm
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import caching
+
+
+class ConditionalGetMixin:
+    """For views of one project, named by the `project_url_kwarg` URL argument"""
+    project_url_kwarg = 'project_id'
+    cache_version = None
+
+    def dispatch(self, request, *args, **kwargs):
+        state = None
+        # The length of the message storage does not mark the messages as read
+        if request.method in ('GET', 'HEAD') and not len(get_messages(request)):
+            state = caching.freshness(self.kwargs[self.project_url_kwarg])
+        if state is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        self.cache_version, changed_at = state
+        etag = quote_etag(f'{self.cache_version:x}-{request.user.pk}')
+        last_modified = timegm(changed_at.utctimetuple())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_project_cache(self):
+        """The project's cache at the version the headers name"""
+        return caching.ProjectCache(self.kwargs[self.project_url_kwarg], at=self.cache_version)
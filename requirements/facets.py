@@ -0,0 +1,63 @@
+# requirements/facets.py
+"""
+Faceted counts for a set of requirements.
+
+All facets come from a single GROUP BY over (status, priority, type,
+category); the per-facet totals are summed from those groups in Python. The
+number of groups is bounded by the product of the choice lists and the
+project's categories, never by the number of requirements.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db.models import Count
+
+from .models import Requirement
+
+FACETS = ('status', 'priority', 'type', 'category')
+
+CHOICES = {
+    'status': Requirement.STATUS_CHOICES,
+    'priority': Requirement.PRIORITY_CHOICES,
+    'type': Requirement.TYPE_CHOICES,
+}
+
+
+@dataclass
+class FacetCounts:
+    total: int = 0
+    status: Counter = field(default_factory=Counter)
+    priority: Counter = field(default_factory=Counter)
+    type: Counter = field(default_factory=Counter)
+    category: Counter = field(default_factory=Counter)  # keyed by category id, None = uncategorized
+
+    def choices(self, facet):
+        """[(value, label, count)] in the order of the model's choices"""
+        counts = getattr(self, facet)
+        return [(value, label, counts[value]) for value, label in CHOICES[facet]]
+
+    def chart_data(self, facet='status'):
+        """(labels, counts) for a chart of one facet"""
+        choices = self.choices(facet)
+        return [label for _, label, _ in choices], [count for _, _, count in choices]
+
+    def for_categories(self, categories):
+        """Pair each category with its count: [(category, count)]"""
+        return [(category, self.category[category.pk]) for category in categories]
+
+
+def facet_counts(queryset):
+    """Count a requirement queryset by status, priority, type and category in one query"""
+    facets = FacetCounts()
+    groups = (
+        queryset.order_by()
+        .values_list('status', 'priority', 'type', 'category_id')
+        .annotate(count=Count('pk'))
+    )
+    for status, priority, type_, category_id, count in groups:
+        facets.total += count
+        facets.status[status] += count
+        facets.priority[priority] += count
+        facets.type[type_] += count
+        facets.category[category_id] += count
+    return facets
@@ -2,17 +2,30 @@
 import django_filters
 from django import forms
 from .models import Requirement, RequirementCategory
+from . import search
+
+# Keyset orderings for the sort choices; each ends in the unique pk
+SORT_ORDERINGS = {
+    '': ('pk',),
+    'workflow': ('status_rank', 'priority_rank', 'pk'),
+    'priority': ('priority_rank', 'status_rank', 'pk'),
+}
 
 class RequirementFilter(django_filters.FilterSet):
-    title = django_filters.CharFilter(lookup_expr='icontains', widget=forms.TextInput(attrs={'class': 'form-control'}))
+    q = django_filters.CharFilter(method='filter_search', label='Search', widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'ID, title, description...'}))
     status = django_filters.ChoiceFilter(choices=Requirement.STATUS_CHOICES, widget=forms.Select(attrs={'class': 'form-select'}))
     priority = django_filters.ChoiceFilter(choices=Requirement.PRIORITY_CHOICES, widget=forms.Select(attrs={'class': 'form-select'}))
     type = django_filters.ChoiceFilter(choices=Requirement.TYPE_CHOICES, widget=forms.Select(attrs={'class': 'form-select'}))
     category = django_filters.ModelChoiceFilter(queryset=RequirementCategory.objects.all(), widget=forms.Select(attrs={'class': 'form-select'}))
+    sort = django_filters.ChoiceFilter(
+        method='sort_requirements', label='Sort by', empty_label='Creation order',
+        choices=[('workflow', 'Status, then priority'), ('priority', 'Priority, then status')],
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
     
     class Meta:
         model = Requirement
-        fields = ['title', 'status', 'priority', 'type', 'category']
+        fields = ['q', 'status', 'priority', 'type', 'category', 'sort']
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -20,4 +33,30 @@ class RequirementFilter(django_filters.FilterSet):
         # If we're filtering by a specific project, restrict categories to that project
         if hasattr(self, 'request') and self.request and 'project_id' in self.request.resolver_match.kwargs:
             project_id = self.request.resolver_match.kwargs['project_id']
-            self.filters['category'].queryset = RequirementCategory.objects.filter(project_id=project_id)
\ No newline at end of file
+            self.filters['category'].queryset = RequirementCategory.objects.filter(project_id=project_id)
+    
+    def filter_search(self, queryset, name, value):
+        # Ranked full-text search over identifier, title, description and acceptance criteria
+        return search.apply(queryset, value)
+    
+    def sort_requirements(self, queryset, name, value):
+        # The keyset paginator orders the page, see get_ordering()
+        return queryset
+    
+    def get_ordering(self):
+        """The keyset ordering for the chosen sort; ranked search results keep their rank order"""
+        if 'search_rank' in self.qs.query.annotations:
+            return ('search_rank', 'pk')
+        sort = self.form.cleaned_data.get('sort', '') if self.is_bound and self.is_valid() else ''
+        return SORT_ORDERINGS[sort or '']
+    
+    def show_facet_counts(self, facets):
+        """Append the number of matching requirements to each dropdown option"""
+        for name in ('status', 'priority', 'type'):
+            # The field adds its own empty choice
+            self.form.fields[name].choices = [
+                (value, f"{label} ({count})") for value, label, count in facets.choices(name)
+            ]
+        self.form.fields['category'].label_from_instance = (
+            lambda category: f"{category.name} ({facets.category[category.pk]})"
+        )
@@ -1,6 +1,7 @@
 # requirements/forms.py
 from django import forms
 from .models import Requirement, RequirementCategory, ProjectObjective
+from . import hierarchy
 
 class RequirementForm(forms.ModelForm):
     class Meta:
@@ -30,10 +31,20 @@ class RequirementForm(forms.ModelForm):
             
             # Filter parent and related requirements by project
             self.fields['parent'].queryset = Requirement.objects.filter(project=project)
+            if self.instance.pk:
+                # A requirement cannot sit below itself or its own sub-requirements
+                self.fields['parent'].queryset = self.fields['parent'].queryset.exclude(
+                    ancestor_links__ancestor=self.instance
+                )
             self.fields['related_requirements'].queryset = Requirement.objects.filter(project=project)
             
             # Filter objectives by project
             self.fields['objectives'].queryset = ProjectObjective.objects.filter(project=project)
+    
+    def clean_parent(self):
+        parent = self.cleaned_data.get('parent')
+        hierarchy.check_parent(self.instance, parent)
+        return parent
 
 class RequirementCategoryForm(forms.ModelForm):
     class Meta:
@@ -41,4 +52,13 @@ class RequirementCategoryForm(forms.ModelForm):
         fields = ['name', 'description']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
-        }
\ No newline at end of file
+        }
+
+class RequirementImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+    
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, initial='csv')
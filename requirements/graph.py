@@ -0,0 +1,424 @@
+# requirements/graph.py
+"""
+The requirement dependency graph of a project.
+
+Nodes are a project's requirements; edges are `related_requirements` links
+(from a requirement to the one it relates to) and `parent` links (from a
+parent to its child). A project's edges are read with one query into
+compressed adjacency arrays, analysed once (strongly connected components,
+topological order, layout levels) and cached under the project's graph
+version (see caching.py), which every structural change replaces:
+
+- requirement saves that create a requirement or change its parent or
+  project, deletes and related_requirements changes go through the
+  receivers below
+- bulk writers (the importer, hierarchy.move_subtree) call `invalidate()`
+
+Each new version is announced with the `graph_changed` signal, so caches
+derived from the graph can carry themselves over instead of rebuilding.
+
+Labels are not part of the graph, so renaming a requirement or changing
+its status keeps the cached graph.
+"""
+from array import array
+from collections import Counter, deque
+
+from django.db.models import IntegerField, Value
+from django.dispatch import Signal
+
+from . import caching
+from .models import Requirement
+from .stats import removes_project
+
+RELATED = 0
+PARENT = 1
+EDGE_KINDS = {'related': RELATED, 'parent': PARENT}
+EDGE_NAMES = {code: name for name, code in EDGE_KINDS.items()}
+
+MAX_NODES = 500
+MAX_NODES_LIMIT = 2000
+
+# Sent with project_id, old_version, new_version and `added`: the
+# (source pk, target pk, kind) edges that are the only change, or None
+graph_changed = Signal()
+
+
+class DependencyGraph:
+    """
+    Node i is requirement ids[i]; its successors are
+    targets[offsets[i]:offsets[i + 1]] with the edge kinds at the same
+    positions in `kinds`, and its predecessors are
+    sources[reverse_offsets[i]:reverse_offsets[i + 1]]. parents[i] is the
+    node of its parent requirement (-1 for none), whatever the edge kinds.
+    """
+    __slots__ = (
+        'ids', 'index', 'parents', 'offsets', 'targets', 'kinds', 'reverse_offsets', 'sources',
+        'components', 'component_of', 'levels', '_reach',
+    )
+
+    def __init__(self, parents, edges):
+        """`parents` maps requirement pks to their parent's, `edges` are (source pk, target pk, kind)"""
+        self.ids = array('q', sorted(parents))
+        self.index = {pk: i for i, pk in enumerate(self.ids)}
+        self.parents = array('l', (self.index.get(parents[pk], -1) for pk in self.ids))
+        pairs = [(self.index[source], self.index[target], kind) for source, target, kind in edges]
+        self.offsets, self.targets, self.kinds = self._compress(pairs, 0, 1)
+        self.reverse_offsets, self.sources, _ = self._compress(pairs, 1, 0)
+        self._reach = None
+        self._analyse()
+
+    def _compress(self, pairs, key, value):
+        """Counting-sort `pairs` by their `key` end into (offsets, values, kinds) arrays"""
+        offsets = array('l', [0]) * (len(self.ids) + 1)
+        for pair in pairs:
+            offsets[pair[key] + 1] += 1
+        for i in range(len(self.ids)):
+            offsets[i + 1] += offsets[i]
+        values = array('l', [0]) * len(pairs)
+        kinds = array('b', [0]) * len(pairs)
+        position = array('l', offsets[:-1])
+        for pair in pairs:
+            slot = position[pair[key]]
+            values[slot] = pair[value]
+            kinds[slot] = pair[2]
+            position[pair[key]] += 1
+        return offsets, values, kinds
+
+    @property
+    def node_count(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def successors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def predecessors(self, node):
+        return self.sources[self.reverse_offsets[node]:self.reverse_offsets[node + 1]]
+
+    def edges(self):
+        """(source node, target node, kind) for every edge"""
+        for node in range(len(self.ids)):
+            for position in range(self.offsets[node], self.offsets[node + 1]):
+                yield node, self.targets[position], self.kinds[position]
+
+    def _analyse(self):
+        # Tarjan's algorithm finds the components in reverse topological order
+        self.components = self._strongly_connected_components()
+        self.components.reverse()
+        self.component_of = array('l', [0]) * len(self.ids)
+        for number, component in enumerate(self.components):
+            for node in component:
+                self.component_of[node] = number
+
+        # Longest-path layering of the component graph, for drawing
+        component_levels = [0] * len(self.components)
+        for number, component in enumerate(self.components):
+            for node in component:
+                for successor in self.successors(node):
+                    other = self.component_of[successor]
+                    if other != number and component_levels[other] <= component_levels[number]:
+                        component_levels[other] = component_levels[number] + 1
+        self.levels = array('l', (component_levels[self.component_of[node]] for node in range(len(self.ids))))
+
+    def _strongly_connected_components(self):
+        """Iterative Tarjan, so deep chains cannot hit the recursion limit"""
+        count = len(self.ids)
+        order = [-1] * count
+        low = [0] * count
+        on_stack = [False] * count
+        stack = []
+        components = []
+        counter = 0
+        offsets, targets = self.offsets, self.targets
+
+        for root in range(count):
+            if order[root] != -1:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, offsets[root])]
+            while work:
+                node, position = work[-1]
+                if position < offsets[node + 1]:
+                    work[-1] = (node, position + 1)
+                    successor = targets[position]
+                    if order[successor] == -1:
+                        order[successor] = low[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack[successor] = True
+                        work.append((successor, offsets[successor]))
+                    elif on_stack[successor] and order[successor] < low[node]:
+                        low[node] = order[successor]
+                    continue
+
+                work.pop()
+                if work and low[node] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[node]
+                if low[node] == order[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+        return components
+
+    def is_cyclic(self, component):
+        """Whether a component (a list of nodes) is a cycle rather than a single free node"""
+        return len(component) > 1 or component[0] in self.successors(component[0])
+
+    def cycles(self):
+        """The requirement pks of every dependency cycle, one list per cycle"""
+        return [
+            sorted(self.ids[node] for node in component)
+            for component in self.components if self.is_cyclic(component)
+        ]
+
+    def has_cycles(self):
+        return any(self.is_cyclic(component) for component in self.components)
+
+    def strongly_connected_components(self):
+        """Requirement pks grouped by component, in topological order"""
+        return [sorted(self.ids[node] for node in component) for component in self.components]
+
+    def topological_order(self):
+        """
+        Requirement pks ordered so every edge points forward, except within a
+        cycle, whose members are kept next to each other
+        """
+        return [self.ids[node] for component in self.components for node in sorted(component)]
+
+    def _reachability(self):
+        """Per component, a bitset of the nodes reachable from it"""
+        if self._reach is None:
+            reach = [0] * len(self.components)
+            for number in range(len(self.components) - 1, -1, -1):
+                component = self.components[number]
+                bits = 0
+                for node in component:
+                    for successor in self.successors(node):
+                        bits |= (1 << successor) | reach[self.component_of[successor]]
+                reach[number] = bits
+            self._reach = reach
+        return self._reach
+
+    def reachable(self, pk):
+        """Pks of every requirement reachable from `pk`, itself only if it is on a cycle"""
+        bits = self._reachability()[self.component_of[self.index[pk]]]
+        return {self.ids[node] for node in _bit_positions(bits)}
+
+    def reaches(self, source, target):
+        """Whether there is a path from requirement `source` to requirement `target`"""
+        bits = self._reachability()[self.component_of[self.index[source]]]
+        return bool(bits >> self.index[target] & 1)
+
+    def transitive_closure(self):
+        """{pk: pks reachable from it} for every requirement"""
+        return {pk: self.reachable(pk) for pk in self.ids}
+
+    def roots(self):
+        """For every node, the node of its top-level ancestor"""
+        roots = array('l', [-1]) * len(self.ids)
+        for start in range(len(self.ids)):
+            chain = []
+            node = start
+            while roots[node] == -1 and self.parents[node] != -1:
+                chain.append(node)
+                node = self.parents[node]
+            if roots[node] == -1:
+                roots[node] = node
+            for member in chain:
+                roots[member] = roots[node]
+        return roots
+
+    def neighbourhood(self, node, radius, limit):
+        """Nodes within `radius` edges of `node` in either direction, nearest first, at most `limit`"""
+        found = {node: 0}
+        queue = deque([node])
+        while queue and len(found) < limit:
+            current = queue.popleft()
+            if found[current] == radius:
+                continue
+            for other in (*self.successors(current), *self.predecessors(current)):
+                if other not in found:
+                    found[other] = found[current] + 1
+                    queue.append(other)
+                    if len(found) == limit:
+                        break
+        return list(found)
+
+
+def _bit_positions(bits):
+    # Scanning the binary digits is much faster than peeling off bits one by one
+    return [position for position, digit in enumerate(reversed(bin(bits))) if digit == '1']
+
+
+def load(project_id, kinds=tuple(EDGE_KINDS)):
+    """Read a project's graph with one query"""
+    Link = Requirement.related_requirements.through
+    # Requirement rows carry the parent edge, link rows the related edges
+    rows = Requirement.objects.filter(project_id=project_id).values_list(
+        'pk', 'parent_id', Value(PARENT, output_field=IntegerField())
+    )
+    if 'related' in kinds:
+        rows = rows.union(
+            Link.objects.filter(
+                from_requirement__project_id=project_id, to_requirement__project_id=project_id
+            ).values_list('from_requirement_id', 'to_requirement_id', Value(RELATED, output_field=IntegerField())),
+            all=True,
+        )
+
+    parents = {}
+    edges = []
+    for source, target, kind in rows:
+        if kind == PARENT:
+            parents[source] = target
+        else:
+            edges.append((source, target, RELATED))
+    if 'parent' in kinds:
+        # A parent in another project is not part of this project's graph
+        edges.extend((parent, pk, PARENT) for pk, parent in parents.items() if parent in parents)
+    return DependencyGraph(parents, edges)
+
+
+def invalidate(project_id, added=None):
+    """Start a new graph version; pass `added` edges when they are the only change"""
+    # Only a carry-over needs the old version
+    old_version, new_version = caching.bump(project_id, 'graph', 'data', previous=bool(added))['graph']
+    graph_changed.send(
+        sender=DependencyGraph, project_id=project_id,
+        old_version=old_version, new_version=new_version, added=added,
+    )
+    return new_version
+
+
+def for_project(project_id, kinds=tuple(EDGE_KINDS)):
+    """A project's graph over the given edge kinds, from the cache when it is current"""
+    kinds = tuple(sorted(kinds))
+    return caching.ProjectCache(project_id, 'graph').get_or_set('graph', lambda: load(project_id, kinds), *kinds)
+
+
+def describe(graph, focus=None, radius=2, max_nodes=MAX_NODES):
+    """
+    The JSON sent to the dependency graph view, at a level of detail that
+    fits `max_nodes`:
+
+    - "full": every requirement, when the graph is small enough
+    - "clusters": each top-level requirement stands for its whole subtree,
+      with the edges between subtrees counted; the largest subtrees are
+      kept if there are still too many
+    - "focus": the requirements within `radius` edges of the `focus` pk,
+      nearest first, plus every pk reachable from it
+
+    Edges are [source, target, kind] (plus a count for clusters).
+    """
+    data = {
+        'node_count': graph.node_count,
+        'edge_count': graph.edge_count,
+        'cycles': graph.cycles(),
+        'truncated': False,
+    }
+
+    if focus is not None:
+        nodes = graph.neighbourhood(graph.index[focus], radius, max_nodes)
+        data['mode'] = 'focus'
+        data['focus'] = focus
+        data['reachable'] = sorted(graph.reachable(focus))
+        data['truncated'] = len(nodes) == max_nodes
+    elif graph.node_count <= max_nodes:
+        nodes = range(graph.node_count)
+        data['mode'] = 'full'
+    else:
+        return _describe_clusters(graph, max_nodes, data)
+
+    shown = set(nodes)
+    data['nodes'] = _node_data(graph, nodes)
+    data['edges'] = [
+        [graph.ids[source], graph.ids[target], EDGE_NAMES[kind]]
+        for source in nodes
+        for target, kind in zip(graph.successors(source), graph.kinds[graph.offsets[source]:graph.offsets[source + 1]])
+        if target in shown
+    ]
+    return data
+
+
+def _describe_clusters(graph, max_nodes, data):
+    roots = graph.roots()
+    sizes = Counter(roots)
+    kept = {root for root, _ in sizes.most_common(max_nodes)}
+    weights = Counter(
+        (roots[source], roots[target], kind) for source, target, kind in graph.edges()
+        if roots[source] != roots[target] and roots[source] in kept and roots[target] in kept
+    )
+    data['mode'] = 'clusters'
+    data['truncated'] = len(kept) < len(sizes)
+    data['nodes'] = _node_data(graph, sorted(kept), sizes)
+    data['edges'] = [
+        [graph.ids[source], graph.ids[target], EDGE_NAMES[kind], count]
+        for (source, target, kind), count in sorted(weights.items())
+    ]
+    return data
+
+
+def _node_data(graph, nodes, sizes=None):
+    """Node entries with their labels, read for just these requirements"""
+    pks = [graph.ids[node] for node in nodes]
+    labels = {
+        pk: (identifier, title, status)
+        for pk, identifier, title, status in Requirement.objects.filter(pk__in=pks).values_list(
+            'pk', 'identifier', 'title', 'status'
+        )
+    }
+    entries = []
+    for node, pk in zip(nodes, pks):
+        if pk not in labels:
+            continue  # Deleted since the graph was cached
+        identifier, title, status = labels[pk]
+        component = graph.components[graph.component_of[node]]
+        entry = {
+            'id': pk,
+            'identifier': identifier,
+            'title': title,
+            'status': status,
+            'level': graph.levels[node],
+            'component': graph.component_of[node],
+            'cyclic': graph.is_cyclic(component),
+        }
+        if sizes is not None:
+            entry['size'] = sizes[node]
+        entries.append(entry)
+    return entries
+
+
+def requirement_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or {'parent', 'project'} & set(update_fields):
+        invalidate(instance.project_id)
+        if not created and instance.has_snapshot() and instance.previous('project') != instance.project_id:
+            invalidate(instance.previous('project'))
+
+
+def requirement_deleted(sender, instance, origin=None, **kwargs):
+    if removes_project(origin):
+        return
+    invalidate(instance.project_id)
+
+
+def related_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed receiver for Requirement.related_requirements, from either side"""
+    if action == 'post_add':
+        # Django only reports the links that were actually missing
+        if reverse:
+            added = [(pk, instance.pk, RELATED) for pk in pk_set]
+        else:
+            added = [(instance.pk, pk, RELATED) for pk in pk_set]
+        invalidate(instance.project_id, added=added)
+    elif action in ('post_remove', 'post_clear'):
+        invalidate(instance.project_id)
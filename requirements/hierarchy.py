@@ -0,0 +1,226 @@
+# requirements/hierarchy.py
+"""
+The requirement parent hierarchy as a closure table.
+
+RequirementClosure holds one row per (ancestor, descendant) pair with the
+number of levels between them, plus a depth 0 row pairing each requirement
+with itself. Subtrees, ancestor paths and cycle checks are then single
+indexed queries however deep the tree is, and moving a subtree rewrites
+its paths with one delete and one insert.
+
+- Requirement.save() calls `insert()` for new requirements and `move()`
+  when the parent changes
+- deletes go through `requirement_deleted` (pre_delete); the children of a
+  deleted requirement become roots through SET_NULL
+- bulk writers call `add()` for requirements inserted with bulk_create, and
+  `move_subtree()` moves several requirements at once
+
+QuerySet update() calls on `parent` bypass all of this and must rebuild
+(`manage.py rebuild_hierarchy`).
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from . import audit, graph, rollup
+from .models import Requirement, RequirementClosure
+from .stats import removes_project
+
+CYCLE_ERROR = "A requirement cannot be placed under itself or one of its own sub-requirements."
+
+
+def _pk(requirement):
+    return getattr(requirement, 'pk', requirement)
+
+
+def descendants(requirement, max_depth=None):
+    """The requirements below `requirement`, annotated with their `depth` below it"""
+    # One filter() call, so every condition applies to the same closure row
+    links = {'ancestor_links__ancestor_id': _pk(requirement), 'ancestor_links__depth__gt': 0}
+    if max_depth is not None:
+        links['ancestor_links__depth__lte'] = max_depth
+    return Requirement.objects.filter(**links).annotate(depth=F('ancestor_links__depth'))
+
+
+def ancestors(requirement):
+    """The requirements above `requirement`, root first, annotated with their `distance` from it"""
+    return Requirement.objects.filter(
+        descendant_links__descendant_id=_pk(requirement), descendant_links__depth__gt=0
+    ).annotate(distance=F('descendant_links__depth')).order_by('-distance')
+
+
+def depth(requirement):
+    """How many levels below its root a requirement is (0 for a root)"""
+    return RequirementClosure.objects.filter(descendant_id=_pk(requirement)).aggregate(
+        depth=Max('depth')
+    )['depth'] or 0
+
+
+def is_descendant(requirement, ancestor):
+    """Whether `requirement` is `ancestor` or somewhere below it"""
+    return RequirementClosure.objects.filter(
+        ancestor_id=_pk(ancestor), descendant_id=_pk(requirement)
+    ).exists()
+
+
+def check_parent(requirement, parent):
+    """Raise ValidationError if `parent` would make the hierarchy loop back to `requirement`"""
+    if requirement.pk is None or parent is None:
+        return
+    if _pk(parent) == requirement.pk or is_descendant(parent, requirement):
+        raise ValidationError(CYCLE_ERROR, code='cycle')
+
+
+def tree(requirement, *fields):
+    """
+    The subtree below `requirement` in display order (each requirement
+    followed by its children), as read-only rows with a `depth` column
+    """
+    from . import rows
+
+    fields = (*(fields or ('id', 'identifier', 'title', 'status')), 'parent_id', 'depth')
+    children = defaultdict(list)
+    for row in rows.values(descendants(requirement).order_by('depth', 'pk'), *fields):
+        children[row.parent_id].append(row)
+
+    ordered = []
+    stack = list(reversed(children[requirement.pk]))
+    while stack:
+        row = stack.pop()
+        ordered.append(row)
+        stack.extend(reversed(children[row.id]))
+    return ordered
+
+
+def insert(requirement):
+    """Add the paths of a newly created requirement"""
+    paths = [RequirementClosure(ancestor_id=requirement.pk, descendant_id=requirement.pk, depth=0)]
+    if requirement.parent_id is not None:
+        paths.extend(
+            RequirementClosure(ancestor_id=ancestor_id, descendant_id=requirement.pk, depth=distance + 1)
+            for ancestor_id, distance in RequirementClosure.objects.filter(
+                descendant_id=requirement.parent_id
+            ).values_list('ancestor_id', 'depth')
+        )
+    RequirementClosure.objects.bulk_create(paths)
+
+
+def add(requirements):
+    """
+    Add the paths of requirements inserted with bulk_create, once their
+    parents are set. Parents may be other requirements of the same batch.
+    """
+    parents = {requirement.pk: requirement.parent_id for requirement in requirements}
+    if not parents:
+        return
+
+    # Paths above the batch, for parents that already existed
+    known = defaultdict(list)
+    existing = {parent_id for parent_id in parents.values() if parent_id is not None and parent_id not in parents}
+    for ancestor_id, descendant_id, distance in RequirementClosure.objects.filter(
+        descendant_id__in=existing
+    ).values_list('ancestor_id', 'descendant_id', 'depth'):
+        known[descendant_id].append((ancestor_id, distance))
+
+    for pk in parents:
+        # Walk up to the first requirement whose paths are known, then fill them in downwards
+        chain = []
+        node = pk
+        while node in parents and node not in known:
+            if node in chain:
+                raise ValueError(f"Requirement {node} is its own ancestor")
+            chain.append(node)
+            node = parents[node]
+        for node in reversed(chain):
+            parent_id = parents[node]
+            above = known[parent_id] if parent_id is not None else []
+            known[node] = [(node, 0)] + [(ancestor_id, distance + 1) for ancestor_id, distance in above]
+
+    RequirementClosure.objects.bulk_create(
+        RequirementClosure(ancestor_id=ancestor_id, descendant_id=pk, depth=distance)
+        for pk in parents
+        for ancestor_id, distance in known[pk]
+    )
+
+
+def move(requirement_id, parent_id):
+    """Re-hang the subtree of a requirement under `parent_id` (None makes it a root)"""
+    subtree = RequirementClosure.objects.filter(ancestor_id=requirement_id)
+    with transaction.atomic(savepoint=False):
+        # Cut every path that enters the subtree from above
+        RequirementClosure.objects.filter(
+            descendant_id__in=subtree.values('descendant_id'),
+            ancestor_id__in=RequirementClosure.objects.filter(
+                descendant_id=requirement_id, depth__gt=0
+            ).values('ancestor_id'),
+        ).delete()
+
+        if parent_id is None:
+            return
+        above = list(RequirementClosure.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth'))
+        below = list(subtree.values_list('descendant_id', 'depth'))
+        RequirementClosure.objects.bulk_create(
+            RequirementClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + down + 1)
+            for ancestor_id, up in above
+            for descendant_id, down in below
+        )
+
+
+def move_subtree(requirements, parent, user=None):
+    """
+    Move several requirements, with everything below them, under `parent`
+    (None makes them roots). Nothing moves if any of them would end up
+    below itself. Returns the number of requirements moved.
+    """
+    parent_id = _pk(parent)
+    moving = dict(
+        Requirement.objects.filter(pk__in=[_pk(requirement) for requirement in requirements])
+        .exclude(parent_id=parent_id).values_list('pk', 'parent_id')
+    )
+    if not moving:
+        return 0
+    if parent_id is not None and (
+        parent_id in moving
+        or RequirementClosure.objects.filter(ancestor_id__in=moving, descendant_id=parent_id).exists()
+    ):
+        raise ValidationError(CYCLE_ERROR, code='cycle')
+
+    with audit.collect():
+        Requirement.objects.filter(pk__in=moving).update(
+            parent_id=parent_id, updated_by=user, updated_at=timezone.now()
+        )
+        for pk in moving:
+            rollup.apply(pk, rollup.negate(rollup.subtree_counts(pk)))
+            move(pk, parent_id)
+            rollup.apply(pk, rollup.subtree_counts(pk))
+        project_ids = set()
+        for requirement in Requirement.objects.filter(pk__in=moving):
+            audit.record(requirement, {'parent': [moving[requirement.pk], parent_id]}, user)
+            project_ids.add(requirement.project_id)
+    for project_id in project_ids:
+        graph.invalidate(project_id)
+    return len(moving)
+
+
+def rebuild(project_id):
+    """Recompute the paths of a project's requirements from their parents"""
+    parents = dict(Requirement.objects.filter(project_id=project_id).values_list('pk', 'parent_id'))
+    with transaction.atomic():
+        RequirementClosure.objects.filter(descendant_id__in=parents).delete()
+        requirements = [Requirement(pk=pk, parent_id=parent_id) for pk, parent_id in parents.items()]
+        add(requirements)
+    return len(parents)
+
+
+def requirement_deleted(sender, instance, origin=None, **kwargs):
+    if removes_project(origin):
+        return
+
+    # The children become roots, so cut the paths from above the requirement into its subtree
+    RequirementClosure.objects.filter(
+        descendant_id__in=RequirementClosure.objects.filter(ancestor_id=instance.pk, depth__gt=0).values('descendant_id'),
+        ancestor_id__in=RequirementClosure.objects.filter(descendant_id=instance.pk, depth__gt=0).values('ancestor_id'),
+    ).delete()
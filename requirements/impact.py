@@ -0,0 +1,290 @@
+# requirements/impact.py
+"""
+Change impact analysis: what depends on a requirement, transitively.
+
+A requirement depends on its parent and on the requirements it lists in
+`related_requirements`; an objective depends on the requirements linked to
+it. So a change to a requirement impacts its children, the requirements
+that relate to it (its `related_to`), everything those impact in turn, and
+the objectives of all of them.
+
+Each project has an ImpactIndex built from its dependency graph and
+cached under its graph version (see caching.py). Answering a query slices
+a few runs out of one array, so its cost does not depend on how deep the
+dependencies go. New graph versions that only add related links
+(`graph.graph_changed`) carry the index over, extending the reach of
+whatever leads to the new link; any other structural change starts a new
+version and a rebuild.
+
+Objective links are not part of the index, since they change far more
+often than the structure: they are cached apart as ObjectiveLinks under the
+project's data version, which every link change replaces, and a query looks
+up the objectives of the impacted requirements only.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+from . import caching, graph
+from .models import ProjectObjective, Requirement
+
+SHOWN = 20
+
+
+class ImpactIndex:
+    """
+    Requirement pks are laid out in `order` so that each strongly connected
+    component of the impact graph (an edge points from a requirement to one
+    that depends on it) is the run order[starts[c]:stops[c]], and the
+    components below a component in a spanning forest of the condensed
+    graph come right before it. Everything a component reaches is then a
+    short list of runs, stored as flat (start, stop) pairs in
+    reach_bounds[reach_offsets[c]:reach_offsets[c + 1]].
+    """
+    __slots__ = (
+        'ids', 'component_of', 'position_of', 'order', 'starts', 'stops',
+        'reach_offsets', 'reach_bounds',
+    )
+
+    def __init__(self, impact_graph):
+        components = impact_graph.components
+        count = len(components)
+        self.ids = impact_graph.ids
+        self.component_of = impact_graph.component_of
+
+        successors = [set() for _ in range(count)]
+        for number, component in enumerate(components):
+            for node in component:
+                for successor in impact_graph.successors(node):
+                    other = impact_graph.component_of[successor]
+                    if other != number:
+                        successors[number].add(other)
+
+        # Components are in topological order, so each one hangs under the
+        # first component that leads to it and the sources are the roots
+        children = [[] for _ in range(count)]
+        has_parent = [False] * count
+        for number in range(count):
+            for other in sorted(successors[number]):
+                if not has_parent[other]:
+                    has_parent[other] = True
+                    children[number].append(other)
+
+        # Postorder layout: a component's subtree is the run [low, stop)
+        self.order = array('q')
+        self.starts = array('l', [0]) * count
+        self.stops = array('l', [0]) * count
+        low = [0] * count
+        for root in range(count):
+            if has_parent[root]:
+                continue
+            work = [(root, iter(children[root]))]
+            low[root] = len(self.order)
+            while work:
+                number, pending = work[-1]
+                child = next(pending, None)
+                if child is not None:
+                    low[child] = len(self.order)
+                    work.append((child, iter(children[child])))
+                    continue
+                work.pop()
+                self.starts[number] = len(self.order)
+                self.order.extend(sorted(self.ids[node] for node in components[number]))
+                self.stops[number] = len(self.order)
+
+        self.position_of = array('l', [0]) * len(self.ids)
+        for position, pk in enumerate(self.order):
+            self.position_of[bisect_left(self.ids, pk)] = position
+
+        reach = [None] * count
+        for number in range(count - 1, -1, -1):
+            runs = [(low[number], self.stops[number])]
+            for other in successors[number]:
+                runs.extend(reach[other])
+            reach[number] = _merge(runs)
+        self._store(reach)
+
+    def _store(self, reach):
+        self.reach_offsets = array('l', [0])
+        self.reach_bounds = array('l')
+        for runs in reach:
+            for start, stop in runs:
+                self.reach_bounds.append(start)
+                self.reach_bounds.append(stop)
+            self.reach_offsets.append(len(self.reach_bounds))
+
+    def _runs(self, component):
+        bounds = self.reach_bounds[self.reach_offsets[component]:self.reach_offsets[component + 1]]
+        return list(zip(bounds[::2], bounds[1::2]))
+
+    def _node(self, pk):
+        node = bisect_left(self.ids, pk)
+        if node == len(self.ids) or self.ids[node] != pk:
+            return None
+        return node
+
+    def __contains__(self, pk):
+        return self._node(pk) is not None
+
+    def impacted(self, pk):
+        """Sorted pks of the requirements that depend on requirement `pk`, directly or not"""
+        found = []
+        for start, stop in self._runs(self.component_of[self._node(pk)]):
+            found.extend(self.order[start:stop])
+        found.remove(pk)
+        found.sort()
+        return found
+
+    def add_edges(self, edges):
+        """
+        Extend the index with new (source pk, target pk) impact edges; edges
+        to requirements outside the project are ignored. Returns False when
+        an edge closes a cycle, which merges components: rebuild instead.
+        """
+        reach = None
+        for source, target in edges:
+            source, target = self._node(source), self._node(target)
+            if source is None or target is None:
+                continue
+            source, target = self.component_of[source], self.component_of[target]
+            if source == target:
+                continue
+            if reach is None:
+                reach = [self._runs(number) for number in range(len(self.starts))]
+            anchor = self.starts[source]
+            if _covers(reach[target], anchor):
+                return False
+            # Whatever reached the source now reaches the target's reach too
+            added = reach[target]
+            for number, runs in enumerate(reach):
+                if _covers(runs, anchor):
+                    reach[number] = _merge(runs + added)
+        if reach is not None:
+            self._store(reach)
+        return True
+
+
+class ObjectiveLinks:
+    """
+    A project's objective links grouped by requirement: the objectives of
+    requirement_ids[i] are objective_ids[offsets[i]:offsets[i + 1]]
+    """
+    __slots__ = ('requirement_ids', 'offsets', 'objective_ids')
+
+    def __init__(self, links):
+        """`links` are (requirement pk, objective pk) pairs sorted by requirement"""
+        self.requirement_ids = array('q')
+        self.offsets = array('l', [0])
+        self.objective_ids = array('q')
+        for requirement_id, objective_id in links:
+            if self.requirement_ids and self.requirement_ids[-1] == requirement_id:
+                self.offsets[-1] += 1
+            else:
+                self.requirement_ids.append(requirement_id)
+                self.offsets.append(self.offsets[-1] + 1)
+            self.objective_ids.append(objective_id)
+
+    def objectives(self, requirement_ids):
+        """Sorted pks of the objectives linked to any of the sorted `requirement_ids`"""
+        found = set()
+        low = 0
+        for pk in requirement_ids:
+            low = bisect_left(self.requirement_ids, pk, low)
+            if low == len(self.requirement_ids):
+                break
+            if self.requirement_ids[low] == pk:
+                found.update(self.objective_ids[self.offsets[low]:self.offsets[low + 1]])
+        return sorted(found)
+
+
+def _merge(runs):
+    """Sort (start, stop) runs and join the ones that touch or overlap"""
+    merged = []
+    for start, stop in sorted(runs):
+        if merged and start <= merged[-1][1]:
+            if stop > merged[-1][1]:
+                merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _covers(runs, position):
+    index = bisect_right(runs, (position, float('inf'))) - 1
+    return index >= 0 and runs[index][1] > position
+
+
+def impact_edges(edges):
+    """Dependency edges (source pk, target pk, kind) turned to point at the dependant"""
+    for source, target, kind in edges:
+        yield (target, source, kind) if kind == graph.RELATED else (source, target, kind)
+
+
+def build(project_id):
+    dependency_graph = graph.for_project(project_id)
+    ids = dependency_graph.ids
+    parents = {
+        pk: ids[parent] if parent != -1 else None
+        for pk, parent in zip(ids, dependency_graph.parents)
+    }
+    edges = ((ids[source], ids[target], kind) for source, target, kind in dependency_graph.edges())
+    return ImpactIndex(graph.DependencyGraph(parents, impact_edges(edges)))
+
+
+def for_project(project_id, refresh=False):
+    """A project's impact index, from the cache when it is current"""
+    project_cache = caching.ProjectCache(project_id, 'graph')
+    if refresh:
+        index = build(project_id)
+        project_cache.set('impact', index)
+        return index
+    return project_cache.get_or_set('impact', lambda: build(project_id))
+
+
+def analyse(requirement):
+    """(requirement pks, objective pks) that depend on `requirement`, directly or not"""
+    index = for_project(requirement.project_id)
+    if requirement.pk not in index:
+        # Cached from a read that raced the requirement's creation
+        index = for_project(requirement.project_id, refresh=True)
+    requirement_ids = index.impacted(requirement.pk)
+    links = objective_links(requirement.project_id)
+    return requirement_ids, links.objectives(sorted([requirement.pk, *requirement_ids]))
+
+
+def objective_links(project_id):
+    """A project's ObjectiveLinks, from the cache when they are current"""
+    def build_links():
+        return ObjectiveLinks(Requirement.objectives.through.objects.filter(
+            requirement__project_id=project_id
+        ).order_by('requirement_id', 'projectobjective_id').values_list('requirement_id', 'projectobjective_id'))
+
+    return caching.ProjectCache(project_id).get_or_set('impact-links', build_links)
+
+
+def summary(requirement, limit=SHOWN):
+    """
+    The impact of a requirement for display: counts, the first `limit`
+    impacted requirements (by pk) as rows, and every impacted objective
+    """
+    from . import rows
+
+    requirement_ids, objective_ids = analyse(requirement)
+    return {
+        'requirement_count': len(requirement_ids),
+        'requirements': rows.values(
+            Requirement.objects.filter(pk__in=requirement_ids[:limit]).order_by('pk'),
+            'id', 'identifier', 'title', 'status',
+        ),
+        'truncated': len(requirement_ids) > limit,
+        'objectives': ProjectObjective.objects.filter(pk__in=objective_ids).order_by('pk').only('title'),
+    }
+
+
+def graph_changed(sender, project_id, old_version, new_version, added=None, **kwargs):
+    """Carry the index over to a graph version that only adds edges"""
+    if not added or old_version is None:
+        return
+    index = caching.ProjectCache(project_id, 'graph', at=old_version).get('impact', counted=False)
+    if index is not None and index.add_edges((source, target) for source, target, _ in impact_edges(added)):
+        # A new version that is rolled back is never current again, so this cannot go stale
+        caching.ProjectCache(project_id, 'graph', at=new_version).set('impact', index)
@@ -0,0 +1,293 @@
+# requirements/importers.py
+"""
+Bulk import of requirements from CSV or JSON Lines.
+
+Input is parsed as a stream and processed in fixed-size chunks. Every chunk is
+validated against in-memory lookup maps, written with bulk_create (plus one
+insert for the objective links) and committed in its own transaction, so a
+bad chunk never undoes the ones before it.
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
+
+from . import audit, graph, hierarchy, rollup, stats
+from .models import Requirement, RequirementSequence, parse_identifier
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Column aliases, including the headers written by ExportRequirementsCSV
+COLUMN_ALIASES = {
+    'id': 'identifier',
+    'objective': 'objectives',
+}
+
+LIST_SEPARATOR = ';'
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    processed: int = 0
+    errors: list = field(default_factory=list)  # [(row_number, message)]
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+
+def normalize_row(row):
+    normalized = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = key.strip().lower().replace(' ', '_')
+        normalized[COLUMN_ALIASES.get(key, key)] = value
+    return normalized
+
+
+def parse_csv(stream):
+    for row_number, row in enumerate(csv.DictReader(stream), start=2):
+        yield row_number, normalize_row(row)
+
+
+def parse_jsonl(stream):
+    for row_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, e
+            continue
+        if not isinstance(row, dict):
+            yield row_number, ValueError("Each line must be a JSON object")
+            continue
+        yield row_number, normalize_row(row)
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'jsonl': parse_jsonl,
+}
+
+
+def format_errors(error):
+    if hasattr(error, 'error_dict'):
+        return '; '.join(
+            f"{name}: {message}" if name != '__all__' else message
+            for name, messages in error.message_dict.items()
+            for message in messages
+        )
+    return '; '.join(error.messages)
+
+
+def text(row, key):
+    value = row.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def split_list(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).split(LIST_SEPARATOR) if item.strip()]
+
+
+class RequirementImporter:
+    """
+    Import requirements into a project. Categories and objectives are matched
+    by name/title (case-insensitive) or primary key, parents by identifier.
+    """
+
+    def __init__(self, project, user=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        self.project = project
+        self.user = user
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self._load_lookups()
+
+    def _load_lookups(self):
+        self.categories = {}
+        for pk, name in self.project.categories.values_list('pk', 'name'):
+            self.categories.setdefault(name.lower(), pk)
+            self.categories[str(pk)] = pk
+
+        self.objectives = {}
+        for pk, title in self.project.objectives.values_list('pk', 'title'):
+            self.objectives.setdefault(title.lower(), pk)
+            self.objectives[str(pk)] = pk
+
+        self.identifiers = dict(self.project.requirements.values_list('identifier', 'pk'))
+
+    def run(self, stream, fmt='csv'):
+        if fmt not in PARSERS:
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+        result = ImportResult()
+        rows = PARSERS[fmt](stream)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk, result)
+            if self.progress:
+                self.progress(result)
+        return result
+
+    def _import_chunk(self, chunk, result):
+        result.processed += len(chunk)
+        chunk_identifiers = set()
+        valid = []
+        for row_number, row in chunk:
+            if isinstance(row, Exception):
+                result.errors.append((row_number, str(row)))
+                continue
+            try:
+                valid.append((row_number, self._build(row, chunk_identifiers)))
+            except ValidationError as e:
+                result.errors.append((row_number, format_errors(e)))
+
+        # Drop rows whose parents lead back to themselves, then rows whose
+        # parent is a row of this chunk that failed validation
+        looped = self._looped_rows(valid)
+        if looped:
+            result.errors.extend((row_number, f"Parent cycle: {parent}") for row_number, parent in looped)
+            looped_rows = {row_number for row_number, _ in looped}
+            valid = [item for item in valid if item[0] not in looped_rows]
+
+        while True:
+            known = {requirement.identifier for _, (requirement, _, _) in valid}
+            orphans = [
+                (row_number, parent) for row_number, (_, parent, _) in valid
+                if parent and parent not in self.identifiers and parent not in known
+            ]
+            if not orphans:
+                break
+            result.errors.extend((row_number, f"Unknown parent: {parent}") for row_number, parent in orphans)
+            orphan_rows = {row_number for row_number, _ in orphans}
+            valid = [item for item in valid if item[0] not in orphan_rows]
+
+        if not valid:
+            return
+
+        try:
+            with audit.collect():
+                created = self._write(valid)
+        except DatabaseError as e:
+            result.errors.extend((row_number, f"Chunk rolled back: {e}") for row_number, _ in valid)
+            self._load_lookups()
+            return
+
+        result.created += created
+
+    def _looped_rows(self, valid):
+        """(row number, parent) of the rows whose parent chain within the chunk returns to them"""
+        parents = {requirement.identifier: parent for _, (requirement, parent, _) in valid if requirement.identifier}
+        looped = set()
+        for start in parents:
+            seen = set()
+            node = start
+            while node in parents and node not in seen:
+                seen.add(node)
+                node = parents[node]
+            if node == start:
+                looped.add(start)
+        return [
+            (row_number, parent) for row_number, (requirement, parent, _) in valid
+            if requirement.identifier in looped
+        ]
+
+    def _build(self, row, chunk_identifiers):
+        """Validate one row and return (requirement, parent identifier, objective ids)"""
+        title = text(row, 'title')[:200]
+        requirement = Requirement(
+            project=self.project,
+            identifier=text(row, 'identifier'),
+            title=title,
+            description=text(row, 'description'),
+            acceptance_criteria=text(row, 'acceptance_criteria'),
+            type=text(row, 'type') or 'Functional',
+            priority=text(row, 'priority') or 'Medium',
+            status=text(row, 'status') or 'Draft',
+            created_by=self.user,
+        )
+        requirement.full_clean(
+            exclude=['identifier', 'project', 'category', 'parent', 'created_by', 'updated_by'],
+            validate_unique=False,
+            validate_constraints=False,
+        )
+
+        errors = []
+        if requirement.identifier:
+            if requirement.identifier in self.identifiers or requirement.identifier in chunk_identifiers:
+                errors.append(f"Identifier {requirement.identifier} already exists")
+            chunk_identifiers.add(requirement.identifier)
+
+        category = text(row, 'category')
+        if category:
+            requirement.category_id = self.categories.get(category.lower())
+            if requirement.category_id is None:
+                errors.append(f"Unknown category: {category}")
+
+        parent = text(row, 'parent')
+
+        objective_ids = []
+        for objective in split_list(row.get('objectives')):
+            objective_id = self.objectives.get(objective.lower())
+            if objective_id is None:
+                errors.append(f"Unknown objective: {objective}")
+            else:
+                objective_ids.append(objective_id)
+
+        if errors:
+            raise ValidationError(errors)
+        return requirement, parent, objective_ids
+
+    def _write(self, valid):
+        requirements = [requirement for _, (requirement, _, _) in valid]
+
+        # Keep the sequence ahead of explicit REQ-### identifiers in the file,
+        # then hand out the rest from one reserved block
+        explicit = [parse_identifier(r.identifier) for r in requirements if r.identifier]
+        explicit = [number for number in explicit if number is not None]
+        if explicit:
+            RequirementSequence.objects.bump_to(self.project, max(explicit))
+        missing = [requirement for requirement in requirements if not requirement.identifier]
+        if missing:
+            for requirement, identifier in zip(missing, RequirementSequence.objects.allocate(self.project, len(missing))):
+                requirement.identifier = identifier
+
+        Requirement.objects.bulk_create(requirements)
+        self.identifiers.update((requirement.identifier, requirement.pk) for requirement in requirements)
+
+        # Parents may point at rows from the same chunk, so link them afterwards
+        with_parent = []
+        links = []
+        Link = Requirement.objectives.through
+        for _, (requirement, parent, objective_ids) in valid:
+            if parent:
+                requirement.parent_id = self.identifiers[parent]
+                with_parent.append(requirement)
+            links.extend(
+                Link(requirement_id=requirement.pk, projectobjective_id=objective_id)
+                for objective_id in dict.fromkeys(objective_ids)
+            )
+        if with_parent:
+            Requirement.objects.bulk_update(with_parent, ['parent'])
+        hierarchy.add(requirements)
+        rollup.record_created(requirements)
+        graph.invalidate(self.project.pk)
+        if links:
+            Link.objects.bulk_create(links)
+        stats.record_created(requirements, [(link.requirement_id, link.projectobjective_id) for link in links])
+
+        for requirement in requirements:
+            audit.record_creation(requirement, self.user)
+        return len(requirements)
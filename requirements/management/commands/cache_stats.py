@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from requirements import caching
+
+
+class Command(BaseCommand):
+    help = "Show the hit and miss counts of the per-project caches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Set the counts back to zero afterwards")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Backend: {settings.CACHES['default']['BACKEND']}")
+        self.stdout.write(f"{'Cache':<20} {'Hits':>10} {'Misses':>10} {'Hit rate':>9}")
+        for name, counts in caching.counts().items():
+            lookups = counts['hits'] + counts['misses']
+            rate = f"{100 * counts['hits'] / lookups:.0f}%" if lookups else '-'
+            self.stdout.write(f"{name:<20} {counts['hits']:>10} {counts['misses']:>10} {rate:>9}")
+        if options['reset']:
+            caching.reset_counts()
+            self.stdout.write(self.style.SUCCESS("Counts reset"))
@@ -0,0 +1,50 @@
+# requirements/management/commands/import_requirements.py
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.models import Project
+from requirements.importers import DEFAULT_CHUNK_SIZE, PARSERS, RequirementImporter
+
+
+class Command(BaseCommand):
+    help = "Import requirements into a project from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(PARSERS), help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--user', help="Username recorded as the creator")
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project_id'])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project_id']} does not exist")
+
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        path = Path(options['path'])
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        if fmt not in PARSERS:
+            raise CommandError(f"Cannot tell the format of {path}; pass --format")
+
+        def progress(result):
+            self.stdout.write(f"Processed {result.processed} rows, created {result.created}, errors {result.failed}")
+
+        importer = RequirementImporter(project, user=user, chunk_size=options['chunk_size'], progress=progress)
+        with path.open(encoding='utf-8-sig', newline='') as stream:
+            result = importer.run(stream, fmt)
+
+        for row_number, message in result.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} requirements into {project.name} ({result.failed} rows failed)"
+        ))
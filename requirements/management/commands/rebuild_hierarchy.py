@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.models import Project
+from requirements import caching, hierarchy, rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored requirement hierarchy paths and progress rollups of projects from the parent links"
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_ids', nargs='*', type=int, help="Defaults to every project")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by('pk')
+        if options['project_ids']:
+            projects = projects.filter(pk__in=options['project_ids'])
+            missing = set(options['project_ids']) - set(projects.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Projects do not exist: {', '.join(map(str, sorted(missing)))}")
+
+        rebuilt = 0
+        for project in projects.iterator():
+            try:
+                count = hierarchy.rebuild(project.pk)
+                rollup.rebuild(project.pk)
+                caching.bump(project.pk)
+            except ValueError as e:
+                raise CommandError(f"{project.name}: {e}")
+            rebuilt += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{project.name}: {count} requirements")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the hierarchy of {rebuilt} projects"))
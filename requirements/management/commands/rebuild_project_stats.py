@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.models import Project
+from requirements import stats
+
+
+class Command(BaseCommand):
+    help = "Recount the stored requirement statistics of projects from their requirements"
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_ids', nargs='*', type=int, help="Defaults to every project")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by('pk')
+        if options['project_ids']:
+            projects = projects.filter(pk__in=options['project_ids'])
+            missing = set(options['project_ids']) - set(projects.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Projects do not exist: {', '.join(map(str, sorted(missing)))}")
+
+        rebuilt = 0
+        for project in projects.iterator():
+            project_stats = stats.rebuild(project.pk)
+            rebuilt += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{project.name}: {project_stats.requirement_count} requirements")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics for {rebuilt} projects"))
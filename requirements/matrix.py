@@ -0,0 +1,288 @@
+# requirements/matrix.py
+"""
+Traceability matrix engine.
+
+The requirement <-> objective links of a project are read from the through
+table in one query and packed into an integer bitset per requirement (bit j
+set = linked to the j-th objective) plus one bitset per objective over the
+row positions. Coverage totals are popcounts of those bitsets, so the
+template only walks precomputed rows.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+
+from . import caching, rows, stats
+from .models import Requirement, ProjectObjective, RequirementCategory
+
+UNCATEGORIZED = 'Uncategorized'
+
+# Largest tile the JSON API hands out
+MAX_TILE_ROWS = 200
+MAX_TILE_COLUMNS = 64
+
+# Largest number of cell operations accepted in one batch
+MAX_BATCH_OPERATIONS = 1000
+DELETE_CHUNK = 100
+
+# Rows are laid out category by category (uncategorized last), so a flat row
+# range maps onto contiguous category sections
+ROW_ORDERING = (F('category_id').asc(nulls_last=True), 'pk')
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+@dataclass
+class MatrixRow:
+    # One per requirement on large matrices, so no per-instance __dict__
+    __slots__ = ('pk', 'identifier', 'title', 'category_id', 'mask', 'cells')
+
+    pk: int
+    identifier: str
+    title: str
+    category_id: int
+    mask: int
+    cells: list  # [(objective, linked)]
+
+    @property
+    def coverage(self):
+        return popcount(self.mask)
+
+
+class TraceabilityMatrix:
+    def __init__(self, project):
+        self.project = project
+        self.objectives = list(ProjectObjective.objects.filter(project=project))
+        self.columns = {objective.pk: position for position, objective in enumerate(self.objectives)}
+
+        requirements = Requirement.objects.filter(project=project).order_by('pk').values_list(
+            'pk', 'identifier', 'title', 'category_id'
+        )
+        self.rows = [MatrixRow(pk, identifier, title, category_id, 0, []) for pk, identifier, title, category_id in requirements]
+        self.positions = {row.pk: position for position, row in enumerate(self.rows)}
+
+        self.row_masks = [0] * len(self.rows)
+        self.column_masks = [0] * len(self.objectives)
+        self._load_links()
+
+        for position, row in enumerate(self.rows):
+            row.mask = self.row_masks[position]
+            row.cells = [(objective, bool(row.mask >> column & 1)) for column, objective in enumerate(self.objectives)]
+
+    def _load_links(self):
+        Link = Requirement.objectives.through
+        links = Link.objects.filter(requirement__project=self.project).values_list('requirement_id', 'projectobjective_id')
+        for requirement_id, objective_id in links.iterator():
+            row = self.positions.get(requirement_id)
+            column = self.columns.get(objective_id)
+            if row is None or column is None:
+                continue  # Link to an objective of another project
+            self.row_masks[row] |= 1 << column
+            self.column_masks[column] |= 1 << row
+
+    def is_linked(self, requirement_id, objective_id):
+        row = self.positions.get(requirement_id)
+        column = self.columns.get(objective_id)
+        return row is not None and column is not None and bool(self.row_masks[row] >> column & 1)
+
+    def column_totals(self):
+        """Number of requirements linked to each objective, in column order"""
+        return [(objective, popcount(mask)) for objective, mask in zip(self.objectives, self.column_masks)]
+
+    def covered_requirements(self):
+        return sum(1 for mask in self.row_masks if mask)
+
+    def groups(self):
+        """Rows grouped by category: [(label, rows)], uncategorized last"""
+        by_category = {}
+        for row in self.rows:
+            by_category.setdefault(row.category_id, []).append(row)
+
+        groups = [
+            (category.name, by_category.get(category.pk, []))
+            for category in RequirementCategory.objects.filter(project=self.project).order_by('pk')
+        ]
+        if by_category.get(None):
+            groups.append((UNCATEGORIZED, by_category[None]))
+        return groups
+
+
+def category_headers(project):
+    """Category sections of the flat row order: [{'name', 'start', 'count'}]"""
+    counts = (
+        rows.annotate(Requirement.objects.filter(project=project), 'category_name')
+        .values('category_id', 'category_name')
+        .annotate(count=Count('pk'))
+        .order_by(F('category_id').asc(nulls_last=True))
+    )
+    headers = []
+    start = 0
+    for section in counts:
+        headers.append({
+            'name': section['category_name'] or UNCATEGORIZED,
+            'start': start,
+            'count': section['count'],
+        })
+        start += section['count']
+    return headers
+
+
+def load_tile(project, row_start, row_count, column_start, column_count):
+    """
+    Return one rectangular tile of the matrix. Each row carries its links to
+    the tile's columns as a hex-encoded bitmap (bit j = column_start + j).
+    """
+    row_count = max(0, min(row_count, MAX_TILE_ROWS))
+    column_count = max(0, min(column_count, MAX_TILE_COLUMNS))
+
+    Link = Requirement.objectives.through
+    objectives = ProjectObjective.objects.filter(project=project)
+    columns = list(objectives.values_list('pk', 'title')[column_start:column_start + column_count])
+    requirements = list(
+        Requirement.objects.filter(project=project)
+        .order_by(*ROW_ORDERING)
+        .values_list('pk', 'identifier', 'title', 'category_id')[row_start:row_start + row_count]
+    )
+
+    positions = {pk: position for position, (pk, _) in enumerate(columns)}
+    masks = dict.fromkeys((pk for pk, _, _, _ in requirements), 0)
+    coverage = dict.fromkeys(masks, 0)
+    column_totals = dict.fromkeys(positions, 0)
+
+    if masks and positions:
+        links = Link.objects.filter(
+            requirement_id__in=list(masks), projectobjective_id__in=list(positions)
+        ).values_list('requirement_id', 'projectobjective_id')
+        for requirement_id, objective_id in links:
+            masks[requirement_id] |= 1 << positions[objective_id]
+
+        totals = (
+            Link.objects.filter(projectobjective_id__in=list(positions))
+            .values('projectobjective_id').annotate(count=Count('pk')).order_by()
+        )
+        column_totals.update((total['projectobjective_id'], total['count']) for total in totals)
+
+    if masks:
+        counts = (
+            Link.objects.filter(requirement_id__in=list(masks), projectobjective__project=project)
+            .values('requirement_id').annotate(count=Count('pk')).order_by()
+        )
+        coverage.update((count['requirement_id'], count['count']) for count in counts)
+
+    return {
+        'row_start': row_start,
+        'column_start': column_start,
+        'total_columns': objectives.count(),
+        'headers': category_headers(project),
+        'columns': [
+            {'id': pk, 'title': title, 'total': column_totals[pk]}
+            for pk, title in columns
+        ],
+        'rows': [
+            {
+                'id': pk,
+                'identifier': identifier,
+                'title': title,
+                'coverage': coverage[pk],
+                'bits': format(masks[pk], 'x'),
+            }
+            for pk, identifier, title, _ in requirements
+        ],
+    }
+
+
+class LinkOperationError(ValueError):
+    pass
+
+
+def parse_link_operations(operations):
+    """Validate the shape of [{'requirement', 'objective', 'op'}] and return (op, req, obj) tuples"""
+    if not isinstance(operations, list) or not operations:
+        raise LinkOperationError("Expected a non-empty list of operations")
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise LinkOperationError(f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+
+    parsed = {}
+    for operation in operations:
+        try:
+            op = operation['op']
+            requirement_id = int(operation['requirement'])
+            objective_id = int(operation['objective'])
+        except (KeyError, TypeError, ValueError):
+            raise LinkOperationError("Each operation needs op, requirement and objective")
+        if op not in ('add', 'remove'):
+            raise LinkOperationError(f"Unknown operation: {op}")
+        # The last operation on a cell wins
+        parsed[(requirement_id, objective_id)] = op
+    return [(op, requirement_id, objective_id) for (requirement_id, objective_id), op in parsed.items()]
+
+
+def apply_link_operations(project, operations):
+    """
+    Apply a batch of add/remove operations on the requirement <-> objective
+    through table in one transaction. Returns the cells that actually changed
+    as [{'requirement', 'objective', 'linked'}].
+    """
+    operations = parse_link_operations(operations)
+    requirement_ids = {requirement_id for _, requirement_id, _ in operations}
+    objective_ids = {objective_id for _, _, objective_id in operations}
+
+    # Both id sets are checked against the project with a single query
+    known = set(
+        Requirement.objects.filter(project=project, pk__in=requirement_ids)
+        .order_by().values_list(Value('requirement'), 'pk')
+        .union(
+            ProjectObjective.objects.filter(project=project, pk__in=objective_ids)
+            .order_by().values_list(Value('objective'), 'pk'),
+            all=True,
+        )
+    )
+    unknown_requirements = requirement_ids - {pk for kind, pk in known if kind == 'requirement'}
+    unknown_objectives = objective_ids - {pk for kind, pk in known if kind == 'objective'}
+    if unknown_requirements or unknown_objectives:
+        raise LinkOperationError("Every requirement and objective must belong to this project")
+
+    Link = Requirement.objectives.through
+    with transaction.atomic():
+        existing = set(
+            Link.objects.filter(requirement_id__in=requirement_ids, projectobjective_id__in=objective_ids)
+            .values_list('requirement_id', 'projectobjective_id')
+        )
+        to_add = [
+            (requirement_id, objective_id) for op, requirement_id, objective_id in operations
+            if op == 'add' and (requirement_id, objective_id) not in existing
+        ]
+        to_remove = [
+            (requirement_id, objective_id) for op, requirement_id, objective_id in operations
+            if op == 'remove' and (requirement_id, objective_id) in existing
+        ]
+
+        if to_add:
+            Link.objects.bulk_create(
+                [Link(requirement_id=r, projectobjective_id=o) for r, o in to_add],
+                ignore_conflicts=True,
+            )
+        if to_remove:
+            # One condition per requirement, a bounded number per statement:
+            # SQLite limits how deep an OR chain may nest
+            removed = defaultdict(list)
+            for requirement_id, objective_id in to_remove:
+                removed[requirement_id].append(objective_id)
+            groups = list(removed.items())
+            for start in range(0, len(groups), DELETE_CHUNK):
+                condition = Q()
+                for requirement_id, objective_ids in groups[start:start + DELETE_CHUNK]:
+                    condition |= Q(requirement_id=requirement_id, projectobjective_id__in=objective_ids)
+                Link.objects.filter(condition).delete()
+        stats.record_links(to_add, to_remove, project=project)
+        if to_add or to_remove:
+            caching.bump(project.pk)
+
+    return (
+        [{'requirement': r, 'objective': o, 'linked': True} for r, o in to_add]
+        + [{'requirement': r, 'objective': o, 'linked': False} for r, o in to_remove]
+    )
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:43
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    """Start each project's counter at the highest REQ-### already in use"""
+    Project = apps.get_model('projects', 'Project')
+    Requirement = apps.get_model('requirements', 'Requirement')
+    RequirementSequence = apps.get_model('requirements', 'RequirementSequence')
+    pattern = re.compile(r'^REQ-(\d+)$')
+
+    highest = {project_id: 0 for project_id in Project.objects.values_list('pk', flat=True)}
+    identifiers = Requirement.objects.filter(identifier__startswith='REQ-').values_list('project_id', 'identifier')
+    for project_id, identifier in identifiers.iterator():
+        match = pattern.match(identifier)
+        if match:
+            highest[project_id] = max(highest[project_id], int(match.group(1)))
+
+    RequirementSequence.objects.bulk_create([
+        RequirementSequence(project_id=project_id, last_value=last_value)
+        for project_id, last_value in highest.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('requirements', '0003_projectobjective_requirement_objectives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequirementSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='requirement_sequence', to='projects.project')),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requirements', '0004_requirementsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requirementhistory',
+            name='changes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
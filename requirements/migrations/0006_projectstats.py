@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('requirements', '0005_requirementhistory_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requirement_count', models.PositiveIntegerField(default=0)),
+                ('covered_count', models.PositiveIntegerField(default=0)),
+                ('counts', models.JSONField(blank=True, default=dict)),
+                ('last_changed_at', models.DateTimeField(blank=True, null=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='projects.project')),
+            ],
+            options={
+                'verbose_name_plural': 'Project Stats',
+            },
+        ),
+    ]
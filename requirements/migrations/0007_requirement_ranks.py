@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('requirements', '0006_projectstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requirement',
+            name='priority_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(priority='High', then=models.Value(1)), models.When(priority='Medium', then=models.Value(2)), models.When(priority='Low', then=models.Value(3)), default=models.Value(0)), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='requirement',
+            name='status_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status='Draft', then=models.Value(1)), models.When(status='In Review', then=models.Value(2)), models.When(status='Approved', then=models.Value(3)), models.When(status='Rejected', then=models.Value(4)), models.When(status='Implemented', then=models.Value(5)), models.When(status='Verified', then=models.Value(6)), default=models.Value(0)), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=models.Index(fields=['project', 'status_rank', 'priority_rank'], name='requirement_workflow_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=models.Index(fields=['project', 'category', 'status_rank'], name='requirement_category_idx'),
+        ),
+    ]
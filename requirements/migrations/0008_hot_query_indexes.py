@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_organizationmember_member_role_idx'),
+        ('requirements', '0007_requirement_ranks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requirement',
+            index=models.Index(fields=['project', 'status'], name='requirement_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requirementhistory',
+            index=models.Index(fields=['requirement', '-timestamp'], name='history_timeline_idx'),
+        ),
+    ]
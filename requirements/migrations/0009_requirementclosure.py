@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    """Record the paths of existing hierarchies, cutting any parent loops found on the way"""
+    Requirement = apps.get_model('requirements', 'Requirement')
+    RequirementClosure = apps.get_model('requirements', 'RequirementClosure')
+
+    parents = dict(Requirement.objects.values_list('pk', 'parent_id'))
+    paths = {}
+    for pk in parents:
+        chain = []
+        node = pk
+        while node is not None and node not in paths:
+            if node in chain:
+                # Nothing used to prevent loops; the requirement closing one becomes a root
+                Requirement.objects.filter(pk=chain[-1]).update(parent=None)
+                parents[chain[-1]] = None
+                break
+            chain.append(node)
+            node = parents[node]
+        for node in reversed(chain):
+            above = paths.get(parents[node], [])
+            paths[node] = [(node, 0)] + [(ancestor_id, depth + 1) for ancestor_id, depth in above]
+
+    RequirementClosure.objects.bulk_create(
+        RequirementClosure(ancestor_id=ancestor_id, descendant_id=pk, depth=depth)
+        for pk, rows in paths.items()
+        for ancestor_id, depth in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requirements', '0008_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequirementClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='requirements.requirement')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='requirements.requirement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='closure_ancestors_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:55
+
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_descendants(apps, schema_editor):
+    """Fill in the progress rollup of existing parent requirements"""
+    Requirement = apps.get_model('requirements', 'Requirement')
+    RequirementClosure = apps.get_model('requirements', 'RequirementClosure')
+    done_statuses = ('Implemented', 'Verified')
+
+    statuses = defaultdict(Counter)
+    counts = (
+        RequirementClosure.objects.filter(depth__gt=0)
+        .values_list('ancestor_id', 'descendant__status').annotate(count=Count('pk')).order_by()
+    )
+    for ancestor_id, status, count in counts.iterator():
+        statuses[ancestor_id][status] = count
+
+    requirements = []
+    for requirement in Requirement.objects.filter(pk__in=statuses).only('pk'):
+        counts = statuses[requirement.pk]
+        requirement.descendant_statuses = dict(counts)
+        requirement.descendant_count = sum(counts.values())
+        requirement.descendant_done_count = sum(counts[status] for status in done_statuses)
+        requirements.append(requirement)
+    Requirement.objects.bulk_update(
+        requirements, ['descendant_count', 'descendant_done_count', 'descendant_statuses'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requirements', '0009_requirementclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requirement',
+            name='descendant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='requirement',
+            name='descendant_done_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='requirement',
+            name='descendant_statuses',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(count_descendants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:19
+
+import django.db.models.deletion
+import requirements.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_organizationmember_member_role_idx'),
+        ('requirements', '0010_requirement_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectCacheVersion',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cache_version', serialize=False, to='projects.project')),
+                ('data_version', models.BigIntegerField(default=requirements.models.new_cache_version)),
+                ('graph_version', models.BigIntegerField(default=requirements.models.new_cache_version)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requirements', '0011_project_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectcacheversion',
+            name='data_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,13 +1,188 @@
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 from projects.models import Project
-from django.conf import settings
+import copy
 import logging
+import re
+import secrets
 
 logger = logging.getLogger(__name__)
 
+IDENTIFIER_PREFIX = 'REQ-'
+IDENTIFIER_PATTERN = re.compile(r'^REQ-(\d+)$')
+
+def format_identifier(number):
+    """Render a sequence number as a requirement identifier, e.g. 7 -> REQ-007"""
+    return f"{IDENTIFIER_PREFIX}{number:03d}"
+
+def parse_identifier(identifier):
+    """Return the sequence number of an auto-style identifier, or None"""
+    match = IDENTIFIER_PATTERN.match(identifier or '')
+    return int(match.group(1)) if match else None
+
+def progress_percent(done, total):
+    """Whole percentage of `total` that is done, or None when there is nothing to count"""
+    if not total:
+        return None
+    return round(100 * done / total)
+
+def new_cache_version():
+    """A random cache version token, so a rolled back change cannot reuse one"""
+    return secrets.randbits(62)
+
+def choice_rank(field_name, choices):
+    """
+    SQL expression numbering a choice field in the order of its choices
+    (1 = first), so it sorts by meaning rather than alphabetically
+    """
+    return Case(
+        *(When(**{field_name: value}, then=Value(rank)) for rank, (value, _) in enumerate(choices, start=1)),
+        default=Value(0),
+    )
+
+class RequirementSequenceManager(models.Manager):
+    def reserve(self, project, count=1):
+        """
+        Atomically reserve `count` consecutive numbers for a project and
+        return them as a range. The counter row is bumped with a single
+        UPDATE, which holds the row (or database) lock until the surrounding
+        transaction commits, so concurrent creators never see the same value.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        
+        with transaction.atomic():
+            updated = self.filter(project=project).update(last_value=F('last_value') + count)
+            if not updated:
+                self._create_for(project, count)
+            last_value = self.filter(project=project).values_list('last_value', flat=True).get()
+        
+        return range(last_value - count + 1, last_value + 1)
+    
+    def allocate(self, project, count=1):
+        """Reserve a block of identifiers for bulk inserts"""
+        return [format_identifier(number) for number in self.reserve(project, count)]
+    
+    def bump_to(self, project, number):
+        """Make sure the counter is at least `number` (used for explicit identifiers)"""
+        with transaction.atomic():
+            updated = self.filter(project=project).update(last_value=Greatest(F('last_value'), number))
+            if not updated:
+                self._create_for(project, 0, minimum=number)
+    
+    def _create_for(self, project, count, minimum=0):
+        # Projects created before the sequence existed are seeded once from their data
+        seed = max(self.model.highest_used_number(project), minimum)
+        try:
+            with transaction.atomic():
+                self.create(project=project, last_value=seed + count)
+        except IntegrityError:
+            # Another writer created the row first; apply our increment to theirs
+            self.filter(project=project).update(
+                last_value=Greatest(F('last_value') + count, minimum)
+            )
+
+class RequirementSequence(models.Model):
+    """Per-project counter that hands out REQ-### identifiers"""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, related_name='requirement_sequence')
+    last_value = models.PositiveIntegerField(default=0)
+    
+    objects = RequirementSequenceManager()
+    
+    def __str__(self):
+        return f"{self.project} - {format_identifier(self.last_value)}"
+    
+    @staticmethod
+    def highest_used_number(project):
+        """Scan a project's identifiers for the highest REQ-### number in use"""
+        numbers = (
+            parse_identifier(identifier)
+            for identifier in Requirement.objects.filter(
+                project=project, identifier__startswith=IDENTIFIER_PREFIX
+            ).values_list('identifier', flat=True).iterator()
+        )
+        return max((n for n in numbers if n is not None), default=0)
+
+class ChangeTrackingMixin:
+    """
+    Remembers the column values an instance was loaded with, so changes can
+    be detected without re-reading the row. Saving an instance that came
+    from the database only writes the columns that actually changed.
+    """
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._take_snapshot()
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._take_snapshot(fields)
+    
+    def _take_snapshot(self, fields=None):
+        if fields is None or not self.has_snapshot():
+            self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue  # Deferred fields are snapshotted once they are loaded
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            value = self.__dict__[field.attname]
+            # JSON values can be changed in place, so keep a copy to compare against
+            self._loaded_values[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+    
+    def has_snapshot(self):
+        return '_loaded_values' in self.__dict__
+    
+    def changed_fields(self):
+        """
+        Return the names of concrete fields that differ from the snapshot.
+        Without a snapshot every loaded field is considered changed.
+        """
+        loaded = self.__dict__.get('_loaded_values')
+        changed = set()
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if loaded is None or field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname]:
+                changed.add(field.name)
+        return changed
+    
+    def previous(self, field_name):
+        """
+        Return the value a field was loaded with (the raw id for foreign keys),
+        or its current value if it has not been loaded.
+        """
+        attname = self._meta.get_field(field_name).attname
+        loaded = self.__dict__.get('_loaded_values', {})
+        return loaded[attname] if attname in loaded else getattr(self, attname)
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if (not adding and self.has_snapshot() and not args
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert')):
+            changed = self.changed_fields()
+            if not changed:
+                return
+            # auto_now columns are only refreshed when they are written
+            kwargs['update_fields'] = changed | {
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False)
+            }
+        super().save(*args, **kwargs)
+        if not adding:
+            # Updates do not return generated columns, so reload them when next read
+            for field in self._meta.concrete_fields:
+                if field.generated:
+                    self.__dict__.pop(field.attname, None)
+        self._take_snapshot()
+
 class RequirementCategory(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -19,7 +194,7 @@ class RequirementCategory(models.Model):
     def __str__(self):
         return self.name
 
-class Requirement(models.Model):
+class Requirement(ChangeTrackingMixin, models.Model):
     PRIORITY_CHOICES = [
         ('High', 'High'), 
         ('Medium', 'Medium'), 
@@ -33,6 +208,8 @@ class Requirement(models.Model):
         ('Implemented', 'Implemented'),
         ('Verified', 'Verified')
     ]
+    # Statuses that count as done in the progress of a parent requirement
+    DONE_STATUSES = ('Implemented', 'Verified')
     TYPE_CHOICES = [
         ('Functional', 'Functional'),
         ('Non-functional', 'Non-functional'),
@@ -54,6 +231,18 @@ class Requirement(models.Model):
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='Medium')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Draft')
     
+    # Computed by the database from status/priority, so every write keeps them in sync
+    status_rank = models.GeneratedField(
+        expression=choice_rank('status', STATUS_CHOICES),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+    priority_rank = models.GeneratedField(
+        expression=choice_rank('priority', PRIORITY_CHOICES),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+    
     # Metadata
     created_by = models.ForeignKey(User, related_name='requirements_created', on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -64,9 +253,21 @@ class Requirement(models.Model):
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
     related_requirements = models.ManyToManyField('self', blank=True, symmetrical=False, related_name='related_to')
     objectives = models.ManyToManyField("ProjectObjective", blank=True, related_name='requirements')
+    
+    # Progress of everything below this requirement, kept by requirements.rollup
+    descendant_count = models.PositiveIntegerField(default=0, editable=False)
+    descendant_done_count = models.PositiveIntegerField(default=0, editable=False)
+    descendant_statuses = models.JSONField(default=dict, blank=True, editable=False)  # {status: count}
 
     class Meta:
         unique_together = ('project', 'identifier')
+        indexes = [
+            # Status tabs and the status filter of the requirement list
+            models.Index(fields=['project', 'status'], name='requirement_status_idx'),
+            # Workflow ordering: status, then High before Low
+            models.Index(fields=['project', 'status_rank', 'priority_rank'], name='requirement_workflow_idx'),
+            models.Index(fields=['project', 'category', 'status_rank'], name='requirement_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.identifier} - {self.title}"
@@ -74,6 +275,30 @@ class Requirement(models.Model):
     def get_absolute_url(self):
         return reverse('requirement-detail', kwargs={'pk': self.pk})
     
+    @property
+    def progress(self):
+        """Percentage of the requirements below this one that are done, None for a leaf"""
+        return progress_percent(self.descendant_done_count, self.descendant_count)
+    
+    def status_rollup(self):
+        """[(status, label, count)] of the requirements below this one, in workflow order"""
+        return [
+            (value, label, self.descendant_statuses[value])
+            for value, label in self.STATUS_CHOICES if self.descendant_statuses.get(value)
+        ]
+    
+    def merge_rollup(self, delta):
+        """Add a {status: change} delta for the requirements below this one"""
+        for status, change in delta.items():
+            count = self.descendant_statuses.get(status, 0) + change
+            if count:
+                self.descendant_statuses[status] = count
+            else:
+                self.descendant_statuses.pop(status, None)
+            self.descendant_count += change
+            if status in self.DONE_STATUSES:
+                self.descendant_done_count += change
+    
     def save(self, *args, **kwargs):
         # Extract user from kwargs if present
         user = kwargs.pop('user', None)
@@ -82,49 +307,65 @@ class Requirement(models.Model):
         if len(self.title) > 200:
             self.title = self.title[:200]
         
-        # Generate a unique identifier if not already set
-        if not self.identifier:
-            # Get the highest identifier number for this project
-            from django.db.models import Max
-            from django.db.models.functions import Substr, Cast
-            from django.db.models import IntegerField
+        from . import audit, hierarchy, rollup, stats
+        
+        adding = self._state.adding
+        with audit.collect(), stats.track(self):
+            # Generate a unique identifier if not already set. The sequence row
+            # stays locked until the insert commits.
+            if not self.identifier:
+                number = RequirementSequence.objects.reserve(self.project)[0]
+                self.identifier = format_identifier(number)
+            elif self._state.adding or 'identifier' in self.changed_fields():
+                # Keep the counter ahead of explicitly chosen REQ-### identifiers
+                number = parse_identifier(self.identifier)
+                if number is not None:
+                    RequirementSequence.objects.bump_to(self.project, number)
             
-            last_req = Requirement.objects.filter(project=self.project).annotate(
-                num=Cast(
-                    Substr('identifier', 5),  # Extract the number part after "REQ-"
-                    IntegerField()
-                )
-            ).aggregate(max_num=Max('num'))
+            # Previous values come from the snapshot taken when the row was loaded
+            changes = audit.diff(self)
+            if 'parent' in changes:
+                hierarchy.check_parent(self, self.parent_id)
             
-            next_num = 1
-            if last_req['max_num'] is not None:
-                next_num = last_req['max_num'] + 1
-                
-            self.identifier = f"REQ-{next_num:03d}"
-        
-        # Get the current instance if it exists
-        try:
-            old_instance = Requirement.objects.get(pk=self.pk)
-        except Requirement.DoesNotExist:
-            old_instance = None
-        
-        # Call the parent save method
-        super().save(*args, **kwargs)
+            # Call the parent save method
+            super().save(*args, **kwargs)
+            
+            logger.debug(f"Saving requirement {self.pk} with status {self.status}")
+            if adding:
+                hierarchy.insert(self)
+                if self.parent_id is not None:
+                    rollup.apply(self.pk, {self.status: 1})
+            elif 'parent' in changes:
+                # The subtree leaves its old ancestors' counts and joins the new ones
+                old_status = changes['status'][0] if 'status' in changes else None
+                rollup.apply(self.pk, rollup.negate(rollup.subtree_counts(self.pk, old_status)))
+                hierarchy.move(self.pk, self.parent_id)
+                rollup.apply(self.pk, rollup.subtree_counts(self.pk))
+            elif 'status' in changes and self.parent_id is not None:
+                old_status, new_status = changes['status']
+                rollup.apply(self.pk, {old_status: -1, new_status: 1})
+            if changes:
+                audit.record(self, changes, user)
 
-        logger.debug(f"Saving requirement {self.pk} with status {self.status}")
-        if old_instance:
-            logger.debug(f"Previous status was {old_instance.status}")
-        
-        # Track status changes if enabled in settings
-        if (old_instance and 
-            old_instance.status != self.status and 
-            getattr(settings, 'REQUIREMENTS_TRACK_HISTORY', True)):
-            RequirementHistory.objects.create(
-                requirement=self,
-                status=self.status,
-                changed_by=user,  # Now using the user parameter
-                notes=f"Status changed from {old_instance.status} to {self.status}"
-            )
+class RequirementClosure(models.Model):
+    """
+    Every (ancestor, descendant) pair of the parent hierarchy, with the number
+    of levels between them. Each requirement is also its own ancestor at
+    depth 0. Kept in step with Requirement.parent by requirements.hierarchy.
+    """
+    ancestor = models.ForeignKey(Requirement, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Requirement, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+    
+    class Meta:
+        # The unique index answers subtree queries, the other one ancestor queries
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='closure_ancestors_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
         
 class RequirementHistory(models.Model):
     requirement = models.ForeignKey(Requirement, on_delete=models.CASCADE, related_name='history')
@@ -132,10 +373,15 @@ class RequirementHistory(models.Model):
     changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True)
+    changes = models.JSONField(default=dict, blank=True)  # {field: [old, new]}
     
     class Meta:
         verbose_name_plural = "Requirement Histories"
         ordering = ['-timestamp']
+        indexes = [
+            # A requirement's timeline, newest first
+            models.Index(fields=['requirement', '-timestamp'], name='history_timeline_idx'),
+        ]
     
     def __str__(self):
         return f"{self.requirement.identifier} - {self.status} - {self.timestamp}"
@@ -151,4 +397,73 @@ class ProjectObjective(models.Model):
         return self.title
         
     class Meta:
-        ordering = ['created_at']
\ No newline at end of file
+        ordering = ['created_at']
+
+class ProjectStats(models.Model):
+    """
+    Running requirement counts for a project. Kept current by
+    requirements.stats in the same transaction as each change.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, related_name='stats')
+    requirement_count = models.PositiveIntegerField(default=0)
+    covered_count = models.PositiveIntegerField(default=0)  # Requirements linked to at least one objective
+    counts = models.JSONField(default=dict, blank=True)  # {facet: {value: count}}, ids as strings, '' = none
+    last_changed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = "Project Stats"
+    
+    def __str__(self):
+        return f"{self.project} - {self.requirement_count} requirements"
+    
+    @property
+    def coverage(self):
+        """Percentage of requirements linked to at least one objective"""
+        if not self.requirement_count:
+            return 0
+        return round(100 * self.covered_count / self.requirement_count)
+    
+    def merge(self, delta):
+        """Add a {(facet, value): change} delta to the counts"""
+        for (facet, value), change in delta.items():
+            if facet == 'total':
+                self.requirement_count += change
+            elif facet == 'covered':
+                self.covered_count += change
+            else:
+                counts = self.counts.setdefault(facet, {})
+                key = '' if value is None else str(value)
+                counts[key] = counts.get(key, 0) + change
+                if not counts[key]:
+                    del counts[key]
+    
+    def facets(self):
+        """The counts as FacetCounts, as facet_counts() would return them"""
+        from .facets import FacetCounts
+        
+        facets = FacetCounts(total=self.requirement_count)
+        for facet in ('status', 'priority', 'type'):
+            getattr(facets, facet).update(self.counts.get(facet, {}))
+        facets.category.update({
+            int(key) if key else None: count
+            for key, count in self.counts.get('category', {}).items()
+        })
+        return facets
+    
+    def objective_counts(self):
+        """{objective id: number of linked requirements}"""
+        return {int(key): count for key, count in self.counts.get('objective', {}).items()}
+
+class ProjectCacheVersion(models.Model):
+    """
+    Tokens naming the current state of a project's cached data, one per
+    scope of requirements.caching. Replaced, never counted up, on change.
+    `data_changed_at` is when the data token was last replaced.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='cache_version')
+    data_version = models.BigIntegerField(default=new_cache_version)
+    graph_version = models.BigIntegerField(default=new_cache_version)
+    data_changed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.project} - cache version {self.data_version}"
@@ -0,0 +1,141 @@
+# requirements/pagination.py
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the sort key of their first or last row rather than by
+an offset, so every page costs one indexed range scan however deep it is. The
+cursor is a signed token that also carries the filter parameters it was
+issued for, which keeps a "next" link valid on its own.
+"""
+from dataclasses import dataclass, field
+
+from django.core import signing
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+from django.http import QueryDict
+
+CURSOR_SALT = 'requirements.pagination'
+
+
+class InvalidCursor(BadRequest):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str = None
+    previous_cursor: str = None
+    params: dict = field(default_factory=dict)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def encode_cursor(params, values, direction):
+    return signing.dumps({'p': params, 'k': values, 'd': direction}, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """Return (params, key values, direction) from a cursor token"""
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+        return data['p'], data['k'], data['d']
+    except (signing.BadSignature, KeyError, TypeError):
+        raise InvalidCursor("Invalid pagination cursor")
+
+
+def to_query(params, **overrides):
+    """Build a QueryDict from {key: [values]}, replacing keys with `overrides`"""
+    query = QueryDict(mutable=True)
+    for key, values in params.items():
+        query.setlist(key, values)
+    for key, value in overrides.items():
+        query[key] = value
+    return query
+
+
+def cursor_params(request, cursor_param='cursor'):
+    """
+    The filter parameters of a request. A cursor replaces the query string
+    with the parameters it was issued for.
+    """
+    token = request.GET.get(cursor_param)
+    if token:
+        params, _, _ = decode_cursor(token)
+        return to_query(params)
+    return request.GET
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on `ordering`, a sequence of field names (prefix "-"
+    for descending) whose last entry must be unique, typically "pk".
+    """
+
+    def __init__(self, ordering, per_page):
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+
+    def _fields(self, reverse=False):
+        for name in self.ordering:
+            descending = name.startswith('-')
+            yield name.lstrip('-'), descending != reverse
+
+    def _after(self, values, reverse=False):
+        """Rows strictly after `values` in the (possibly reversed) ordering"""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self._fields(reverse), values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name, _ in self._fields()]
+
+    def paginate(self, queryset, token=None, params=None):
+        params = params or {}
+        direction = 'next'
+        if token:
+            _, values, direction = decode_cursor(token)
+            if len(values) != len(self.ordering) or direction not in ('next', 'previous'):
+                raise InvalidCursor("Invalid pagination cursor")
+        reverse = direction == 'previous'
+
+        ordering = [('-' if descending else '') + name for name, descending in self._fields(reverse)]
+        queryset = queryset.order_by(*ordering)
+        if token:
+            queryset = queryset.filter(self._after(values, reverse))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        # Coming from a cursor means there is a page on the side we came from
+        more_before, more_after = (has_more, bool(token)) if reverse else (bool(token), has_more)
+
+        page = KeysetPage(rows, params=params)
+        if rows and more_after:
+            page.next_cursor = encode_cursor(params, self._key(rows[-1]), 'next')
+        if rows and more_before:
+            page.previous_cursor = encode_cursor(params, self._key(rows[0]), 'previous')
+        return page
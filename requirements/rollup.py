@@ -0,0 +1,116 @@
+# requirements/rollup.py
+"""
+Progress rollup of the parent hierarchy.
+
+Every requirement stores how many requirements are below it, how many of
+those are done (Implemented or Verified) and a count per status. A change
+turns into a {status: change} delta that is merged into the rows of the
+requirement's ancestors (one closure-table query finds them all) under row
+locks, in the same transaction as the change:
+
+- Requirement.save() applies the status change, or moves the requirement's
+  whole subtree from its old ancestors to its new ones
+- deletes go through `requirement_deleted` (pre_delete), before the
+  hierarchy forgets the deleted requirement's ancestors
+- bulk writers call `record_created()`; `hierarchy.move_subtree()` moves
+  the counts with the subtrees
+
+Pages read the stored counts, so showing progress never walks the tree.
+`manage.py rebuild_hierarchy` recounts them together with the paths.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Requirement, RequirementClosure
+from .stats import removes_project
+
+ROLLUP_FIELDS = ['descendant_count', 'descendant_done_count', 'descendant_statuses']
+
+
+def subtree_counts(requirement_id, status=None):
+    """
+    {status: count} over a requirement and everything below it, as stored.
+    `status` overrides the requirement's own status (e.g. the one it had).
+    """
+    row = Requirement.objects.filter(pk=requirement_id).values_list('status', 'descendant_statuses').first()
+    if row is None:
+        return Counter()
+    counts = Counter(row[1])
+    counts[status or row[0]] += 1
+    return counts
+
+
+def negate(counts):
+    return {status: -count for status, count in counts.items()}
+
+
+def apply(requirement_id, delta):
+    """Merge a {status: change} delta into every ancestor of a requirement"""
+    delta = {status: change for status, change in delta.items() if change}
+    if not delta:
+        return
+
+    with transaction.atomic(savepoint=False):
+        # Lock in pk order so concurrent changes under a shared ancestor cannot deadlock
+        ancestors = list(
+            Requirement.objects.select_for_update(of=('self',)).filter(
+                descendant_links__descendant_id=requirement_id, descendant_links__depth__gt=0
+            ).order_by('pk').only('pk', *ROLLUP_FIELDS)
+        )
+        for ancestor in ancestors:
+            ancestor.merge_rollup(delta)
+        if ancestors:
+            Requirement.objects.bulk_update(ancestors, ROLLUP_FIELDS)
+
+
+def apply_many(deltas):
+    """Merge {ancestor id: delta} into those requirements"""
+    deltas = {pk: delta for pk, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+
+    with transaction.atomic(savepoint=False):
+        ancestors = list(
+            Requirement.objects.select_for_update().filter(pk__in=deltas).order_by('pk').only('pk', *ROLLUP_FIELDS)
+        )
+        for ancestor in ancestors:
+            ancestor.merge_rollup(deltas[ancestor.pk])
+        Requirement.objects.bulk_update(ancestors, ROLLUP_FIELDS)
+
+
+def record_created(requirements):
+    """Count requirements inserted with bulk_create, once their hierarchy paths exist"""
+    statuses = {requirement.pk: requirement.status for requirement in requirements}
+    deltas = defaultdict(Counter)
+    for ancestor_id, descendant_id in RequirementClosure.objects.filter(
+        descendant_id__in=statuses, depth__gt=0
+    ).values_list('ancestor_id', 'descendant_id'):
+        deltas[ancestor_id][statuses[descendant_id]] += 1
+    apply_many(deltas)
+
+
+def rebuild(project_id):
+    """Recount the rollups of a project's requirements from the stored paths"""
+    deltas = defaultdict(Counter)
+    for ancestor_id, status, count in RequirementClosure.objects.filter(
+        ancestor__project_id=project_id, depth__gt=0
+    ).values_list('ancestor_id', 'descendant__status').annotate(count=Count('pk')).order_by():
+        deltas[ancestor_id][status] = count
+
+    with transaction.atomic():
+        requirements = list(Requirement.objects.filter(project_id=project_id).only('pk', *ROLLUP_FIELDS))
+        for requirement in requirements:
+            requirement.descendant_count = 0
+            requirement.descendant_done_count = 0
+            requirement.descendant_statuses = {}
+            requirement.merge_rollup(deltas.get(requirement.pk, {}))
+        Requirement.objects.bulk_update(requirements, ROLLUP_FIELDS, batch_size=500)
+
+
+def requirement_deleted(sender, instance, origin=None, **kwargs):
+    """The requirement's ancestors lose it and everything below it, whose top now becomes a root"""
+    if removes_project(origin):
+        return
+    apply(instance.pk, negate(subtree_counts(instance.pk)))
@@ -0,0 +1,185 @@
+# requirements/rows.py
+"""
+The shared "requirement row" query used by the requirement tables.
+
+Everything a row displays beyond its own columns is annotated in SQL: the
+category name through a join, and the child, objective and related counts
+through correlated subqueries (so they neither multiply rows nor need a
+GROUP BY). Rendering a page of rows therefore takes the same number of
+queries however many rows it has.
+
+Read-only pages can go one step further with `values()`, which materializes
+rows as compact named tuples straight from a values_list cursor instead of
+Requirement instances, with the display helpers the templates need.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Requirement, progress_percent
+
+# Columns a requirement table row shows
+TABLE_FIELDS = (
+    'id', 'identifier', 'title', 'type', 'priority', 'status', 'created_at',
+    'category_name', 'child_count', 'objective_count', 'descendant_count', 'descendant_done_count',
+)
+
+STATUS_BADGES = {
+    'Draft': 'bg-secondary',
+    'In Review': 'bg-info',
+    'Approved': 'bg-success',
+    'Rejected': 'bg-danger',
+    'Implemented': 'bg-primary',
+    'Verified': 'bg-dark',
+}
+
+PRIORITY_BADGES = {
+    'High': 'bg-danger',
+    'Medium': 'bg-warning text-dark',
+    'Low': 'bg-success',
+}
+
+STATUS_DISPLAY = dict(Requirement.STATUS_CHOICES)
+PRIORITY_DISPLAY = dict(Requirement.PRIORITY_CHOICES)
+TYPE_DISPLAY = dict(Requirement.TYPE_CHOICES)
+
+
+def count_of(queryset, field):
+    """Correlated COUNT of `queryset` rows whose `field` points at the outer requirement"""
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(count=Count('*')).values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def row_annotations():
+    return {
+        'category_name': F('category__name'),
+        'child_count': count_of(Requirement.objects.all(), 'parent'),
+        'objective_count': count_of(Requirement.objectives.through.objects.all(), 'requirement'),
+        'related_count': count_of(Requirement.related_requirements.through.objects.all(), 'from_requirement'),
+    }
+
+
+def annotate(queryset, *names):
+    """Add the row annotations (or only the named ones) to a requirement queryset"""
+    annotations = row_annotations()
+    if names:
+        annotations = {name: annotations[name] for name in names}
+    return queryset.annotate(**annotations)
+
+
+class RowDisplay:
+    """Display helpers shared by every row class; rows are plain tuples underneath"""
+    __slots__ = ()
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __reduce__(self):
+        # Row classes are made on the fly, so rows pickle as their columns and values
+        return make_row, (self._fields, tuple(self))
+
+    def get_status_display(self):
+        return STATUS_DISPLAY.get(self.status, self.status)
+
+    def get_priority_display(self):
+        return PRIORITY_DISPLAY.get(self.priority, self.priority)
+
+    def get_type_display(self):
+        return TYPE_DISPLAY.get(self.type, self.type)
+
+    @property
+    def progress(self):
+        return progress_percent(self.descendant_done_count, self.descendant_count)
+    
+    @property
+    def status_badge(self):
+        return STATUS_BADGES.get(self.status, 'bg-secondary')
+
+    @property
+    def priority_badge(self):
+        return PRIORITY_BADGES.get(self.priority, 'bg-secondary')
+
+
+@lru_cache
+def row_class(*names):
+    """A named tuple class for rows with the given columns"""
+    return type('RequirementRow', (RowDisplay, namedtuple('RequirementRow', names)), {'__slots__': ()})
+
+
+def make_row(fields, values):
+    return row_class(*fields)._make(values)
+
+
+class Rows:
+    """
+    A values_list queryset whose rows come out as RequirementRow tuples.
+    Filtering, ordering and slicing give another Rows, so pages can still be
+    narrowed in SQL and iterated in chunks; the rows are read once.
+    """
+
+    def __init__(self, queryset, fields):
+        self.queryset = queryset
+        self.fields = fields
+        self._rows = None
+
+    def _chain(self, queryset):
+        return Rows(queryset, self.fields)
+
+    def filter(self, *args, **kwargs):
+        return self._chain(self.queryset.filter(*args, **kwargs))
+
+    def exclude(self, *args, **kwargs):
+        return self._chain(self.queryset.exclude(*args, **kwargs))
+
+    def order_by(self, *fields):
+        return self._chain(self.queryset.order_by(*fields))
+
+    def explain(self, **options):
+        return self.queryset.explain(**options)
+
+    def iterator(self, chunk_size=None):
+        return self._make(self.queryset.iterator(chunk_size=chunk_size))
+
+    def get(self, *args, **kwargs):
+        return next(self._make([self.queryset.get(*args, **kwargs)]))
+
+    def _make(self, values):
+        tuple_class = row_class(*self.fields)
+        new = tuple.__new__
+        for row in values:
+            yield new(tuple_class, row)
+
+    def _fetch(self):
+        if self._rows is None:
+            self._rows = list(self._make(self.queryset))
+        return self._rows
+
+    def __getitem__(self, key):
+        if isinstance(key, slice) and self._rows is None:
+            return self._chain(self.queryset[key])
+        return self._fetch()[key]
+
+    def __iter__(self):
+        return iter(self._fetch())
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def __bool__(self):
+        return bool(self._fetch())
+
+
+def values(queryset, *fields):
+    """
+    Read `fields` (default TABLE_FIELDS, which needs the row annotations) as
+    read-only RequirementRow tuples. The result can still be filtered,
+    ordered, sliced and iterated in chunks like a queryset.
+    """
+    fields = fields or TABLE_FIELDS
+    return Rows(queryset.values_list(*fields), fields)
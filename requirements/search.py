@@ -0,0 +1,154 @@
+# requirements/search.py
+"""
+Full-text search over requirements.
+
+On SQLite the identifier, title, description and acceptance criteria are
+indexed in an FTS5 table that mirrors requirements_requirement. Triggers keep
+it in sync on every insert, update and delete, including bulk writes. The
+index lives outside Django's model state, so it is (re)installed after every
+migrate. Other databases, or SQLite builds without FTS5, fall back to
+case-insensitive matching without ranking.
+"""
+import re
+
+from django.db import connections, DEFAULT_DB_ALIAS, OperationalError
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Requirement
+
+FTS_TABLE = 'requirements_requirement_fts'
+INDEXED_COLUMNS = ('identifier', 'title', 'description', 'acceptance_criteria')
+# bm25 column weights, in INDEXED_COLUMNS order
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+# Control characters mark highlighted terms in snippets until they are escaped
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+_available = {}
+
+
+def _trigger_sql(table):
+    columns = ', '.join(INDEXED_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in INDEXED_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in INDEXED_COLUMNS)
+    delete_old = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return {
+        f'{FTS_TABLE}_ai': f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f'{FTS_TABLE}_ad': f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f'{FTS_TABLE}_au': (
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {table} "
+            f"BEGIN {delete_old} {insert_new} END"
+        ),
+    }
+
+
+def install(using=DEFAULT_DB_ALIAS):
+    """
+    Create the FTS5 table and its sync triggers if they are missing, and
+    rebuild the index when anything had to be created. Returns whether
+    full-text search is available on this database.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+
+    table = Requirement._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s, %s)",
+            [table, FTS_TABLE, *_trigger_sql(table)]
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if table not in existing:
+            return False  # Migrated back past the initial migration
+
+        created = False
+        if FTS_TABLE not in existing:
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    f"{', '.join(INDEXED_COLUMNS)}, content='{table}', content_rowid='id', "
+                    f"tokenize='unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:
+                # SQLite was built without FTS5
+                return False
+            created = True
+
+        for name, sql in _trigger_sql(table).items():
+            if name not in existing:
+                cursor.execute(sql)
+                created = True
+
+        if created:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    _available[using] = True
+    return True
+
+
+def install_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Table rebuilds during migrations drop the triggers, so check every time
+    _available.pop(using, None)
+    install(using)
+
+
+def is_available(using=DEFAULT_DB_ALIAS):
+    if using not in _available:
+        connection = connections[using]
+        available = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+                available = cursor.fetchone() is not None
+        _available[using] = available
+    return _available[using]
+
+
+def build_match(query):
+    """Turn free text into an FTS5 query: every word must match as a prefix"""
+    terms = re.findall(r'\w+', query or '')
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def apply(queryset, query):
+    """
+    Restrict a requirement queryset to matches for `query`, best first, and
+    annotate search_rank and search_snippet. The fallback path only filters.
+    """
+    match = build_match(query)
+    if match is None:
+        return queryset
+
+    if not is_available(queryset.db):
+        condition = Q()
+        for column in INDEXED_COLUMNS:
+            condition |= Q(**{f'{column}__icontains': query.strip()})
+        return queryset.filter(condition)
+
+    table = Requirement._meta.db_table
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    correlated = f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "{table}"."id"'
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+    ).annotate(
+        search_rank=RawSQL(f'SELECT bm25({FTS_TABLE}, {weights}) {correlated}', [match]),
+        search_snippet=RawSQL(
+            f"SELECT snippet({FTS_TABLE}, -1, char(2), char(3), '…', 16) {correlated}", [match]
+        ),
+    ).order_by('search_rank', 'pk')
+
+
+def highlight(snippet):
+    """Escape a snippet and wrap the matched terms in <mark>"""
+    if not snippet:
+        return ''
+    html = escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
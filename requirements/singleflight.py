@@ -0,0 +1,164 @@
+# requirements/singleflight.py
+"""
+Single-flight computations: when concurrent callers need the same missing
+result, one of them (the leader) computes and stores it while the others
+wait, then read what it stored.
+
+- Threads of a process wait on the leader's in-process flight.
+- Processes on a host take turns on a lock file per key in
+  REQUIREMENTS_LOCK_DIR (flock, so not on Windows, where only threads
+  coalesce). The holder removes the file before releasing it, so lock
+  files do not pile up; a waiter that was left holding a removed file
+  starts over on the new one.
+
+Waiting is capped by REQUIREMENTS_SINGLE_FLIGHT_TIMEOUT seconds, after
+which a caller computes the result itself rather than queueing behind a
+stuck leader.
+
+`run()` hands followers the whole result. For results stored piece by
+piece, `lead()` only picks the leader, and followers read the pieces as
+they appear.
+"""
+from contextlib import contextmanager
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MISSING = object()
+POLL_INTERVAL = 0.02
+
+_flights = {}
+_leaders = set()
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = MISSING
+
+
+def wait_timeout():
+    return getattr(settings, 'REQUIREMENTS_SINGLE_FLIGHT_TIMEOUT', 30)
+
+
+def lock_dir():
+    return getattr(settings, 'REQUIREMENTS_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'reqmanager-locks'))
+
+
+def run(key, compute, lookup, across_processes=True):
+    """
+    The result for `key`: what `lookup()` finds, or else what `compute()`
+    returns, called once for all concurrent callers. `compute()` must
+    store its result where `lookup()` finds it; `lookup()` returns MISSING
+    when there is nothing.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        flight.done.wait(wait_timeout())
+        value = lookup()
+        if value is MISSING:
+            # Not stored (too large, or the leader failed or is stuck)
+            value = flight.value if flight.value is not MISSING else compute()
+        return value
+
+    try:
+        with _file_lock(key) if across_processes else _no_lock():
+            value = lookup()
+            if value is MISSING:
+                value = compute()
+        flight.value = value
+        return value
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+@contextmanager
+def lead(key, across_processes=True):
+    """
+    Whether this caller leads for `key`, which it does until the block
+    exits; nobody waits. A follower that finds the leader gone can lead
+    next and carry on where it stopped.
+    """
+    with _flights_lock:
+        leader = key not in _leaders
+        if leader:
+            _leaders.add(key)
+    if not leader:
+        yield False
+        return
+    try:
+        with _file_lock(key, wait=False) if across_processes else _no_lock() as held:
+            yield held
+    finally:
+        with _flights_lock:
+            _leaders.discard(key)
+
+
+@contextmanager
+def _no_lock():
+    yield True
+
+
+@contextmanager
+def _file_lock(key, wait=True):
+    """
+    Hold the lock file of `key`. Yields False when another caller kept it
+    past the wait timeout (or at once, without `wait`); without flock or a
+    usable lock directory there is nothing to hold, and it yields True.
+    """
+    if fcntl is None:
+        yield True
+        return
+    path = os.path.join(lock_dir(), hashlib.md5(key.encode(), usedforsecurity=False).hexdigest() + '.lock')
+    held = True
+    try:
+        fd = _acquire(path, time.monotonic() + (wait_timeout() if wait else 0))
+        held = fd is not None
+    except OSError:
+        fd = None  # No usable lock directory
+    try:
+        yield held
+    finally:
+        if fd is not None:
+            # Remove the file first: waiters opened before this see it is gone
+            os.unlink(path)
+            os.close(fd)
+
+
+def _acquire(path, deadline):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    return None
+                time.sleep(POLL_INTERVAL)
+        try:
+            current = os.stat(path).st_ino == os.fstat(fd).st_ino
+        except FileNotFoundError:
+            current = False
+        if current:
+            return fd
+        os.close(fd)
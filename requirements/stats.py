@@ -0,0 +1,304 @@
+# requirements/stats.py
+"""
+Incrementally maintained per-project statistics.
+
+Every write that can change a project's counts turns into a delta of
+{(facet, value): change} that is merged into the project's ProjectStats row
+under a row lock, in the same transaction as the write:
+
+- Requirement.save() wraps the write in `track()`
+- deletes of requirements, objectives and categories go through the
+  pre_delete receivers below, while the rows still exist
+- objective links made through the related managers go through
+  `objective_links_changed`; bulk writers (the importer and the matrix batch
+  editor) call `record_created()` / `record_links()` themselves
+
+A missing row is rebuilt from the requirements table the first time it is
+needed (once, however many requests need it at the same time), so projects
+created before the table existed and rows removed for repair
+(`manage.py rebuild_project_stats`) heal on their own. QuerySet update()
+calls on counted fields bypass all of this and must rebuild.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from projects.models import Organization, Project
+
+from . import singleflight
+from .facets import facet_counts
+from .models import ProjectObjective, ProjectStats, Requirement
+
+# Counted facets and the requirement column each one reads
+FIELDS = {
+    'status': 'status',
+    'priority': 'priority',
+    'type': 'type',
+    'category': 'category_id',
+}
+
+TOTAL = ('total', None)
+COVERED = ('covered', None)
+
+
+def for_project(project):
+    """Return the project's stats, rebuilding them if they are missing"""
+    try:
+        stats = ProjectStats.objects.get(project=project)
+    except ProjectStats.DoesNotExist:
+        stats = rebuild_missing(project.pk)
+    stats.project = project
+    return stats
+
+
+def for_projects(projects):
+    """Return the projects as a list with their stats attached as `project.stats`"""
+    projects = list(projects)
+    found = {stats.project_id: stats for stats in ProjectStats.objects.filter(project__in=projects)}
+    for project in projects:
+        project.stats = found.get(project.pk) or rebuild_missing(project.pk)
+    return projects
+
+
+def rebuild_missing(project_id):
+    """Rebuild a missing stats row, once for concurrent callers"""
+    return singleflight.run(
+        f'requirements:stats:{project_id}', lambda: rebuild(project_id),
+        lambda: ProjectStats.objects.filter(project_id=project_id).first() or singleflight.MISSING,
+    )
+
+
+def rebuild(project_id):
+    """Recount a project's stats from scratch and store them"""
+    requirements = Requirement.objects.filter(project_id=project_id)
+    facets = facet_counts(requirements)
+
+    links = Requirement.objectives.through.objects.filter(
+        requirement__project_id=project_id, projectobjective__project_id=project_id
+    )
+    objective_counts = links.values_list('projectobjective_id').annotate(count=Count('pk')).order_by()
+
+    counts = {facet: {} for facet in (*FIELDS, 'objective')}
+    for facet in FIELDS:
+        for value, count in getattr(facets, facet).items():
+            counts[facet]['' if value is None else str(value)] = count
+    counts['objective'] = {str(objective_id): count for objective_id, count in objective_counts}
+
+    stats, _ = ProjectStats.objects.update_or_create(
+        project_id=project_id,
+        defaults={
+            'requirement_count': facets.total,
+            'covered_count': links.values('requirement_id').distinct().count(),
+            'counts': counts,
+            'last_changed_at': requirements.aggregate(last=Max('updated_at'))['last'],
+        },
+    )
+    return stats
+
+
+def apply(project_id, delta, create=True):
+    """
+    Merge a delta into a project's stats. A missing row is rebuilt when
+    `create` is set, which assumes the change is already written; otherwise
+    it is left for the next reader to rebuild.
+    """
+    delta = {key: change for key, change in delta.items() if change}
+    if not delta:
+        return
+
+    with transaction.atomic(savepoint=False):
+        stats = ProjectStats.objects.select_for_update().filter(project_id=project_id).first()
+        if stats is None:
+            if create:
+                rebuild(project_id)
+            return
+        stats.merge(delta)
+        stats.last_changed_at = timezone.now()
+        stats.save()
+
+
+def _values(requirement):
+    return {facet: getattr(requirement, attname) for facet, attname in FIELDS.items()}
+
+
+def _previous(requirement):
+    """(project id, counted values) the requirement had in the database, or None if it is new"""
+    if requirement._state.adding:
+        return None
+    if requirement.has_snapshot():
+        return requirement.previous('project'), {facet: requirement.previous(facet) for facet in FIELDS}
+    # Instances built by hand have no snapshot, so read the old values once
+    row = Requirement.objects.filter(pk=requirement.pk).values_list('project_id', *FIELDS.values()).first()
+    if row is None:
+        return None
+    return row[0], dict(zip(FIELDS, row[1:]))
+
+
+@contextmanager
+def track(requirement):
+    """Count a requirement save made inside the block once it has been written"""
+    previous = _previous(requirement)
+    yield
+    values = _values(requirement)
+
+    if previous is None:
+        delta = Counter({TOTAL: 1})
+        delta.update(values.items())
+        apply(requirement.project_id, delta)
+        return
+
+    old_project_id, old_values = previous
+    if old_project_id != requirement.project_id:
+        # Objective links do not follow a moved requirement, so count both sides again
+        rebuild(old_project_id)
+        rebuild(requirement.project_id)
+        return
+
+    delta = Counter()
+    for facet, value in values.items():
+        if old_values[facet] != value:
+            delta[(facet, old_values[facet])] -= 1
+            delta[(facet, value)] += 1
+    apply(requirement.project_id, delta)
+
+
+def record_created(requirements, links=()):
+    """
+    Count requirements inserted with bulk_create, plus their
+    [(requirement id, objective id)] links to objectives of their project.
+    """
+    deltas = defaultdict(Counter)
+    projects = {}
+    for requirement in requirements:
+        projects[requirement.pk] = requirement.project_id
+        delta = deltas[requirement.project_id]
+        delta[TOTAL] += 1
+        delta.update(_values(requirement).items())
+
+    covered = set()
+    for requirement_id, objective_id in links:
+        delta = deltas[projects[requirement_id]]
+        delta[('objective', objective_id)] += 1
+        if requirement_id not in covered:
+            covered.add(requirement_id)
+            delta[COVERED] += 1
+
+    for project_id, delta in deltas.items():
+        apply(project_id, delta)
+
+
+def record_links(added=(), removed=(), applied=True, project=None):
+    """
+    Count [(requirement id, objective id)] links that were added or removed.
+    Pass `applied=False` when the links are about to change rather than
+    already changed, and `project` when every id is known to belong to it.
+    Links to another project's objectives are not counted.
+    """
+    added, removed = list(added), list(removed)
+    if not added and not removed:
+        return
+
+    requirement_ids = {requirement_id for requirement_id, _ in added + removed}
+    objective_ids = {objective_id for _, objective_id in added + removed}
+    if project is not None:
+        objective_projects = dict.fromkeys(objective_ids, project.pk)
+    else:
+        objective_projects = dict(ProjectObjective.objects.filter(pk__in=objective_ids).values_list('pk', 'project_id'))
+    requirements = {
+        pk: (project_id, links)
+        for pk, project_id, links in Requirement.objects.filter(pk__in=requirement_ids).annotate(
+            links=Count('objectives', filter=Q(objectives__project=F('project')))
+        ).values_list('pk', 'project_id', 'links')
+    }
+
+    deltas = defaultdict(Counter)
+    changes = Counter()
+    for pairs, sign in ((added, 1), (removed, -1)):
+        for requirement_id, objective_id in pairs:
+            project_id = requirements.get(requirement_id, (None, 0))[0]
+            if project_id is None or objective_projects.get(objective_id) != project_id:
+                continue
+            deltas[project_id][('objective', objective_id)] += sign
+            changes[requirement_id] += sign
+
+    for requirement_id, change in changes.items():
+        project_id, links = requirements[requirement_id]
+        before, after = (links - change, links) if applied else (links, links + change)
+        deltas[project_id][COVERED] += bool(after) - bool(before)
+
+    for project_id, delta in deltas.items():
+        apply(project_id, delta, create=applied)
+
+
+def removes_project(origin):
+    """Whether a delete started from a project or organization, whose stats go with it"""
+    model = origin if isinstance(origin, type) else getattr(origin, 'model', type(origin))
+    return model in (Project, Organization)
+
+
+def requirement_deleted(sender, instance, origin=None, **kwargs):
+    if removes_project(origin):
+        return
+
+    # The instance may be stale (e.g. its category was just deleted), so count the stored row
+    row = Requirement.objects.filter(pk=instance.pk).values_list('project_id', *FIELDS.values()).first()
+    if row is None:
+        return
+    project_id, values = row[0], dict(zip(FIELDS, row[1:]))
+
+    delta = Counter({TOTAL: -1})
+    delta.subtract(values.items())
+    objective_ids = list(
+        Requirement.objectives.through.objects.filter(
+            requirement_id=instance.pk, projectobjective__project_id=project_id
+        ).values_list('projectobjective_id', flat=True)
+    )
+    delta.subtract(('objective', objective_id) for objective_id in objective_ids)
+    if objective_ids:
+        delta[COVERED] -= 1
+    apply(project_id, delta, create=False)
+
+
+def objective_deleted(sender, instance, origin=None, **kwargs):
+    if removes_project(origin):
+        return
+
+    links = Requirement.objectives.through.objects.filter(projectobjective_id=instance.pk)
+    record_links(removed=links.values_list('requirement_id', 'projectobjective_id'), applied=False)
+
+
+def category_deleted(sender, instance, origin=None, **kwargs):
+    if removes_project(origin):
+        return
+
+    # Its requirements become uncategorized through SET_NULL
+    counts = (
+        Requirement.objects.filter(category_id=instance.pk)
+        .values_list('project_id').annotate(count=Count('pk')).order_by()
+    )
+    for project_id, count in counts:
+        apply(project_id, {('category', instance.pk): -count, ('category', None): count}, create=False)
+
+
+def objective_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed receiver for Requirement.objectives, from either side"""
+    if action == 'post_add':
+        # Django only reports the links that were actually missing
+        if reverse:
+            record_links(added=[(pk, instance.pk) for pk in pk_set])
+        else:
+            record_links(added=[(instance.pk, pk) for pk in pk_set])
+    elif action in ('pre_remove', 'pre_clear'):
+        # Removals report what was asked for, so read what is really linked
+        if reverse:
+            links = sender.objects.filter(projectobjective_id=instance.pk)
+            if action == 'pre_remove':
+                links = links.filter(requirement_id__in=pk_set)
+        else:
+            links = sender.objects.filter(requirement_id=instance.pk)
+            if action == 'pre_remove':
+                links = links.filter(projectobjective_id__in=pk_set)
+        record_links(removed=links.values_list('requirement_id', 'projectobjective_id'), applied=False)
@@ -0,0 +1,12 @@
+# requirements/templatetags/requirement_tags.py
+from django import template
+
+from requirements import search
+
+register = template.Library()
+
+
+@register.filter
+def highlight(snippet):
+    """Render a search snippet with the matched terms marked"""
+    return search.highlight(snippet)
@@ -0,0 +1,150 @@
+"""
+Query-plan regression tests for the hot queries of the project and
+requirement pages. Each query is explained against a seeded database and
+fails if SQLite would read a whole table instead of searching an index.
+"""
+import re
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from projects import access
+from projects.models import Organization, OrganizationMember, Project
+from requirements import hierarchy, rows, search
+from requirements.models import (
+    Requirement, RequirementCategory, RequirementHistory, ProjectObjective, ProjectStats
+)
+from requirements.pagination import KeysetPaginator
+
+# "SCAN <table>" without "USING ... INDEX" is a full table scan; a full-text
+# table's "VIRTUAL TABLE INDEX" is a lookup in its own index
+FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING| VIRTUAL TABLE INDEX)(?:\s|$)')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "Plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(TestCase):
+    """Test the hot queries are answered from indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='password123')
+        cls.organizations = Organization.objects.bulk_create([Organization(name=f'Org {i}') for i in range(5)])
+        OrganizationMember.objects.bulk_create([
+            OrganizationMember(user=cls.user, organization=organization, role='admin' if i % 2 else 'member')
+            for i, organization in enumerate(cls.organizations)
+        ])
+        cls.projects = Project.objects.bulk_create([
+            Project(name=f'Project {i}', organization=cls.organizations[i % 5], created_by=cls.user)
+            for i in range(10)
+        ])
+        cls.project = cls.projects[0]
+        cls.categories = RequirementCategory.objects.bulk_create([
+            RequirementCategory(name=f'Category {i}', project=project)
+            for i, project in enumerate(cls.projects)
+        ])
+        cls.category = cls.categories[0]
+
+        statuses = [value for value, _ in Requirement.STATUS_CHOICES]
+        priorities = [value for value, _ in Requirement.PRIORITY_CHOICES]
+        cls.requirements = Requirement.objects.bulk_create([
+            Requirement(
+                project=project, identifier=f'REQ-{i:04d}', title=f'Requirement {i}',
+                description='Description', status=statuses[i % len(statuses)],
+                priority=priorities[i % len(priorities)],
+                category=cls.categories[i % 10] if i % 3 else None,
+            )
+            for i, project in ((i, cls.projects[i % 10]) for i in range(500))
+        ])
+        cls.requirement = cls.requirements[0]
+        RequirementHistory.objects.bulk_create([
+            RequirementHistory(requirement=requirement, status=requirement.status, notes='Created')
+            for requirement in cls.requirements
+        ])
+        cls.objective = ProjectObjective.objects.create(title='Objective', project=cls.project)
+        cls.requirement.objectives.add(cls.objective)
+
+    def assertUsesIndexes(self, query):
+        """`query` is a queryset or the SQL of one that ran"""
+        if isinstance(query, str):
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {query}')
+                plan = '\n'.join(' '.join(map(str, row)) for row in cursor.fetchall())
+        else:
+            plan = query.explain()
+        scans = FULL_SCAN.findall(plan)
+        self.assertFalse(scans, f"Full table scan of {', '.join(scans)}:\n{plan}")
+
+    def test_requirement_list_page(self):
+        self.assertUsesIndexes(Requirement.objects.filter(project=self.project).order_by('pk')[:51])
+
+    def test_requirement_list_status_tab(self):
+        self.assertUsesIndexes(
+            Requirement.objects.filter(project=self.project, status='Approved').order_by('pk')[:51]
+        )
+
+    def test_requirement_list_category_filter(self):
+        self.assertUsesIndexes(Requirement.objects.filter(project=self.project, category=self.category).order_by('pk'))
+
+    def test_requirement_list_workflow_sort(self):
+        self.assertUsesIndexes(
+            Requirement.objects.filter(project=self.project).order_by('status_rank', 'priority_rank', 'pk')[:51]
+        )
+
+    def test_requirement_rows(self):
+        self.assertUsesIndexes(rows.values(rows.annotate(Requirement.objects.filter(project=self.project)))[:51])
+
+    def test_facet_counts(self):
+        self.assertUsesIndexes(
+            Requirement.objects.filter(project=self.project).order_by()
+            .values_list('status', 'priority', 'type', 'category_id').annotate(count=Count('pk'))
+        )
+
+    def test_requirement_history(self):
+        self.assertUsesIndexes(self.requirement.history.all().order_by('-timestamp'))
+
+    def test_requirement_subtree(self):
+        self.assertUsesIndexes(hierarchy.descendants(self.requirement))
+
+    def test_requirement_ancestors(self):
+        self.assertUsesIndexes(hierarchy.ancestors(self.requirement))
+
+    def test_objective_links(self):
+        Link = Requirement.objectives.through
+        self.assertUsesIndexes(Link.objects.filter(requirement__project=self.project))
+
+    def test_project_stats(self):
+        self.assertUsesIndexes(ProjectStats.objects.filter(project=self.project))
+
+    def test_user_organizations(self):
+        self.assertUsesIndexes(Organization.objects.filter(members__user=self.user).distinct())
+
+    def test_user_projects(self):
+        self.assertUsesIndexes(access.projects(self.user))
+
+    def test_user_requirements(self):
+        self.assertUsesIndexes(access.requirements(self.user, Requirement.objects.all()))
+
+    def test_user_roles(self):
+        self.assertUsesIndexes(
+            OrganizationMember.objects.filter(user=self.user).values_list('organization_id', 'role')
+        )
+
+    def test_requirement_list_cursor(self):
+        paginator = KeysetPaginator(('status_rank', 'priority_rank', 'pk'), 50)
+        queryset = Requirement.objects.filter(project=self.project)
+        page = paginator.paginate(queryset)
+        with CaptureQueriesContext(connection) as queries:
+            paginator.paginate(queryset, page.next_cursor)
+        self.assertUsesIndexes(queries[0]['sql'])
+
+    def test_search(self):
+        requirements = access.requirements(self.user, Requirement.objects.all()).annotate(
+            project_name=F('project__name')
+        )
+        self.assertUsesIndexes(
+            rows.values(search.apply(requirements, 'requirement 4'), 'id', 'title', 'project_name')[:50]
+        )
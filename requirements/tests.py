@@ -1,15 +1,41 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import csv
 import io
+import json
+import multiprocessing
 
 from projects.models import Organization, OrganizationMember, Project
 from requirements.models import (
     Requirement, RequirementCategory, 
-    RequirementHistory, ProjectObjective
+    RequirementHistory, ProjectObjective, RequirementSequence, ProjectStats, RequirementClosure,
+    ProjectCacheVersion
 )
 from requirements.forms import RequirementForm, RequirementCategoryForm
+from requirements import audit, caching, graph, hierarchy, impact, rows, search, singleflight, stats
+from requirements.importers import RequirementImporter
+from requirements.facets import facet_counts
+from requirements.matrix import MAX_BATCH_OPERATIONS, TraceabilityMatrix, apply_link_operations
+from requirements import views
+from requirements.cache_backends import FileCache, MemoryCache
+from requirements.views import RequirementListView
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+import os
+import pickle
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from unittest import mock
 
 class RequirementsBaseTestCase(TestCase):
     """Base test case with common setup for requirements app tests"""
@@ -120,6 +146,71 @@ class RequirementHistoryModelTests(RequirementsBaseTestCase):
             f"Expected status sequence {status_changes}, got {history_statuses}")
 
 
+class AuditPipelineTests(RequirementsBaseTestCase):
+    """Test cases for the change audit pipeline"""
+    
+    def test_status_update_view_records_once(self):
+        """Test a status change through the view creates exactly one entry"""
+        self.client.post(
+            reverse('requirement-status-update', kwargs={'pk': self.requirement.pk, 'status': 'Approved'})
+        )
+        history = RequirementHistory.objects.filter(requirement=self.requirement)
+        self.assertEqual(history.count(), 1)
+        self.assertEqual(history.get().changed_by, self.admin_user)
+    
+    def test_update_view_records_field_diffs(self):
+        """Test an edit records one entry with every changed field"""
+        self.client.post(
+            reverse('requirement-update', kwargs={'pk': self.requirement.pk}),
+            data={
+                'title': 'Renamed Requirement',
+                'description': 'Test requirement description',
+                'type': 'Functional',
+                'priority': 'High',
+                'status': 'In Review',
+            }
+        )
+        entry = RequirementHistory.objects.get(requirement=self.requirement)
+        self.assertEqual(entry.changes, {
+            'status': ['Draft', 'In Review'],
+            'title': ['Test Requirement', 'Renamed Requirement'],
+            'priority': ['Medium', 'High'],
+            'category': [self.category.pk, None],
+        })
+        self.assertEqual(entry.changed_by, self.admin_user)
+    
+    def test_collect_flushes_with_one_insert(self):
+        """Test entries from many saves are written with a single insert"""
+        others = [
+            Requirement.objects.create(
+                title=f'Batch {i}', description='Description',
+                project=self.project, created_by=self.admin_user
+            )
+            for i in range(3)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            with audit.collect():
+                for req in others:
+                    req.status = 'Approved'
+                    req.save()
+        
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "requirements_requirementhistory"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(RequirementHistory.objects.filter(requirement__in=others).count(), 3)
+    
+    def test_rolled_back_changes_are_not_recorded(self):
+        """Test entries queued in a failed block are discarded"""
+        with audit.collect():
+            try:
+                with audit.collect():
+                    self.requirement.status = 'Rejected'
+                    self.requirement.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertFalse(RequirementHistory.objects.filter(requirement=self.requirement).exists())
+
+
 class RequirementModelTests(RequirementsBaseTestCase):
     """Test cases for Requirement model"""
     
@@ -194,6 +285,112 @@ class RequirementModelTests(RequirementsBaseTestCase):
         self.assertIn(self.requirement, related_req.related_to.all())
 
 
+class RequirementSequenceTests(RequirementsBaseTestCase):
+    """Test cases for the per-project identifier sequence"""
+    
+    def test_identifiers_are_sequential(self):
+        """Test new requirements take the next number from the sequence"""
+        req = Requirement.objects.create(
+            title='Second Requirement',
+            description='Description',
+            project=self.project,
+            created_by=self.admin_user
+        )
+        self.assertEqual(self.requirement.identifier, 'REQ-001')
+        self.assertEqual(req.identifier, 'REQ-002')
+        self.assertEqual(RequirementSequence.objects.get(project=self.project).last_value, 2)
+    
+    def test_reserve_block(self):
+        """Test reserving a block of identifiers for bulk inserts"""
+        identifiers = RequirementSequence.objects.allocate(self.project, count=3)
+        self.assertEqual(identifiers, ['REQ-002', 'REQ-003', 'REQ-004'])
+        
+        req = Requirement.objects.create(
+            title='After Block',
+            description='Description',
+            project=self.project,
+            created_by=self.admin_user
+        )
+        self.assertEqual(req.identifier, 'REQ-005')
+    
+    def test_explicit_identifier_advances_sequence(self):
+        """Test an explicit REQ-### identifier is never handed out again"""
+        Requirement.objects.create(
+            title='Explicit',
+            description='Description',
+            identifier='REQ-010',
+            project=self.project,
+            created_by=self.admin_user
+        )
+        req = Requirement.objects.create(
+            title='Generated',
+            description='Description',
+            project=self.project,
+            created_by=self.admin_user
+        )
+        self.assertEqual(req.identifier, 'REQ-011')
+    
+    def test_missing_sequence_is_seeded_from_data(self):
+        """Test a project without a counter row continues after existing identifiers"""
+        RequirementSequence.objects.filter(project=self.project).delete()
+        req = Requirement.objects.create(
+            title='Reseeded',
+            description='Description',
+            project=self.project,
+            created_by=self.admin_user
+        )
+        self.assertEqual(req.identifier, 'REQ-002')
+
+
+class ChangeTrackingTests(RequirementsBaseTestCase):
+    """Test cases for dirty-field tracking on Requirement"""
+    
+    def test_changed_fields_and_previous(self):
+        """Test changes are detected against the loaded snapshot"""
+        req = Requirement.objects.get(pk=self.requirement.pk)
+        self.assertEqual(req.changed_fields(), set())
+        
+        req.status = 'Approved'
+        req.category = None
+        self.assertEqual(req.changed_fields(), {'status', 'category'})
+        self.assertEqual(req.previous('status'), 'Draft')
+        self.assertEqual(req.previous('category'), self.category.pk)
+    
+    def test_save_writes_only_changed_columns(self):
+        """Test an update neither re-reads the row nor rewrites untouched columns"""
+        req = Requirement.objects.get(pk=self.requirement.pk)
+        req.priority = 'High'
+        
+        with CaptureQueriesContext(connection) as ctx:
+            req.save()
+        
+        statements = [q['sql'] for q in ctx.captured_queries]
+        self.assertFalse(any(sql.startswith('SELECT') and 'requirements_requirement' in sql for sql in statements))
+        update = next(sql for sql in statements if sql.startswith('UPDATE "requirements_requirement"'))
+        self.assertIn('"priority"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"description"', update)
+        self.assertEqual(req.changed_fields(), set())
+    
+    def test_unchanged_save_is_skipped(self):
+        """Test saving an unmodified instance does not touch the table"""
+        req = Requirement.objects.get(pk=self.requirement.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            req.save()
+        
+        statements = [q['sql'] for q in ctx.captured_queries]
+        self.assertFalse(any('requirements_requirement' in sql for sql in statements))
+    
+    def test_json_changed_in_place(self):
+        """Test a JSON value changed in place is detected and saved"""
+        req = Requirement.objects.get(pk=self.requirement.pk)
+        req.descendant_statuses['Approved'] = 2
+        self.assertEqual(req.changed_fields(), {'descendant_statuses'})
+        req.save()
+        req.refresh_from_db()
+        self.assertEqual(req.descendant_statuses['Approved'], 2)
+
+
 class RequirementCategoryModelTests(RequirementsBaseTestCase):
     """Test cases for RequirementCategory model"""
     
@@ -346,7 +543,7 @@ class ViewTests(RequirementsBaseTestCase):
         # Check context
         self.assertIn('requirements', response.context)
         self.assertIn('status_counts', response.context)
-        self.assertEqual(response.context['requirements'].count(), 1)
+        self.assertEqual(len(response.context['requirements']), 1)
     
     def test_requirement_detail_view(self):
         """Test requirement detail view"""
@@ -431,7 +628,7 @@ class ViewTests(RequirementsBaseTestCase):
         self.assertEqual(response['Content-Type'], 'text/csv')
         
         # Parse CSV content
-        csv_content = response.content.decode('utf-8')
+        csv_content = b''.join(response.streaming_content).decode('utf-8')
         csv_reader = csv.reader(io.StringIO(csv_content))
         rows = list(csv_reader)
         
@@ -441,6 +638,1761 @@ class ViewTests(RequirementsBaseTestCase):
         self.assertEqual(rows[1][0], self.requirement.identifier)
 
 
+class ImportTests(RequirementsBaseTestCase):
+    """Test cases for bulk requirement import"""
+    
+    CSV_DATA = (
+        "ID,Title,Description,Priority,Status,Category,Parent,Objectives\n"
+        "REQ-050,Parent Requirement,Parent description,High,Approved,test category,,Test Project Objective\n"
+        ",Child Requirement,Child description,Low,Draft,,REQ-050,\n"
+        ",No Description,,Medium,Draft,,,\n"
+        ",Bad Category,Some description,Medium,Draft,Missing,,\n"
+        ",Bad Status,Some description,Medium,Done,,,\n"
+    )
+    
+    def test_import_csv(self):
+        """Test rows are created, linked and reported per row"""
+        progress = []
+        importer = RequirementImporter(self.project, user=self.admin_user, chunk_size=2, progress=progress.append)
+        result = importer.run(io.StringIO(self.CSV_DATA), 'csv')
+        
+        self.assertEqual(result.processed, 5)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([row for row, _ in result.errors], [4, 5, 6])
+        self.assertEqual(len(progress), 3)
+        
+        parent = Requirement.objects.get(identifier='REQ-050')
+        child = Requirement.objects.get(title='Child Requirement')
+        self.assertEqual(parent.category, self.category)
+        self.assertEqual(list(parent.objectives.all()), [self.objective])
+        self.assertEqual(child.parent, parent)
+        self.assertEqual(child.identifier, 'REQ-051')
+        self.assertEqual(child.history.count(), 1)
+    
+    def test_import_uses_constant_queries_per_chunk(self):
+        """Test a chunk is written with bulk statements regardless of its size"""
+        rows = ''.join(f'{{"title": "Bulk {i}", "description": "D", "objectives": ["Test Project Objective"]}}\n' for i in range(50))
+        importer = RequirementImporter(self.project, chunk_size=100)
+        with CaptureQueriesContext(connection) as ctx:
+            result = importer.run(io.StringIO(rows), 'jsonl')
+        
+        self.assertEqual(result.created, 50)
+        self.assertLess(len(ctx.captured_queries), 15)
+        self.assertEqual(self.objective.requirements.count(), 50)
+    
+    def test_import_view(self):
+        """Test uploading a file through the import view"""
+        upload = SimpleUploadedFile('reqs.csv', self.CSV_DATA.encode('utf-8'))
+        response = self.client.post(
+            reverse('import-requirements', kwargs={'project_id': self.project.id}),
+            data={'file': upload, 'format': 'csv'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 2)
+        self.assertContains(response, 'Unknown category: Missing')
+    
+    def test_import_command(self):
+        """Test the import_requirements management command"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.CSV_DATA)
+        self.addCleanup(os.unlink, f.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_requirements', self.project.id, f.name, user='admin_user', stdout=out, stderr=err)
+        
+        self.assertIn('Imported 2 requirements', out.getvalue())
+        self.assertIn('Row 6:', err.getvalue())
+
+
+class ExportTests(RequirementsBaseTestCase):
+    """Test cases for the streaming CSV export"""
+    
+    def test_export_streams_with_constant_queries(self):
+        """Test the export does not query per row"""
+        for i in range(20):
+            Requirement.objects.create(
+                title=f'Export {i}', description='Description',
+                project=self.project, created_by=self.admin_user
+            )
+        url = reverse('export-requirements', kwargs={'project_id': self.project.id})
+        
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        
+        self.assertEqual(len(rows), 22)
+        self.assertEqual(rows[1][rows[0].index('Created By')], 'admin_user')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class MatrixBaseTestCase(RequirementsBaseTestCase):
+    """Base test case with two objectives and a partly linked matrix"""
+    
+    def setUp(self):
+        super().setUp()
+        self.second_objective = ProjectObjective.objects.create(
+            title='Second Objective', project=self.project, created_by=self.admin_user
+        )
+        self.uncategorized = Requirement.objects.create(
+            title='Uncategorized', description='Description',
+            project=self.project, created_by=self.admin_user
+        )
+        self.requirement.objectives.add(self.objective, self.second_objective)
+        self.uncategorized.objectives.add(self.second_objective)
+
+
+class TraceabilityMatrixTests(MatrixBaseTestCase):
+    """Test cases for the traceability matrix engine"""
+    
+    def test_bitsets_and_totals(self):
+        """Test links are packed per row and totals come from the bitsets"""
+        matrix = TraceabilityMatrix(self.project)
+        
+        self.assertTrue(matrix.is_linked(self.requirement.pk, self.objective.pk))
+        self.assertFalse(matrix.is_linked(self.uncategorized.pk, self.objective.pk))
+        self.assertEqual([total for _, total in matrix.column_totals()], [1, 2])
+        self.assertEqual(matrix.covered_requirements(), 2)
+        
+        groups = matrix.groups()
+        self.assertEqual([label for label, _ in groups], ['Test Category', 'Uncategorized'])
+        self.assertEqual(groups[0][1][0].coverage, 2)
+        self.assertEqual(groups[1][1][0].cells, [(self.objective, False), (self.second_objective, True)])
+    
+    def test_matrix_view_query_count_is_constant(self):
+        """Test the matrix page does not query per cell or per category"""
+        url = reverse('traceability-matrix', kwargs={'project_id': self.project.id})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        baseline = len(ctx.captured_queries)
+        
+        for i in range(10):
+            category = RequirementCategory.objects.create(name=f'Category {i}', project=self.project)
+            req = Requirement.objects.create(
+                title=f'Matrix {i}', description='Description', category=category,
+                project=self.project, created_by=self.admin_user
+            )
+            req.objectives.add(self.objective)
+        
+        with self.assertNumQueries(baseline):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+
+class MatrixTileTests(MatrixBaseTestCase):
+    """Test cases for the traceability matrix tile API"""
+    
+    def test_tile_bitmaps(self):
+        """Test a tile returns packed links for its rows and columns only"""
+        response = self.client.get(
+            reverse('traceability-matrix-tiles', kwargs={'project_id': self.project.id}),
+            {'row_start': 0, 'row_count': 10, 'column_start': 1, 'column_count': 1}
+        )
+        tile = response.json()
+        
+        self.assertEqual(tile['total_columns'], 2)
+        self.assertEqual(tile['headers'], [
+            {'name': 'Test Category', 'start': 0, 'count': 1},
+            {'name': 'Uncategorized', 'start': 1, 'count': 1},
+        ])
+        self.assertEqual(tile['columns'], [{'id': self.second_objective.id, 'title': 'Second Objective', 'total': 2}])
+        self.assertEqual([row['id'] for row in tile['rows']], [self.requirement.id, self.uncategorized.id])
+        self.assertEqual([row['bits'] for row in tile['rows']], ['1', '1'])
+        self.assertEqual([row['coverage'] for row in tile['rows']], [2, 1])
+    
+    def test_tile_rejects_bad_bounds(self):
+        """Test non-integer bounds are rejected"""
+        response = self.client.get(
+            reverse('traceability-matrix-tiles', kwargs={'project_id': self.project.id}),
+            {'row_start': 'x'}
+        )
+        self.assertEqual(response.status_code, 400)
+    
+    def test_large_matrix_renders_virtual_grid(self):
+        """Test projects above the threshold get the virtual grid instead of rows"""
+        with self.settings(REQUIREMENTS_MATRIX_VIRTUAL_THRESHOLD=1):
+            response = self.client.get(reverse('traceability-matrix', kwargs={'project_id': self.project.id}))
+        self.assertTrue(response.context['virtual'])
+        self.assertContains(response, 'id="matrix-grid"')
+        self.assertNotContains(response, self.requirement.title)
+
+
+class MatrixLinkBatchTests(MatrixBaseTestCase):
+    """Test cases for batch link editing on the traceability matrix"""
+    
+    def post_operations(self, operations):
+        return self.client.post(
+            reverse('traceability-matrix-links', kwargs={'project_id': self.project.id}),
+            data=json.dumps({'operations': operations}),
+            content_type='application/json'
+        )
+    
+    def test_batch_add_and_remove(self):
+        """Test adds and removes are applied and only changed cells returned"""
+        # Session, user, the user's roles, project, validation, savepoint pair, existing links,
+        # insert, delete, link counts, stats lock and update, cache version
+        with self.assertNumQueries(14):
+            response = self.post_operations([
+                {'requirement': self.uncategorized.id, 'objective': self.objective.id, 'op': 'add'},
+                {'requirement': self.requirement.id, 'objective': self.second_objective.id, 'op': 'remove'},
+                {'requirement': self.requirement.id, 'objective': self.objective.id, 'op': 'add'},
+            ])
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['changed'], [
+            {'requirement': self.uncategorized.id, 'objective': self.objective.id, 'linked': True},
+            {'requirement': self.requirement.id, 'objective': self.second_objective.id, 'linked': False},
+        ])
+        self.assertEqual(set(self.uncategorized.objectives.all()), {self.objective, self.second_objective})
+        self.assertEqual(list(self.requirement.objectives.all()), [self.objective])
+    
+    def test_full_batch_of_removals(self):
+        """Test the largest accepted batch removes every link, one requirement per pair"""
+        requirements = Requirement.objects.bulk_create([
+            Requirement(
+                project=self.project, identifier=f'BULK-{i:04d}', title=f'Bulk {i}', description='Description'
+            )
+            for i in range(MAX_BATCH_OPERATIONS)
+        ])
+        Link = Requirement.objectives.through
+        Link.objects.bulk_create([Link(requirement_id=r.pk, projectobjective_id=self.objective.pk) for r in requirements])
+        stats.rebuild(self.project.pk)
+        
+        response = self.post_operations([
+            {'requirement': r.pk, 'objective': self.objective.pk, 'op': 'remove'} for r in requirements
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['changed']), MAX_BATCH_OPERATIONS)
+        self.assertFalse(Link.objects.filter(requirement__in=requirements).exists())
+    
+    def test_batch_rejects_other_projects(self):
+        """Test nothing is applied when any cell is outside the project"""
+        other_project = Project.objects.create(
+            name='Other Project', organization=self.organization, created_by=self.admin_user
+        )
+        other_objective = ProjectObjective.objects.create(title='Other', project=other_project)
+        response = self.post_operations([
+            {'requirement': self.uncategorized.id, 'objective': self.objective.id, 'op': 'add'},
+            {'requirement': self.requirement.id, 'objective': other_objective.id, 'op': 'add'},
+        ])
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.uncategorized.objectives.filter(pk=self.objective.pk).exists())
+
+
+class SearchTests(RequirementsBaseTestCase):
+    """Test full-text search over requirements"""
+    
+    def setUp(self):
+        super().setUp()
+        self.login_requirement = Requirement.objects.create(
+            title='User login',
+            description='Users sign in with email and password',
+            project=self.project,
+            created_by=self.admin_user
+        )
+        self.audit_requirement = Requirement.objects.create(
+            title='Audit trail',
+            description='Every login attempt is written to the audit log',
+            project=self.project,
+            created_by=self.admin_user
+        )
+    
+    def search(self, query, queryset=None):
+        if queryset is None:
+            queryset = Requirement.objects.all()
+        return list(search.apply(queryset, query))
+    
+    def test_index_is_installed(self):
+        self.assertTrue(search.is_available())
+    
+    def test_title_matches_rank_first(self):
+        results = self.search('login')
+        self.assertEqual(results, [self.login_requirement, self.audit_requirement])
+        self.assertIn(search.MARK_START, results[0].search_snippet)
+    
+    def test_prefix_and_identifier_search(self):
+        self.assertEqual(self.search('passw'), [self.login_requirement])
+        self.assertEqual(self.search(self.audit_requirement.identifier)[0], self.audit_requirement)
+    
+    def test_query_syntax_is_not_interpreted(self):
+        # Quotes, operators and brackets are treated as plain words
+        self.assertEqual(self.search('"audit" (log*'), [self.audit_requirement])
+        self.assertEqual(len(self.search('   ')), Requirement.objects.count())
+    
+    def test_index_follows_updates_and_deletes(self):
+        self.login_requirement.title = 'Single sign-on'
+        self.login_requirement.description = 'Federated identity'
+        self.login_requirement.save()
+        self.assertEqual(self.search('federated'), [self.login_requirement])
+        self.assertEqual(self.search('login'), [self.audit_requirement])
+        
+        self.audit_requirement.delete()
+        self.assertEqual(self.search('login'), [])
+    
+    def test_index_follows_bulk_writes(self):
+        Requirement.objects.filter(pk=self.login_requirement.pk).update(description='Passkeys only')
+        self.assertEqual(self.search('passkeys'), [self.login_requirement])
+    
+    def test_highlight_escapes_snippet(self):
+        snippet = f'<b>{search.MARK_START}login{search.MARK_END}</b>'
+        self.assertEqual(search.highlight(snippet), '&lt;b&gt;<mark>login</mark>&lt;/b&gt;')
+    
+    def test_list_view_search(self):
+        response = self.client.get(
+            reverse('requirement-list', kwargs={'project_id': self.project.id}), {'q': 'password'}
+        )
+        self.assertEqual([row.pk for row in response.context['requirements']], [self.login_requirement.pk])
+        self.assertContains(response, '<mark>password</mark>')
+    
+    def test_org_wide_search_is_scoped_to_memberships(self):
+        other_organization = Organization.objects.create(name='Other Organization')
+        other_project = Project.objects.create(
+            name='Other Project', organization=other_organization, created_by=self.admin_user
+        )
+        Requirement.objects.create(
+            title='Login for partners', project=other_project, created_by=self.admin_user
+        )
+        
+        response = self.client.get(reverse('requirement-search'), {'q': 'login'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row.pk for row in response.context['results']], [self.login_requirement.pk, self.audit_requirement.pk])
+
+
+class KeysetPaginationTests(RequirementsBaseTestCase):
+    """Test keyset pagination and the lazy status tabs of the requirement list"""
+    
+    def setUp(self):
+        super().setUp()
+        Requirement.objects.bulk_create([
+            Requirement(
+                project=self.project, identifier=f'BULK-{i}', title=f'Bulk {i}',
+                status='Approved' if i % 2 else 'Draft', created_by=self.admin_user
+            )
+            for i in range(6)
+        ])
+        self.url = reverse('requirement-list', kwargs={'project_id': self.project.id})
+    
+    def get(self, data):
+        return self.client.get(self.url, data)
+    
+    def walk(self, data):
+        """Follow the next links from the first page, returning (ids, pages)"""
+        ids = []
+        pages = []
+        response = self.get(data)
+        while True:
+            page = response.context['page']
+            pages.append(page)
+            ids.extend(req.pk for req in page)
+            if not page.has_next:
+                return ids, pages
+            response = self.get({'cursor': page.next_cursor})
+    
+    @mock.patch.object(RequirementListView, 'page_size', 3)
+    def test_pages_cover_every_row_once(self):
+        ids, pages = self.walk({})
+        
+        expected = list(Requirement.objects.filter(project=self.project).order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[-1].has_previous)
+    
+    @mock.patch.object(RequirementListView, 'page_size', 3)
+    def test_disabled_links_have_no_cursor(self):
+        content = self.get({}).content.decode()
+        self.assertNotIn('cursor=None', content)
+        self.assertIn('?cursor=', content)
+    
+    @mock.patch.object(RequirementListView, 'page_size', 2)
+    def test_cursor_keeps_filter_state(self):
+        first = self.get({'status': 'Approved'})
+        second = self.get({'cursor': first.context['page'].next_cursor})
+        
+        self.assertEqual(second.context['filter'].form['status'].value(), 'Approved')
+        self.assertTrue(all(req.status == 'Approved' for req in second.context['requirements']))
+        self.assertEqual(len(first.context['requirements']) + len(second.context['requirements']), 3)
+        
+        previous = self.get({'cursor': second.context['page'].previous_cursor})
+        self.assertEqual(
+            [req.pk for req in previous.context['requirements']],
+            [req.pk for req in first.context['requirements']]
+        )
+    
+    @mock.patch.object(RequirementListView, 'page_size', 2)
+    def test_pages_use_a_range_scan(self):
+        first = self.get({})
+        with CaptureQueriesContext(connection) as queries:
+            self.get({'cursor': first.context['page'].next_cursor})
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+    
+    def test_tampered_cursor_is_rejected(self):
+        response = self.get({'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_status_tabs_load_rows_on_demand(self):
+        response = self.get({})
+        tabs = {tab['code']: tab for tab in response.context['status_tabs']}
+        self.assertEqual(tabs['Approved']['count'], 3)
+        self.assertEqual(tabs['Draft']['count'], 4)
+        # The page itself only renders the "All" rows
+        self.assertEqual(response.content.decode().count('bi-eye'), 7)
+        
+        partial = self.client.get(self.url + tabs['Approved']['url'])
+        self.assertTemplateUsed(partial, 'requirements/requirement_rows.html')
+        self.assertTemplateNotUsed(partial, 'requirements/requirement_list.html')
+        self.assertEqual(partial.content.decode().count('bi-eye'), 3)
+
+    
+    def test_status_tabs_count_without_the_status_filter(self):
+        response = self.get({'status': 'Approved'})
+        tabs = {tab['code']: tab for tab in response.context['status_tabs']}
+        self.assertEqual(tabs['Approved']['count'], 3)
+        self.assertEqual(tabs['Draft']['count'], 4)
+        self.assertEqual(len(response.context['requirements']), 3)
+
+class FacetCountTests(RequirementsBaseTestCase):
+    """Test single-query faceted counts"""
+    
+    def setUp(self):
+        super().setUp()
+        Requirement.objects.create(
+            title='Secure login', project=self.project, category=self.category,
+            status='Approved', priority='High', type='Technical', created_by=self.admin_user
+        )
+        Requirement.objects.create(
+            title='Fast login', project=self.project,
+            status='Approved', priority='Low', type='Non-functional', created_by=self.admin_user
+        )
+    
+    def test_counts_every_facet_in_one_query(self):
+        with self.assertNumQueries(1):
+            facets = facet_counts(Requirement.objects.filter(project=self.project))
+        
+        self.assertEqual(facets.total, 3)
+        self.assertEqual(facets.status, {'Draft': 1, 'Approved': 2})
+        self.assertEqual(facets.priority, {'Medium': 1, 'High': 1, 'Low': 1})
+        self.assertEqual(facets.type['Technical'], 1)
+        self.assertEqual(facets.category, {self.category.pk: 2, None: 1})
+        self.assertEqual(facets.chart_data()[1], [1, 0, 2, 0, 0, 0])
+    
+    def test_counts_a_search_result(self):
+        facets = facet_counts(search.apply(Requirement.objects.filter(project=self.project), 'login'))
+        self.assertEqual(facets.total, 2)
+        self.assertEqual(facets.status, {'Approved': 2})
+    
+    def test_list_view_shows_facets_of_the_filtered_set(self):
+        response = self.client.get(
+            reverse('requirement-list', kwargs={'project_id': self.project.id}), {'priority': 'High'}
+        )
+        facets = response.context['facets']
+        self.assertEqual(facets.total, 1)
+        self.assertEqual(response.context['status_counts']['Approved'], 1)
+        self.assertContains(response, 'Technical (1)')
+        self.assertContains(response, '---------', count=4)
+        self.assertContains(response, 'Test Category (1)')
+    
+    def test_project_detail_uses_facets(self):
+        response = self.client.get(reverse('project-detail', kwargs={'pk': self.project.id}))
+        self.assertEqual(json.loads(response.context['status_counts']), [1, 0, 2, 0, 0, 0])
+        self.assertEqual(response.context['categories'], [(self.category, 2)])
+        
+        # Counts are read from the stats row, not aggregated per request
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('project-detail', kwargs={'pk': self.project.id}))
+        facet_queries = [
+            query for query in queries.captured_queries
+            if 'GROUP BY "requirements_requirement"."status"' in query['sql']
+        ]
+        self.assertEqual(len(facet_queries), 0)
+
+
+class ProjectStatsTests(RequirementsBaseTestCase):
+    """Test the incrementally maintained per-project statistics"""
+    
+    def assertStatsCurrent(self):
+        stored = ProjectStats.objects.get(project=self.project)
+        recounted = stats.rebuild(self.project.pk)
+        self.assertEqual(stored.requirement_count, recounted.requirement_count)
+        self.assertEqual(stored.covered_count, recounted.covered_count)
+        self.assertEqual(stored.counts, recounted.counts)
+        return recounted
+    
+    def test_missing_row_is_rebuilt_on_read(self):
+        ProjectStats.objects.filter(project=self.project).delete()
+        project_stats = stats.for_project(self.project)
+        self.assertEqual(project_stats.requirement_count, 1)
+        self.assertEqual(project_stats.facets().category, {self.category.pk: 1})
+    
+    def test_saves_update_counts(self):
+        other = Requirement.objects.create(
+            title='Other', description='Other', project=self.project, priority='High'
+        )
+        self.requirement.status = 'Approved'
+        self.requirement.category = None
+        # Savepoint pair, requirement update, cache version, stats lock and update, history insert
+        with self.assertNumQueries(7):
+            self.requirement.save()
+        
+        project_stats = self.assertStatsCurrent()
+        facets = project_stats.facets()
+        self.assertEqual(facets.total, 2)
+        self.assertEqual(facets.status, {'Draft': 1, 'Approved': 1})
+        self.assertEqual(facets.category, {None: 2})
+        self.assertIsNotNone(project_stats.last_changed_at)
+        
+        other.delete()
+        self.assertEqual(self.assertStatsCurrent().requirement_count, 1)
+    
+    def test_objective_links_update_coverage(self):
+        second = ProjectObjective.objects.create(title='Second', project=self.project)
+        self.requirement.objectives.add(self.objective, second)
+        self.assertEqual(self.assertStatsCurrent().covered_count, 1)
+        
+        self.requirement.objectives.remove(self.objective, self.objective)
+        project_stats = self.assertStatsCurrent()
+        self.assertEqual(project_stats.objective_counts(), {second.pk: 1})
+        
+        second.requirements.clear()
+        self.assertEqual(self.assertStatsCurrent().covered_count, 0)
+        
+        self.requirement.objectives.add(second)
+        second.delete()
+        self.assertEqual(self.assertStatsCurrent().covered_count, 0)
+    
+    def test_batch_links_and_deletes_update_counts(self):
+        self.client.post(
+            reverse('traceability-matrix-links', kwargs={'project_id': self.project.id}),
+            json.dumps({'operations': [
+                {'requirement': self.requirement.pk, 'objective': self.objective.pk, 'op': 'add'}
+            ]}),
+            content_type='application/json'
+        )
+        self.assertEqual(self.assertStatsCurrent().covered_count, 1)
+        
+        self.category.delete()
+        self.assertEqual(self.assertStatsCurrent().facets().category, {None: 1})
+        
+        self.requirement.delete()
+        project_stats = self.assertStatsCurrent()
+        self.assertEqual((project_stats.requirement_count, project_stats.covered_count), (0, 0))
+    
+    def test_import_updates_counts(self):
+        rows = "title,description,status,objectives\nA,First,Approved,Test Project Objective\nB,Second,,\n"
+        RequirementImporter(self.project).run(io.StringIO(rows), 'csv')
+        project_stats = self.assertStatsCurrent()
+        self.assertEqual(project_stats.requirement_count, 3)
+        self.assertEqual(project_stats.covered_count, 1)
+    
+    def test_rebuild_command_repairs_counts(self):
+        ProjectStats.objects.filter(project=self.project).update(requirement_count=99, counts={})
+        call_command('rebuild_project_stats', self.project.pk, stdout=io.StringIO())
+        self.assertEqual(stats.for_project(self.project).facets().status, {'Draft': 1})
+    
+    def test_organization_page_reads_stats(self):
+        response = self.client.get(reverse('organization-detail', kwargs={'pk': self.organization.pk}))
+        self.assertEqual(response.context['projects'][0].stats.requirement_count, 1)
+
+
+class RequirementRowTests(RequirementsBaseTestCase):
+    """Test the shared requirement row query and the query budgets it keeps"""
+    
+    def add_rows(self, count):
+        for i in range(count):
+            category = RequirementCategory.objects.create(name=f'Row category {i}', project=self.project)
+            req = Requirement.objects.create(
+                title=f'Row {i}', description='Description', category=category,
+                parent=self.requirement, project=self.project, created_by=self.admin_user
+            )
+            req.objectives.add(self.objective)
+            req.related_requirements.add(self.requirement)
+    
+    def test_annotations(self):
+        self.add_rows(2)
+        row = rows.annotate(Requirement.objects.filter(pk=self.requirement.pk)).get()
+        self.assertEqual(row.category_name, 'Test Category')
+        self.assertEqual((row.child_count, row.objective_count, row.related_count), (2, 0, 0))
+        
+        child = rows.annotate(Requirement.objects.filter(title='Row 0')).get()
+        self.assertEqual((child.child_count, child.objective_count, child.related_count), (0, 1, 1))
+    
+    def test_query_budgets_do_not_grow_with_rows(self):
+        urls = [
+            reverse('requirement-list', kwargs={'project_id': self.project.id}),
+            reverse('project-detail', kwargs={'pk': self.project.id}),
+            reverse('traceability-matrix', kwargs={'project_id': self.project.id}),
+            reverse('export-requirements', kwargs={'project_id': self.project.id}),
+        ]
+        
+        def query_counts():
+            counts = []
+            for url in urls:
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                counts.append(len(ctx.captured_queries))
+            return counts
+        
+        baseline = query_counts()
+        self.add_rows(8)
+        self.assertEqual(query_counts(), baseline)
+        
+        response = self.client.get(urls[0])
+        self.assertContains(response, 'Row category 3')
+    
+    def test_values_yields_compact_rows(self):
+        self.add_rows(1)
+        requirements = rows.values(rows.annotate(Requirement.objects.filter(project=self.project)))
+        row = requirements.filter(title='Row 0').get()
+        
+        self.assertIsInstance(row, tuple)
+        self.assertFalse(hasattr(row, '__dict__'))
+        self.assertEqual((row.pk, row.category_name, row.objective_count), (row.id, 'Row category 0', 1))
+        self.assertEqual((row.get_status_display(), row.status_badge), ('Draft', 'bg-secondary'))
+        self.assertEqual(row.priority_badge, 'bg-warning text-dark')
+        self.assertEqual([r.title for r in requirements.order_by('-pk').iterator(chunk_size=1)], ['Row 0', 'Test Requirement'])
+    
+    def test_rows_use_a_fraction_of_the_memory(self):
+        Requirement.objects.bulk_create([
+            Requirement(project=self.project, identifier=f'BULK-{i}', title=f'Bulk {i}', description='Description ' * 80)
+            for i in range(500)
+        ])
+        requirements = rows.annotate(Requirement.objects.filter(project=self.project), 'category_name')
+        
+        def peak(queryset):
+            tracemalloc.start()
+            try:
+                list(queryset)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        
+        fields = ('id', 'identifier', 'title', 'type', 'priority', 'status', 'created_at', 'category_name')
+        self.assertLess(peak(rows.values(requirements, *fields)) * 3, peak(requirements))
+    
+    def test_export_includes_category(self):
+        response = self.client.get(reverse('export-requirements', kwargs={'project_id': self.project.id}))
+        content = b''.join(response.streaming_content).decode('utf-8')
+        header, row = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(row[header.index('Category')], 'Test Category')
+        # Added last, so the existing columns keep their positions
+        self.assertEqual(header[-1], 'Category')
+
+
+class RankTests(RequirementsBaseTestCase):
+    """Test the generated status/priority rank columns and the sorts that use them"""
+    
+    def setUp(self):
+        super().setUp()
+        for title, status, priority in [
+            ('Verified low', 'Verified', 'Low'),
+            ('Draft high', 'Draft', 'High'),
+            ('Review medium', 'In Review', 'Medium'),
+            ('Draft low', 'Draft', 'Low'),
+        ]:
+            Requirement.objects.create(
+                title=title, description='Description', status=status, priority=priority,
+                project=self.project, created_by=self.admin_user
+            )
+    
+    def test_ranks_follow_every_write(self):
+        req = Requirement.objects.get(title='Draft high')
+        self.assertEqual((req.status_rank, req.priority_rank), (1, 1))
+        
+        req.status = 'Approved'
+        req.save()
+        self.assertEqual(req.status_rank, 3)
+        
+        Requirement.objects.filter(pk=req.pk).update(priority='Low')
+        req.refresh_from_db()
+        self.assertEqual(req.priority_rank, 3)
+    
+    def test_workflow_sort_pages_in_rank_order(self):
+        url = reverse('requirement-list', kwargs={'project_id': self.project.id})
+        titles = []
+        with mock.patch.object(RequirementListView, 'page_size', 2):
+            response = self.client.get(url, {'sort': 'workflow'})
+            while True:
+                page = response.context['page']
+                titles.extend(req.title for req in page)
+                if not page.has_next:
+                    break
+                response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual(titles, ['Draft high', 'Test Requirement', 'Draft low', 'Review medium', 'Verified low'])
+    
+    def test_project_detail_orders_by_workflow(self):
+        response = self.client.get(reverse('project-detail', kwargs={'pk': self.project.id}))
+        self.assertEqual(
+            [req.title for req in response.context['requirements']],
+            ['Draft high', 'Test Requirement', 'Draft low', 'Review medium', 'Verified low']
+        )
+    
+    def test_workflow_order_is_read_from_the_index(self):
+        queryset = Requirement.objects.filter(project=self.project).order_by('status_rank', 'priority_rank', 'pk')
+        plan = queryset.explain()
+        self.assertIn('requirement_workflow_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+class HierarchyTests(RequirementsBaseTestCase):
+    """Test the closure table behind the requirement parent hierarchy"""
+    
+    def create(self, title, parent=None):
+        return Requirement.objects.create(
+            title=title, description=title, project=self.project, parent=parent, created_by=self.admin_user
+        )
+    
+    def build_chain(self, length):
+        """A chain of `length` requirements below self.requirement"""
+        chain = [self.requirement]
+        for level in range(length):
+            chain.append(self.create(f'Level {level + 1}', parent=chain[-1]))
+        return chain
+    
+    def paths(self):
+        return set(RequirementClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+    
+    def expected_paths(self):
+        """The paths implied by the parent links"""
+        parents = dict(Requirement.objects.values_list('pk', 'parent_id'))
+        expected = set()
+        for pk in parents:
+            node, depth = pk, 0
+            while node is not None:
+                expected.add((node, pk, depth))
+                node, depth = parents[node], depth + 1
+        return expected
+    
+    def test_paths_follow_parent_links(self):
+        chain = self.build_chain(4)
+        self.create('Sibling', parent=chain[1])
+        self.assertEqual(self.paths(), self.expected_paths())
+        self.assertEqual(hierarchy.depth(chain[4]), 4)
+        self.assertEqual(hierarchy.depth(self.requirement), 0)
+    
+    def test_subtree_and_ancestors_in_one_query(self):
+        chain = self.build_chain(30)
+        with self.assertNumQueries(1):
+            below = {requirement.pk: requirement.depth for requirement in hierarchy.descendants(self.requirement)}
+        self.assertEqual(below, {requirement.pk: level for level, requirement in enumerate(chain) if level})
+        with self.assertNumQueries(1):
+            above = [requirement.pk for requirement in hierarchy.ancestors(chain[-1])]
+        self.assertEqual(above, [requirement.pk for requirement in chain[:-1]])
+        self.assertEqual(
+            [requirement.pk for requirement in hierarchy.descendants(self.requirement, max_depth=2).order_by('depth')],
+            [chain[1].pk, chain[2].pk]
+        )
+    
+    def test_reparenting_moves_the_subtree(self):
+        chain = self.build_chain(3)
+        other = self.create('Other root')
+        chain[1].parent = other
+        chain[1].save()
+        self.assertEqual(self.paths(), self.expected_paths())
+        self.assertEqual([requirement.pk for requirement in hierarchy.ancestors(chain[3])], [other.pk, chain[1].pk, chain[2].pk])
+        
+        chain[1].parent = None
+        chain[1].save()
+        self.assertEqual(self.paths(), self.expected_paths())
+        self.assertEqual(hierarchy.depth(chain[3]), 2)
+    
+    def test_cycles_are_rejected(self):
+        chain = self.build_chain(3)
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError):
+                hierarchy.check_parent(self.requirement, chain[3])
+        with self.assertRaises(ValidationError):
+            hierarchy.check_parent(chain[1], chain[1])
+        hierarchy.check_parent(chain[3], self.requirement)
+        
+        self.requirement.parent = chain[2]
+        with self.assertRaises(ValidationError):
+            self.requirement.save()
+        self.requirement.refresh_from_db()
+        self.assertIsNone(self.requirement.parent_id)
+        self.assertEqual(self.paths(), self.expected_paths())
+    
+    def test_form_rejects_cycles(self):
+        chain = self.build_chain(2)
+        form = RequirementForm(instance=self.requirement, project=self.project)
+        self.assertEqual(list(form.fields['parent'].queryset), [])
+        
+        form = RequirementForm(instance=chain[1], project=self.project)
+        self.assertEqual(list(form.fields['parent'].queryset), [self.requirement])
+        
+        form = RequirementForm(data={
+            'title': self.requirement.title, 'description': self.requirement.description,
+            'type': 'Functional', 'priority': 'Medium', 'status': 'Draft', 'parent': chain[2].pk,
+        }, instance=self.requirement)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['parent'], [hierarchy.CYCLE_ERROR])
+    
+    def test_delete_makes_children_roots(self):
+        chain = self.build_chain(3)
+        chain[1].delete()
+        self.assertEqual(self.paths(), self.expected_paths())
+        self.assertEqual(hierarchy.depth(chain[3]), 1)
+        self.assertFalse(hierarchy.descendants(self.requirement).exists())
+        
+        self.project.delete()
+        self.assertFalse(RequirementClosure.objects.exists())
+    
+    def test_move_subtree(self):
+        first = self.build_chain(2)
+        target = self.create('Target')
+        second = self.create('Second root')
+        self.create('Second child', parent=second)
+        
+        moved = hierarchy.move_subtree([first[1], second], target, user=self.admin_user)
+        self.assertEqual(moved, 2)
+        self.assertEqual(self.paths(), self.expected_paths())
+        self.assertEqual(set(hierarchy.descendants(target).values_list('depth', flat=True)), {1, 2})
+        self.assertEqual(RequirementHistory.objects.get(requirement=second).changes, {'parent': [None, target.pk]})
+        
+        with self.assertRaises(ValidationError):
+            hierarchy.move_subtree([target], first[2])
+        self.assertEqual(self.paths(), self.expected_paths())
+        
+        self.assertEqual(hierarchy.move_subtree([first[1], second], None), 2)
+        self.assertEqual(self.paths(), self.expected_paths())
+    
+    def test_import_adds_paths(self):
+        rows = (
+            "identifier,title,description,parent\n"
+            "REQ-100,Epic,Epic,\n"
+            f"REQ-102,Grandchild,Grandchild,REQ-101\n"
+            f"REQ-101,Child,Child,REQ-100\n"
+            f"REQ-103,Under existing,Existing,{self.requirement.identifier}\n"
+            "REQ-104,Loop A,Loop,REQ-105\n"
+            "REQ-105,Loop B,Loop,REQ-104\n"
+            "REQ-106,Below loop,Loop,REQ-105\n"
+        )
+        result = RequirementImporter(self.project, self.admin_user).run(io.StringIO(rows))
+        self.assertEqual(result.created, 4)
+        self.assertEqual(
+            sorted(message for _, message in result.errors),
+            ['Parent cycle: REQ-104', 'Parent cycle: REQ-105', 'Unknown parent: REQ-105']
+        )
+        self.assertEqual(self.paths(), self.expected_paths())
+        self.assertEqual(hierarchy.depth(Requirement.objects.get(identifier='REQ-102')), 2)
+    
+    def test_rebuild_command(self):
+        chain = self.build_chain(3)
+        RequirementClosure.objects.all().delete()
+        call_command('rebuild_hierarchy', stdout=io.StringIO())
+        self.assertEqual(self.paths(), self.expected_paths())
+        self.assertEqual(hierarchy.depth(chain[3]), 3)
+    
+    def test_detail_shows_subtree(self):
+        chain = self.build_chain(3)
+        sibling = self.create('Sibling', parent=chain[1])
+        response = self.client.get(reverse('requirement-detail', kwargs={'pk': self.requirement.pk}))
+        self.assertEqual([row.id for row in response.context['children']], [chain[1].pk, chain[2].pk, chain[3].pk, sibling.pk])
+        self.assertEqual([row.depth for row in response.context['children']], [1, 2, 3, 2])
+        
+        response = self.client.get(reverse('requirement-detail', kwargs={'pk': chain[3].pk}))
+        self.assertEqual([requirement.pk for requirement in response.context['ancestors']], [requirement.pk for requirement in chain[:3]])
+
+
+class RollupTests(RequirementsBaseTestCase):
+    """Test the progress rollup kept on parent requirements"""
+    
+    def create(self, title, parent=None, status='Draft'):
+        return Requirement.objects.create(
+            title=title, description=title, project=self.project, parent=parent,
+            status=status, created_by=self.admin_user
+        )
+    
+    def rollups(self):
+        return {
+            pk: (count, done, statuses)
+            for pk, count, done, statuses in Requirement.objects.values_list(
+                'pk', 'descendant_count', 'descendant_done_count', 'descendant_statuses'
+            )
+        }
+    
+    def expected_rollups(self):
+        """The rollups implied by the parent links and statuses"""
+        rows = dict(Requirement.objects.values_list('pk', 'parent_id'))
+        statuses = dict(Requirement.objects.values_list('pk', 'status'))
+        expected = {pk: {} for pk in rows}
+        for pk, status in statuses.items():
+            node = rows[pk]
+            while node is not None:
+                expected[node][status] = expected[node].get(status, 0) + 1
+                node = rows[node]
+        return {
+            pk: (sum(counts.values()), sum(counts.get(status, 0) for status in Requirement.DONE_STATUSES), counts)
+            for pk, counts in expected.items()
+        }
+    
+    def assertRollupsCorrect(self):
+        self.assertEqual(self.rollups(), self.expected_rollups())
+    
+    def test_counts_follow_new_children(self):
+        child = self.create('Child', parent=self.requirement, status='Implemented')
+        self.create('Grandchild', parent=child, status='Verified')
+        self.create('Other grandchild', parent=child)
+        self.assertRollupsCorrect()
+        
+        self.requirement.refresh_from_db()
+        self.assertEqual(self.requirement.descendant_count, 3)
+        self.assertEqual(self.requirement.progress, 67)
+        self.assertEqual(
+            self.requirement.status_rollup(),
+            [('Draft', 'Draft', 1), ('Implemented', 'Implemented', 1), ('Verified', 'Verified', 1)]
+        )
+        self.assertIsNone(Requirement.objects.get(title='Grandchild').progress)
+    
+    def test_status_change_updates_every_ancestor_at_once(self):
+        chain = [self.requirement]
+        for level in range(20):
+            chain.append(self.create(f'Level {level}', parent=chain[-1]))
+        leaf = Requirement.objects.get(pk=chain[-1].pk)
+        leaf.status = 'Verified'
+        with CaptureQueriesContext(connection) as queries:
+            leaf.save()
+        rollup_queries = [query for query in queries if 'descendant_count' in query['sql']]
+        self.assertEqual(len(rollup_queries), 2)
+        self.assertRollupsCorrect()
+        self.assertEqual(Requirement.objects.get(pk=self.requirement.pk).descendant_done_count, 1)
+    
+    def test_reparenting_moves_counts(self):
+        child = self.create('Child', parent=self.requirement, status='Implemented')
+        self.create('Grandchild', parent=child, status='Verified')
+        other = self.create('Other root')
+        
+        child = Requirement.objects.get(pk=child.pk)
+        child.parent = other
+        child.status = 'Approved'
+        child.save()
+        self.assertRollupsCorrect()
+        self.assertEqual(self.rollups()[self.requirement.pk], (0, 0, {}))
+        
+        hierarchy.move_subtree([child], self.requirement)
+        self.assertRollupsCorrect()
+        self.assertEqual(self.rollups()[self.requirement.pk], (2, 1, {'Approved': 1, 'Verified': 1}))
+    
+    def test_delete_removes_subtree_from_ancestors(self):
+        child = self.create('Child', parent=self.requirement)
+        self.create('Grandchild', parent=child, status='Verified')
+        child.delete()
+        self.assertRollupsCorrect()
+        self.assertEqual(self.rollups()[self.requirement.pk], (0, 0, {}))
+    
+    def test_import_counts_new_children(self):
+        rows = (
+            "identifier,title,description,status,parent\n"
+            "REQ-101,Child,Child,Verified,REQ-100\n"
+            "REQ-100,Epic,Epic,Draft,\n"
+            f"REQ-102,Under existing,Existing,Implemented,{self.requirement.identifier}\n"
+        )
+        result = RequirementImporter(self.project, self.admin_user).run(io.StringIO(rows))
+        self.assertEqual(result.created, 3)
+        self.assertRollupsCorrect()
+    
+    def test_rebuild_command_recounts(self):
+        self.create('Child', parent=self.requirement, status='Verified')
+        Requirement.objects.update(descendant_count=0, descendant_done_count=0, descendant_statuses={})
+        call_command('rebuild_hierarchy', stdout=io.StringIO())
+        self.assertRollupsCorrect()
+    
+    def test_pages_show_progress(self):
+        self.create('Child', parent=self.requirement, status='Implemented')
+        self.create('Other child', parent=self.requirement)
+        
+        response = self.client.get(reverse('requirement-list', kwargs={'project_id': self.project.pk}))
+        row = next(row for row in response.context['requirements'] if row.id == self.requirement.pk)
+        self.assertEqual(row.progress, 50)
+        self.assertContains(response, 'width: 50%')
+        
+        response = self.client.get(reverse('project-detail', kwargs={'pk': self.project.pk}))
+        self.assertContains(response, 'width: 50%')
+        
+        response = self.client.get(reverse('requirement-detail', kwargs={'pk': self.requirement.pk}))
+        self.assertContains(response, '1 of 2 implemented or verified')
+
+
+class DependencyGraphTests(RequirementsBaseTestCase):
+    """Test the dependency graph engine and its JSON endpoint"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.a, self.b, self.c, self.d = [
+            Requirement.objects.create(
+                title=f'Node {name}', description='Node', project=self.project, created_by=self.admin_user
+            )
+            for name in 'ABCD'
+        ]
+        # a -> b -> c -> a is a cycle; c -> d leaves it; d is a child of the base requirement
+        self.a.related_requirements.add(self.b)
+        self.b.related_requirements.add(self.c)
+        self.c.related_requirements.add(self.a, self.d)
+        self.d.parent = self.requirement
+        self.d.save()
+    
+    def test_load_reads_edges_in_one_query(self):
+        with self.assertNumQueries(1):
+            project_graph = graph.load(self.project.pk)
+        self.assertEqual(project_graph.node_count, 5)
+        self.assertEqual(project_graph.edge_count, 5)
+        self.assertEqual(graph.load(self.project.pk, ['related']).edge_count, 4)
+    
+    def test_cycles_and_components(self):
+        project_graph = graph.load(self.project.pk)
+        self.assertTrue(project_graph.has_cycles())
+        self.assertEqual(project_graph.cycles(), [sorted([self.a.pk, self.b.pk, self.c.pk])])
+        self.assertEqual(len(project_graph.strongly_connected_components()), 3)
+        
+        self.c.related_requirements.remove(self.a)
+        self.assertFalse(graph.load(self.project.pk).has_cycles())
+    
+    def test_topological_order(self):
+        self.c.related_requirements.remove(self.a)
+        project_graph = graph.load(self.project.pk)
+        position = {pk: i for i, pk in enumerate(project_graph.topological_order())}
+        for source, target, _ in project_graph.edges():
+            self.assertLess(position[project_graph.ids[source]], position[project_graph.ids[target]])
+        self.assertEqual(project_graph.levels[project_graph.index[self.d.pk]], 3)
+    
+    def test_transitive_closure(self):
+        project_graph = graph.load(self.project.pk)
+        self.assertEqual(project_graph.reachable(self.a.pk), {self.a.pk, self.b.pk, self.c.pk, self.d.pk})
+        self.assertEqual(project_graph.reachable(self.d.pk), set())
+        self.assertEqual(project_graph.reachable(self.requirement.pk), {self.d.pk})
+        self.assertTrue(project_graph.reaches(self.b.pk, self.d.pk))
+        self.assertFalse(project_graph.reaches(self.d.pk, self.a.pk))
+        self.assertEqual(len(project_graph.transitive_closure()), 5)
+    
+    def test_deep_graph(self):
+        size = 5000
+        chain = graph.DependencyGraph(
+            {pk: pk - 1 if pk > 1 else None for pk in range(1, size + 1)},
+            [(pk, pk + 1, graph.PARENT) for pk in range(1, size)] + [(size, 1, graph.RELATED)],
+        )
+        self.assertEqual(len(chain.cycles()), 1)
+        self.assertTrue(chain.reaches(size, 1))
+        self.assertEqual(chain.roots()[size - 1], 0)
+    
+    def test_cached_per_version(self):
+        graph.for_project(self.project.pk)
+        # Only the version is read
+        with self.assertNumQueries(1):
+            graph.for_project(self.project.pk)
+        
+        # Labels are not part of the graph
+        self.a.title = 'Renamed'
+        self.a.save()
+        with self.assertNumQueries(1):
+            graph.for_project(self.project.pk)
+        
+        self.d.related_requirements.add(self.a)
+        with self.assertNumQueries(2):
+            self.assertEqual(graph.for_project(self.project.pk).edge_count, 6)
+        
+        child = Requirement.objects.create(
+            title='New', description='New', project=self.project, parent=self.d, created_by=self.admin_user
+        )
+        self.assertEqual(graph.for_project(self.project.pk).node_count, 6)
+        
+        child.delete()
+        self.assertEqual(graph.for_project(self.project.pk).node_count, 5)
+        
+        hierarchy.move_subtree([self.d], None)
+        self.assertEqual(graph.for_project(self.project.pk, ['parent']).edge_count, 0)
+    
+    def test_endpoint_full_graph(self):
+        response = self.client.get(reverse('dependency-graph-data', kwargs={'project_id': self.project.pk}))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['mode'], 'full')
+        self.assertEqual({node['id'] for node in data['nodes']}, {self.requirement.pk, self.a.pk, self.b.pk, self.c.pk, self.d.pk})
+        self.assertIn([self.requirement.pk, self.d.pk, 'parent'], data['edges'])
+        self.assertIn([self.a.pk, self.b.pk, 'related'], data['edges'])
+        cyclic = {node['id'] for node in data['nodes'] if node['cyclic']}
+        self.assertEqual(cyclic, {self.a.pk, self.b.pk, self.c.pk})
+    
+    def test_endpoint_level_of_detail(self):
+        url = reverse('dependency-graph-data', kwargs={'project_id': self.project.pk})
+        data = self.client.get(url, {'max_nodes': 4}).json()
+        self.assertEqual(data['mode'], 'clusters')
+        sizes = {node['id']: node['size'] for node in data['nodes']}
+        self.assertEqual(sizes[self.requirement.pk], 2)
+        self.assertIn([self.c.pk, self.requirement.pk, 'related', 1], data['edges'])
+        
+        data = self.client.get(url, {'focus': self.d.pk, 'radius': 1}).json()
+        self.assertEqual(data['mode'], 'focus')
+        self.assertEqual({node['id'] for node in data['nodes']}, {self.d.pk, self.c.pk, self.requirement.pk})
+        self.assertEqual(data['reachable'], [])
+        
+        data = self.client.get(url, {'focus': self.a.pk, 'kinds': 'related'}).json()
+        self.assertEqual(data['reachable'], sorted([self.a.pk, self.b.pk, self.c.pk, self.d.pk]))
+    
+    def test_endpoint_rejects_bad_parameters(self):
+        url = reverse('dependency-graph-data', kwargs={'project_id': self.project.pk})
+        self.assertEqual(self.client.get(url, {'kinds': 'objectives'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'radius': 'far'}).status_code, 400)
+        other = Project.objects.create(name='Other', organization=self.organization, created_by=self.admin_user)
+        other_requirement = Requirement.objects.create(title='Other', description='Other', project=other)
+        self.assertEqual(self.client.get(url, {'focus': other_requirement.pk}).status_code, 404)
+    
+    def test_graph_page(self):
+        response = self.client.get(reverse('dependency-graph', kwargs={'project_id': self.project.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'dependency-graph.js')
+
+
+class ImpactAnalysisTests(RequirementsBaseTestCase):
+    """Test change impact analysis and its reachability index"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.a, self.b, self.c, self.d = [
+            Requirement.objects.create(
+                title=f'Node {name}', description='Node', project=self.project, created_by=self.admin_user
+            )
+            for name in 'ABCD'
+        ]
+        # a is a child of the base requirement; b relates to a, c to b, a to d
+        self.a.parent = self.requirement
+        self.a.save()
+        self.b.related_requirements.add(self.a)
+        self.c.related_requirements.add(self.b)
+        self.a.related_requirements.add(self.d)
+        self.c.objectives.add(self.objective)
+        self.other_objective = ProjectObjective.objects.create(title='Other objective', project=self.project)
+        self.d.objectives.add(self.other_objective)
+    
+    def assertImpact(self, requirement, requirements, objectives):
+        requirement_ids, objective_ids = impact.analyse(requirement)
+        self.assertEqual(requirement_ids, sorted(r.pk for r in requirements))
+        self.assertEqual(objective_ids, sorted(o.pk for o in objectives))
+    
+    def search(self, edges, pk):
+        """What `pk` reaches along (source, target) edges, by breadth-first search"""
+        successors = {}
+        for source, target in edges:
+            successors.setdefault(source, []).append(target)
+        found, queue = set(), [pk]
+        while queue:
+            for other in successors.get(queue.pop(), []):
+                if other not in found:
+                    found.add(other)
+                    queue.append(other)
+        found.discard(pk)
+        return sorted(found)
+    
+    def test_analyse(self):
+        self.assertImpact(self.requirement, [self.a, self.b, self.c], [self.objective])
+        self.assertImpact(self.a, [self.b, self.c], [self.objective])
+        self.assertImpact(self.d, [self.a, self.b, self.c], [self.objective, self.other_objective])
+        self.assertImpact(self.c, [], [self.objective])
+    
+    def test_cycles(self):
+        self.a.related_requirements.add(self.c)
+        self.assertImpact(self.a, [self.b, self.c], [self.objective])
+        self.assertImpact(self.c, [self.a, self.b], [self.objective])
+    
+    def test_link_added_carries_index_over(self):
+        impact.for_project(self.project.pk)
+        self.d.related_requirements.add(self.requirement)
+        with self.assertNumQueries(1):
+            index = impact.for_project(self.project.pk)
+        self.assertEqual(index.impacted(self.requirement.pk), sorted([self.a.pk, self.b.pk, self.c.pk, self.d.pk]))
+        
+        # Closing a cycle rebuilds the index
+        self.requirement.related_requirements.add(self.c)
+        self.assertImpact(self.c, [self.requirement, self.a, self.b, self.d], [self.objective, self.other_objective])
+        
+        self.b.related_requirements.remove(self.a)
+        self.assertImpact(self.a, [], [])
+    
+    def test_objective_links_read_per_query(self):
+        impact.for_project(self.project.pk)
+        self.b.objectives.add(self.other_objective)
+        # The cached index holds the structure only, so it stays current
+        with self.assertNumQueries(1):
+            impact.for_project(self.project.pk)
+        self.assertImpact(self.a, [self.b, self.c], [self.objective, self.other_objective])
+        
+        self.objective.requirements.remove(self.c)
+        self.assertImpact(self.a, [self.b, self.c], [self.other_objective])
+        self.b.objectives.clear()
+        self.assertImpact(self.a, [self.b, self.c], [])
+        
+        apply_link_operations(self.project, [{'op': 'add', 'requirement': self.c.pk, 'objective': self.objective.pk}])
+        self.assertImpact(self.a, [self.b, self.c], [self.objective])
+        self.objective.delete()
+        self.assertImpact(self.a, [self.b, self.c], [])
+    
+    def test_matches_search(self):
+        generator = random.Random(20)
+        size = 300
+        parents = {pk: generator.randrange(1, pk) if pk > 1 and generator.random() < 0.8 else None for pk in range(1, size + 1)}
+        related = {(generator.randint(1, size), generator.randint(1, size)) for _ in range(150)}
+        edges = [(target, source, graph.RELATED) for source, target in related]
+        edges += [(parent, pk, graph.PARENT) for pk, parent in parents.items() if parent]
+        index = impact.ImpactIndex(graph.DependencyGraph(parents, edges))
+        pairs = [(source, target) for source, target, _ in edges]
+        for pk in range(1, size + 1):
+            self.assertEqual(index.impacted(pk), self.search(pairs, pk))
+        
+        # Links added in place must give the same answers as a rebuild
+        added = []
+        while len(added) < 20:
+            edge = (generator.randint(1, size), generator.randint(1, size))
+            if index.add_edges([edge]):
+                added.append(edge)
+        for pk in range(1, size + 1):
+            self.assertEqual(index.impacted(pk), self.search(pairs + added, pk))
+    
+    def test_large_project_query_time(self):
+        generator = random.Random(7)
+        size = 20000
+        parents = {pk: pk // 4 or None for pk in range(1, size + 1)}
+        edges = [(parent, pk, graph.PARENT) for pk, parent in parents.items() if parent]
+        edges += [(generator.randint(1, size), generator.randint(1, size), graph.RELATED) for _ in range(size)]
+        links = impact.ObjectiveLinks((pk, pk % 50 + offset) for pk in range(1, size + 1) for offset in (0, 50))
+        index = impact.ImpactIndex(graph.DependencyGraph(parents, edges))
+        
+        for pk in (1, 2, size // 2, size):
+            timings = []
+            for _ in range(3):
+                started = time.perf_counter()
+                links.objectives(sorted([pk, *index.impacted(pk)]))
+                timings.append(time.perf_counter() - started)
+            self.assertLess(min(timings), 0.05)
+    
+    def test_cached_analysis_reads_no_links(self):
+        self.assertImpact(self.d, [self.a, self.b, self.c], [self.objective, self.other_objective])
+        # The graph and data versions only
+        with self.assertNumQueries(2):
+            impact.analyse(self.d)
+    
+    def test_endpoint(self):
+        url = reverse('requirement-impact', kwargs={'pk': self.d.pk})
+        data = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual(data['requirement_count'], 3)
+        self.assertEqual([row['id'] for row in data['requirements']], [self.a.pk, self.b.pk])
+        self.assertTrue(data['truncated'])
+        self.assertEqual({objective['id'] for objective in data['objectives']}, {self.objective.pk, self.other_objective.pk})
+        self.assertEqual(self.client.get(url, {'limit': 'all'}).status_code, 400)
+    
+    def test_detail_panel(self):
+        response = self.client.get(reverse('requirement-detail', kwargs={'pk': self.a.pk}))
+        self.assertContains(response, 'Change Impact')
+        self.assertContains(response, 'affects 2 requirements')
+        self.assertContains(response, self.objective.title)
+
+
+class CachingTests(RequirementsBaseTestCase):
+    """Test the versioned per-project cache, its invalidation and its backends"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        caching.reset_counts()
+        self.addCleanup(cache.clear)
+        self.addCleanup(caching.reset_counts)
+    
+    def test_writes_bump_version(self):
+        other_project = Project.objects.create(
+            name='Other Project', organization=self.organization, created_by=self.admin_user
+        )
+        version = caching.version(self.project.pk)
+        other_version = caching.version(other_project.pk)
+        graph_version = caching.version(self.project.pk, 'graph')
+        
+        self.requirement.title = 'Renamed'
+        self.requirement.save()
+        self.assertNotEqual(caching.version(self.project.pk), version)
+        self.assertEqual(caching.version(other_project.pk), other_version)
+        # Labels are not part of the graph
+        self.assertEqual(caching.version(self.project.pk, 'graph'), graph_version)
+        
+        for change in (
+            lambda: self.objective.requirements.add(self.requirement),
+            lambda: self.category.save(),
+            lambda: RequirementCategory.objects.create(name='New', project=self.project),
+            lambda: ProjectObjective.objects.filter(pk=self.objective.pk).first().delete(),
+        ):
+            version = caching.version(self.project.pk)
+            change()
+            self.assertNotEqual(caching.version(self.project.pk), version)
+        
+        # Moving a requirement makes both projects stale
+        version = caching.version(self.project.pk)
+        self.requirement.project = other_project
+        self.requirement.save()
+        self.assertNotEqual(caching.version(self.project.pk), version)
+        self.assertNotEqual(caching.version(other_project.pk), other_version)
+    
+    def test_bump_returns_tokens(self):
+        version = caching.version(self.project.pk, 'graph')
+        tokens = caching.bump(self.project.pk, 'graph', previous=True)
+        self.assertEqual(tokens['graph'][0], version)
+        self.assertEqual(tokens['graph'][1], caching.version(self.project.pk, 'graph'))
+        self.assertIsNone(caching.bump(self.project.pk, 'graph')['graph'][0])
+        
+        # Projects without a version row get one
+        ProjectCacheVersion.objects.all().delete()
+        self.assertEqual(caching.bump(self.project.pk, 'graph', previous=True)['graph'][0], None)
+        self.assertEqual(ProjectCacheVersion.objects.count(), 1)
+    
+    def test_get_or_set(self):
+        compute = mock.Mock(return_value=['value'])
+        project_cache = caching.ProjectCache(self.project.pk)
+        self.assertEqual(project_cache.get_or_set('matrix', compute, 1), ['value'])
+        self.assertEqual(caching.ProjectCache(self.project.pk).get_or_set('matrix', compute, 1), ['value'])
+        self.assertEqual(compute.call_count, 1)
+        
+        # Other parts are other entries
+        caching.ProjectCache(self.project.pk).get_or_set('matrix', compute, 2)
+        self.assertEqual(compute.call_count, 2)
+        
+        caching.bump(self.project.pk)
+        caching.ProjectCache(self.project.pk).get_or_set('matrix', compute, 1)
+        self.assertEqual(compute.call_count, 3)
+        self.assertEqual(caching.counts()['matrix'], {'hits': 1, 'misses': 3})
+    
+    def test_project_detail_cached(self):
+        url = reverse('project-detail', kwargs={'pk': self.project.pk})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        response = self.client.get(url)
+        self.assertContains(response, 'Test Requirement')
+        
+        self.requirement.title = 'Renamed Requirement'
+        self.requirement.save()
+        with CaptureQueriesContext(connection) as refreshed:
+            response = self.client.get(url)
+        self.assertContains(response, 'Renamed Requirement')
+        self.assertGreater(len(refreshed.captured_queries), len(first.captured_queries))
+        self.assertEqual(caching.counts()['project-detail'], {'hits': 2, 'misses': 2})
+    
+    def test_requirement_list_cached(self):
+        url = reverse('requirement-list', kwargs={'project_id': self.project.pk})
+        self.client.get(url)
+        self.client.get(url, {'status': 'Draft'})
+        self.client.get(url)
+        self.assertEqual(caching.counts()['requirement-list'], {'hits': 1, 'misses': 2})
+        
+        Requirement.objects.create(
+            title='Fresh Requirement', description='Description', project=self.project, created_by=self.admin_user
+        )
+        self.assertContains(self.client.get(url), 'Fresh Requirement')
+    
+    def test_matrix_cached(self):
+        url = reverse('traceability-matrix', kwargs={'project_id': self.project.pk})
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(caching.counts()['matrix'], {'hits': 1, 'misses': 1})
+        
+        apply_link_operations(self.project, [
+            {'op': 'add', 'requirement': self.requirement.pk, 'objective': self.objective.pk}
+        ])
+        response = self.client.get(url)
+        self.assertEqual(caching.counts()['matrix'], {'hits': 1, 'misses': 2})
+        self.assertTrue(response.context['matrix'].is_linked(self.requirement.pk, self.objective.pk))
+    
+    def test_export_cached(self):
+        url = reverse('export-requirements', kwargs={'project_id': self.project.pk})
+        first = b''.join(self.client.get(url).streaming_content)
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(b''.join(response.streaming_content), first)
+        
+        # An evicted chunk is rendered again
+        with mock.patch.object(views.ExportRequirementsCSV, 'chunk_size', 1):
+            caching.bump(self.project.pk)
+            Requirement.objects.create(
+                title='Second', description='Description', project=self.project, created_by=self.admin_user
+            )
+            expected = b''.join(self.client.get(url).streaming_content)
+            cache.delete(caching.ProjectCache(self.project.pk).key('export', 1))
+            self.assertEqual(b''.join(self.client.get(url).streaming_content), expected)
+        self.assertIn(b'Second', expected)
+    
+    def test_export_streams_while_caching(self):
+        Requirement.objects.create(
+            title='Second', description='Description', project=self.project, created_by=self.admin_user
+        )
+        url = reverse('export-requirements', kwargs={'project_id': self.project.pk})
+        project_cache = caching.ProjectCache(self.project.pk)
+        with mock.patch.object(views.ExportRequirementsCSV, 'chunk_size', 1):
+            content = iter(self.client.get(url).streaming_content)
+            first = next(content)
+            # Sent before the rest is rendered, and not read back until complete
+            self.assertIsNotNone(project_cache.get('export', 0, counted=False))
+            self.assertIsNone(project_cache.get('export', 1, counted=False))
+            self.assertIsNone(project_cache.get('export', counted=False))
+            rest = b''.join(content)
+        self.assertEqual(project_cache.get('export', counted=False), 2)
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(b''.join(response.streaming_content), first + rest)
+    
+    def test_memory_cache_lru_and_size(self):
+        memory = MemoryCache('caching-tests', {'OPTIONS': {'MAX_ENTRIES': 3, 'MAX_SIZE': 4000}})
+        self.addCleanup(memory.clear)
+        for key in 'abc':
+            memory.set(key, key)
+        memory.get('a')
+        memory.set('d', 'd')
+        # b was the least recently used
+        self.assertIsNone(memory.get('b'))
+        self.assertEqual(memory.get('a'), 'a')
+        
+        memory.clear()
+        memory.set('a', 'x' * 1500)
+        memory.set('b', 'x' * 1500)
+        memory.get('a')
+        memory.set('c', 'x' * 1500)
+        self.assertLessEqual(memory.size, 4000)
+        self.assertIsNone(memory.get('b'))
+        self.assertIsNotNone(memory.get('a'))
+        # Too large on its own
+        memory.set('huge', 'x' * 5000)
+        self.assertIsNone(memory.get('huge'))
+        
+        # Counters are stored again in place
+        memory.clear()
+        memory.set('count', 1)
+        memory.incr('count', 10 ** 100)
+        self.assertEqual(memory.size, len(pickle.dumps(10 ** 100 + 1, memory.pickle_protocol)))
+    
+    def test_file_cache_lru(self):
+        directory = tempfile.mkdtemp()
+        files = FileCache(directory, {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3, 'MAX_SIZE': 100000}})
+        self.addCleanup(files.clear)
+        for age, key in enumerate('abc'):
+            files.set(key, key)
+            path = files._key_to_file(key)
+            os.utime(path, (time.time() - 100 + age, time.time() - 100 + age))
+        files.get('a')
+        files.set('d', 'd')
+        self.assertIsNone(files.get('b'))
+        self.assertEqual(files.get('a'), 'a')
+        self.assertEqual(files.get('d'), 'd')
+        
+        files.clear()
+        for key in 'abc':
+            files.set(key, os.urandom(30000))
+        files.set('d', os.urandom(30000))
+        self.assertLessEqual(files.size, 100000)
+        self.assertIsNotNone(files.get('d'))
+    
+    def test_cache_stats_command(self):
+        project_cache = caching.ProjectCache(self.project.pk)
+        project_cache.get_or_set('matrix', list)
+        project_cache.get_or_set('matrix', list)
+        out = io.StringIO()
+        call_command('cache_stats', '--reset', stdout=out)
+        self.assertRegex(out.getvalue(), r'matrix\s+1\s+1\s+50%')
+        self.assertEqual(caching.counts()['matrix'], {'hits': 0, 'misses': 0})
+
+
+class ConditionalGetTests(RequirementsBaseTestCase):
+    """Test ETag and Last-Modified handling of project pages"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.urls = [
+            reverse('project-detail', kwargs={'pk': self.project.pk}),
+            reverse('requirement-list', kwargs={'project_id': self.project.pk}),
+            reverse('traceability-matrix', kwargs={'project_id': self.project.pk}),
+            reverse('export-requirements', kwargs={'project_id': self.project.pk}),
+        ]
+    
+    def test_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+                self.assertIn('private', response['Cache-Control'])
+                
+                # Session, user, project, the user's roles and the project's version
+                with self.assertNumQueries(5):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+    
+    def rename_requirement(self):
+        self.requirement.title = 'Renamed Requirement'
+        self.requirement.save()
+    
+    def test_changes_make_new_etag(self):
+        url = self.urls[0]
+        etag = self.client.get(url)['ETag']
+        for change in (
+            self.rename_requirement,
+            lambda: self.objective.requirements.add(self.requirement),
+            lambda: apply_link_operations(self.project, [
+                {'op': 'remove', 'requirement': self.requirement.pk, 'objective': self.objective.pk}
+            ]),
+            lambda: Project.objects.filter(pk=self.project.pk).first().save(),
+            lambda: self.organization.save(),
+        ):
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+    
+    def test_etag_per_user(self):
+        url = self.urls[1]
+        etag = self.client.get(url)['ETag']
+        other_user = User.objects.create_user(username='other_user', password='password123')
+        OrganizationMember.objects.create(user=other_user, organization=self.organization, role='viewer')
+        other_client = Client()
+        other_client.login(username='other_user', password='password123')
+        response = other_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_messages_not_answered_with_not_modified(self):
+        url = self.urls[2]
+        other_project = Project.objects.create(
+            name='Other Project', organization=self.organization, created_by=self.admin_user
+        )
+        other_objective = ProjectObjective.objects.create(title='Other objective', project=other_project)
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('requirement-add-objective', kwargs={
+            'pk': self.requirement.pk, 'objective_id': other_objective.pk
+        }))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'must belong to the same project')
+        self.assertNotIn('ETag', response)
+        
+        # Shown once, then the page is conditional again
+        response = self.client.get(url)
+        self.assertNotContains(response, 'must belong to the same project')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+    
+    def test_missing_project_not_found(self):
+        url = reverse('requirement-list', kwargs={'project_id': self.project.pk + 100})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+
+class SingleFlightTests(RequirementsBaseTestCase):
+    """Test coalescing of concurrent computations"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.lock_dir = tempfile.mkdtemp()
+        settings_override = self.settings(REQUIREMENTS_LOCK_DIR=self.lock_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+    
+    def run_threads(self, target, count=8):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_threads_share_one_computation(self):
+        stored = {}
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            stored['key'] = ['value']
+            return stored['key']
+        
+        results = self.run_threads(
+            lambda: singleflight.run('key', compute, lambda: stored.get('key', singleflight.MISSING))
+        )
+        self.assertEqual(results, [['value']] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(os.listdir(self.lock_dir), [])
+    
+    def test_project_cache_coalesces(self):
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'objectives': []}
+        
+        # A given version reads no version row, so the threads need no database
+        results = self.run_threads(
+            lambda: caching.ProjectCache(self.project.pk, at=1).get_or_set('matrix', compute, 500)
+        )
+        self.assertEqual(results, [{'objectives': []}] * 8)
+        self.assertEqual(len(calls), 1)
+    
+    @unittest.skipIf(singleflight.fcntl is None, 'Needs flock')
+    def test_processes_share_one_computation(self):
+        result_path = os.path.join(self.lock_dir, 'result')
+        calls_path = os.path.join(self.lock_dir, 'calls')
+        
+        def lookup():
+            try:
+                with open(result_path) as result:
+                    return result.read()
+            except FileNotFoundError:
+                return singleflight.MISSING
+        
+        def compute():
+            with open(calls_path, 'a') as calls:
+                calls.write('call\n')
+            time.sleep(0.3)
+            with open(result_path, 'w') as result:
+                result.write('value')
+            return 'value'
+        
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=singleflight.run, args=('key', compute, lookup)) for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        with open(calls_path) as calls:
+            self.assertEqual(calls.read(), 'call\n')
+        self.assertEqual(sorted(os.listdir(self.lock_dir)), ['calls', 'result'])
+    
+    def test_failed_leader(self):
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise ValueError('Failed')
+            return 'value'
+        
+        results = []
+        
+        def call():
+            try:
+                results.append(singleflight.run('key', compute, lambda: singleflight.MISSING))
+            except ValueError:
+                results.append('failed')
+        
+        self.run_threads(call, count=3)
+        # The followers compute for themselves
+        self.assertEqual(sorted(results), ['failed', 'value', 'value'])
+        self.assertEqual(os.listdir(self.lock_dir), [])
+    
+    def export_view(self, renders):
+        """An export view of the project at a fixed version, rendering four slow chunks without the database"""
+        def render_chunks(project, start=0):
+            renders.append(start)
+            for number in range(start, 4):
+                time.sleep(0.05)
+                yield f'chunk {number}\n'
+        
+        view = views.ExportRequirementsCSV()
+        view.get_project_cache = lambda: caching.ProjectCache(self.project.pk, at=1)
+        view.render_chunks = render_chunks
+        return view
+    
+    def test_export_rendered_once_for_concurrent_requests(self):
+        renders = []
+        results = self.run_threads(lambda: ''.join(self.export_view(renders).stream_rows(self.project)))
+        self.assertEqual(results, ['chunk 0\nchunk 1\nchunk 2\nchunk 3\n'] * 8)
+        self.assertEqual(renders, [0])
+    
+    @unittest.skipIf(singleflight.fcntl is None, 'Needs flock')
+    @mock.patch('requirements.caching.is_shared', return_value=True)
+    def test_export_leader_holds_lock_file(self, is_shared):
+        renders = []
+        results = self.run_threads(lambda: ''.join(self.export_view(renders).stream_rows(self.project)), count=4)
+        self.assertEqual(results, ['chunk 0\nchunk 1\nchunk 2\nchunk 3\n'] * 4)
+        self.assertEqual(renders, [0])
+        self.assertEqual(os.listdir(self.lock_dir), [])
+    
+    def test_export_carried_on_after_leader_stops(self):
+        renders = []
+        leader = self.export_view(renders).stream_rows(self.project)
+        self.assertEqual(next(leader), 'chunk 0\n')
+        # The client went away after the first chunk
+        leader.close()
+        follower = self.export_view(renders).stream_rows(self.project)
+        self.assertEqual(''.join(follower), 'chunk 0\nchunk 1\nchunk 2\nchunk 3\n')
+        self.assertEqual(renders, [0, 1])
+    
+    def test_missing_stats_rebuilt(self):
+        ProjectStats.objects.filter(project=self.project).delete()
+        with mock.patch('requirements.stats.rebuild', wraps=stats.rebuild) as rebuild:
+            self.assertEqual(stats.rebuild_missing(self.project.pk).requirement_count, 1)
+            self.assertEqual(stats.rebuild_missing(self.project.pk).requirement_count, 1)
+        self.assertEqual(rebuild.call_count, 1)
+
+
+class ObjectLoadingTests(RequirementsBaseTestCase):
+    """Test each page loads its primary object once"""
+    
+    def loads(self, method, url, table, pk, data=None):
+        """Status and the number of queries reading `pk` from `table`"""
+        pattern = re.compile(rf'^SELECT .* FROM "{table}" .*WHERE .*"{table}"\."id" = {pk}\b')
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data or {})
+        return response.status_code, sum(1 for query in ctx.captured_queries if pattern.match(query['sql']))
+    
+    def test_requirement_pages(self):
+        pk = self.requirement.pk
+        table = 'requirements_requirement'
+        form = {
+            'title': 'Renamed', 'description': 'Description', 'type': 'Functional',
+            'priority': 'High', 'status': 'Draft', 'category': self.category.pk,
+        }
+        for method, url, data in (
+            ('get', reverse('requirement-detail', kwargs={'pk': pk}), None),
+            ('get', reverse('requirement-update', kwargs={'pk': pk}), None),
+            ('post', reverse('requirement-update', kwargs={'pk': pk}), form),
+            ('get', reverse('requirement-impact', kwargs={'pk': pk}), None),
+            ('post', reverse('requirement-status-update', kwargs={'pk': pk, 'status': 'Approved'}), None),
+            ('get', reverse('requirement-delete', kwargs={'pk': pk}), None),
+        ):
+            with self.subTest(method=method, url=url):
+                status, loads = self.loads(method, url, table, pk, data)
+                self.assertIn(status, (200, 302))
+                self.assertEqual(loads, 1)
+        self.assertEqual(Requirement.objects.get(pk=pk).title, 'Renamed')
+    
+    def test_delete_without_permission(self):
+        viewer = User.objects.create_user(username='viewer_user', password='password123')
+        OrganizationMember.objects.create(user=viewer, organization=self.organization, role='viewer')
+        self.client.login(username='viewer_user', password='password123')
+        url = reverse('requirement-delete', kwargs={'pk': self.requirement.pk})
+        status, loads = self.loads('post', url, 'requirements_requirement', self.requirement.pk)
+        self.assertEqual((status, loads), (302, 1))
+        self.assertTrue(Requirement.objects.filter(pk=self.requirement.pk).exists())
+    
+    def test_project_pages(self):
+        pk = self.project.pk
+        for method, url in (
+            ('get', reverse('project-detail', kwargs={'pk': pk})),
+            ('get', reverse('project-delete', kwargs={'pk': pk})),
+            ('get', reverse('requirement-create', kwargs={'project_id': pk})),
+            ('get', reverse('traceability-matrix', kwargs={'project_id': pk})),
+        ):
+            with self.subTest(url=url):
+                status, loads = self.loads(method, url, 'projects_project', pk)
+                self.assertEqual((status, loads), (200, 1))
+
+
 class EdgeCaseTests(RequirementsBaseTestCase):
     """Test edge cases and error scenarios"""
     
@@ -6,11 +6,15 @@ urlpatterns = [
     # Requirements list view
     path('project/<int:project_id>/', views.RequirementListView.as_view(), name='requirement-list'),
     
+    # Search across the user's organizations
+    path('search/', views.RequirementSearchView.as_view(), name='requirement-search'),
+    
     # Requirement detail view
     path('<int:pk>/', views.RequirementDetailView.as_view(), name='requirement-detail'),
     
     # Create and update views
     path('project/<int:project_id>/create/', views.RequirementCreateView.as_view(), name='requirement-create'),
+    path('<int:pk>/impact/', views.RequirementImpactView.as_view(), name='requirement-impact'),
     path('<int:pk>/update/', views.RequirementUpdateView.as_view(), name='requirement-update'),
     path('<int:pk>/delete/', views.RequirementDeleteView.as_view(), name='requirement-delete'),
     
@@ -19,10 +23,15 @@ urlpatterns = [
     
     # Export view
     path('project/<int:project_id>/export/', views.ExportRequirementsCSV.as_view(), name='export-requirements'),
+    path('project/<int:project_id>/import/', views.ImportRequirementsView.as_view(), name='import-requirements'),
     
     # Status update view
     path('<int:pk>/status/<str:status>/', views.RequirementStatusUpdateView.as_view(), name='requirement-status-update'),
     path('project/<int:project_id>/objectives/create/', views.ProjectObjectiveCreateView.as_view(), name='objective-create'),
     path('project/<int:project_id>/traceability-matrix/', views.TraceabilityMatrixView.as_view(), name='traceability-matrix'),
+    path('project/<int:project_id>/traceability-matrix/tiles/', views.TraceabilityMatrixTileView.as_view(), name='traceability-matrix-tiles'),
+    path('project/<int:project_id>/traceability-matrix/links/', views.TraceabilityMatrixLinksView.as_view(), name='traceability-matrix-links'),
+    path('project/<int:project_id>/dependency-graph/', views.DependencyGraphView.as_view(), name='dependency-graph'),
+    path('project/<int:project_id>/dependency-graph/data/', views.DependencyGraphDataView.as_view(), name='dependency-graph-data'),
     path('requirement/<int:pk>/add-objective/<int:objective_id>/', views.RequirementAddObjectiveView.as_view(), name='requirement-add-objective'),
 ]
\ No newline at end of file
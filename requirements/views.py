@@ -1,59 +1,174 @@
 # requirements/views.py
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View, FormView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import HttpResponseRedirect, StreamingHttpResponse, JsonResponse
+from django.conf import settings
+from django.utils.text import slugify
+from django.db.models import F
 from django_filters.views import FilterView
 import csv
-from projects.models import Project
-from .models import Requirement, RequirementCategory, RequirementHistory, ProjectObjective
-from .forms import RequirementForm, RequirementCategoryForm
+import io
+import json
+import time
+from projects import access
+from projects.access import ProjectAccessMixin, RequirementAccessMixin
+from .models import Requirement, RequirementCategory, ProjectObjective
+from .forms import RequirementForm, RequirementCategoryForm, RequirementImportForm
+from .importers import RequirementImporter
+from .matrix import (
+    TraceabilityMatrix, LinkOperationError, apply_link_operations, load_tile,
+    MAX_BATCH_OPERATIONS, MAX_TILE_ROWS, MAX_TILE_COLUMNS
+)
+from .conditional import ConditionalGetMixin
+from .facets import facet_counts
 from .filters import RequirementFilter
+from .pagination import KeysetPaginator, cursor_params, to_query
+from . import audit, caching, graph, hierarchy, impact, rows, search, singleflight
 
-class RequirementListView(LoginRequiredMixin, FilterView):
+class RequirementListView(LoginRequiredMixin, ProjectAccessMixin, ConditionalGetMixin, FilterView):
     model = Requirement
     template_name = 'requirements/requirement_list.html'
+    rows_template_name = 'requirements/requirement_rows.html'
     context_object_name = 'requirements'
     filterset_class = RequirementFilter
+    page_size = 50
     
     def get_queryset(self):
-        self.project = get_object_or_404(Project, pk=self.kwargs.get('project_id'))
         return Requirement.objects.filter(project=self.project)
     
+    def get_filterset_kwargs(self, filterset_class):
+        kwargs = super().get_filterset_kwargs(filterset_class)
+        # A cursor carries the filters of the page it came from
+        self.filter_params = cursor_params(self.request)
+        kwargs['data'] = self.filter_params or None
+        return kwargs
+    
+    def get_template_names(self):
+        if self.request.GET.get('partial'):
+            return [self.rows_template_name]
+        return super().get_template_names()
+    
+    def get_ordering(self):
+        return self.filterset.get_ordering()
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['project'] = self.project
-        context['status_counts'] = {
-            status: self.get_queryset().filter(status=status[0]).count()
-            for status in Requirement.STATUS_CHOICES
+        params = {
+            key: values for key, values in self.filter_params.lists()
+            if key not in ('cursor', 'partial') and any(values)
         }
+        paginator = KeysetPaginator(self.get_ordering(), self.page_size)
+        cursor = self.request.GET.get('cursor')
+        # Pages and counts are cached per project version and filter parameters
+        project_cache = self.get_project_cache()
+        variant = sorted(params.items())
+        page = project_cache.get_or_set(
+            'requirement-list', lambda: paginator.paginate(self.get_rows(), cursor, params), variant, cursor
+        )
+        context['page'] = page
+        context['requirements'] = page.object_list
+        context['first_page_query'] = to_query(params).urlencode()
+        context['project'] = self.project
+        if not self.request.GET.get('partial'):
+            facets = project_cache.get_or_set('requirement-facets', lambda: facet_counts(self.object_list), variant)
+            self.filterset.show_facet_counts(facets)
+            context['facets'] = facets
+            context['status_counts'] = facets.status
+            if 'status' in params:
+                # Each tab replaces the status filter, so it counts without it
+                params_but_status = {key: values for key, values in params.items() if key != 'status'}
+                tab_facets = project_cache.get_or_set(
+                    'requirement-facets', lambda: facet_counts(self.get_unfiltered_by_status()),
+                    sorted(params_but_status.items()),
+                )
+            else:
+                tab_facets = facets
+            context['status_tabs'] = self.get_status_tabs(params, tab_facets)
+        return context
+    
+    def get_unfiltered_by_status(self):
+        """The requirements matching every filter but `status`"""
+        data = self.filter_params.copy()
+        data.pop('status')
+        return self.filterset_class(data, queryset=self.get_queryset(), request=self.request).qs
+    
+    def get_rows(self):
+        """The filtered requirements as read-only table rows"""
+        fields = rows.TABLE_FIELDS
+        if 'search_rank' in self.object_list.query.annotations:
+            fields += ('search_snippet',)
+        # The paginator reads the sort key back from each row
+        fields += tuple(name for name in self.get_ordering() if name not in fields and name != 'pk')
+        requirements = rows.annotate(self.object_list, 'category_name', 'child_count', 'objective_count')
+        return rows.values(requirements, *fields)
+    
+    def get_status_tabs(self, params, facets):
+        """Per-status tabs; their rows are fetched when a tab is first shown"""
+        tabs = []
+        for code, label, count in facets.choices('status'):
+            query = to_query(params, status=code, partial='1')
+            tabs.append({
+                'code': code,
+                'label': label,
+                'slug': slugify(code),
+                'count': count,
+                'url': f'?{query.urlencode()}',
+            })
+        return tabs
+
+class RequirementSearchView(LoginRequiredMixin, ListView):
+    """Full-text search across every project in the user's organizations"""
+    template_name = 'requirements/search_results.html'
+    context_object_name = 'results'
+    max_results = 50
+    
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        if not self.query:
+            return Requirement.objects.none()
+        requirements = access.requirements(self.request.user, Requirement.objects.all()).annotate(
+            project_name=F('project__name')
+        )
+        results = search.apply(requirements, self.query)
+        fields = ['id', 'identifier', 'title', 'project_name']
+        if 'search_snippet' in results.query.annotations:
+            fields.append('search_snippet')
+        return rows.values(results, *fields)[:self.max_results]
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
         return context
 
-class RequirementDetailView(LoginRequiredMixin, DetailView):
+class RequirementDetailView(LoginRequiredMixin, RequirementAccessMixin, DetailView):
     model = Requirement
     template_name = 'requirements/requirement_detail.html'
     context_object_name = 'requirement'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        req = self.get_object()
+        req = self.object
         
-        context['children'] = req.children.all()
+        context['ancestors'] = hierarchy.ancestors(req).only('identifier', 'title')
+        context['children'] = hierarchy.tree(req)
         context['related'] = req.related_requirements.all()
+        context['impact'] = impact.summary(req)
         context['history'] = req.history.all().order_by('-timestamp')
-        context['project'] = req.project
+        context['project'] = self.project
         
         return context
 
-class RequirementCreateView(LoginRequiredMixin, CreateView):
+class RequirementCreateView(LoginRequiredMixin, ProjectAccessMixin, CreateView):
     model = Requirement
     form_class = RequirementForm
     template_name = 'requirements/requirement_form.html'
+    change = True
     
     def get_project(self):
-        return get_object_or_404(Project, pk=self.kwargs.get('project_id'))
+        return self.project
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -68,15 +183,9 @@ class RequirementCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.created_by = self.request.user
         form.instance.project = self.get_project()
-        response = super().form_valid(form)
-        
-        # Create initial history entry
-        RequirementHistory.objects.create(
-            requirement=self.object,
-            status=self.object.status,
-            changed_by=self.request.user,
-            notes=f"Requirement created with status: {self.object.status}"
-        )
+        with audit.collect():
+            response = super().form_valid(form)
+            audit.record_creation(self.object, self.request.user)
         
         messages.success(self.request, f'Requirement {self.object.identifier} created successfully!')
         return response
@@ -84,91 +193,190 @@ class RequirementCreateView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse('project-detail', kwargs={'pk': self.kwargs.get('project_id')})
 
-class RequirementUpdateView(LoginRequiredMixin, UpdateView):
+class RequirementUpdateView(LoginRequiredMixin, RequirementAccessMixin, UpdateView):
     model = Requirement
     form_class = RequirementForm
     template_name = 'requirements/requirement_form.html'
+    change = True
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['project'] = self.get_object().project
+        kwargs['project'] = self.project
         return kwargs
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['project'] = self.get_object().project
+        context['project'] = self.project
         return context
     
     def form_valid(self, form):
-        old_status = self.get_object().status
         form.instance.updated_by = self.request.user
-        response = super().form_valid(form)
         
-        # Create history entry if status changed
-        if old_status != self.object.status:
-            RequirementHistory.objects.create(
-                requirement=self.object,
-                status=self.object.status,
-                changed_by=self.request.user,
-                notes=f"Status changed from {old_status} to {self.object.status}"
-            )
+        # The model records the history entry for whatever fields changed
+        with audit.collect():
+            self.object = form.save(commit=False)
+            self.object.save(user=self.request.user)
+            form.save_m2m()
         
         messages.success(self.request, f'Requirement {self.object.identifier} updated successfully!')
-        return response
+        return HttpResponseRedirect(self.get_success_url())
 
-class RequirementCategoryCreateView(LoginRequiredMixin, CreateView):
+class RequirementCategoryCreateView(LoginRequiredMixin, ProjectAccessMixin, CreateView):
     model = RequirementCategory
     form_class = RequirementCategoryForm
     template_name = 'requirements/category_form.html'
+    change = True
     
     def form_valid(self, form):
-        project = get_object_or_404(Project, pk=self.kwargs.get('project_id'))
-        form.instance.project = project
+        form.instance.project = self.project
         messages.success(self.request, 'Category created successfully!')
         return super().form_valid(form)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['project'] = get_object_or_404(Project, pk=self.kwargs.get('project_id'))
+        context['project'] = self.project
         return context
     
     def get_success_url(self):
         return reverse('project-detail', kwargs={'pk': self.kwargs.get('project_id')})
     
-class ExportRequirementsCSV(LoginRequiredMixin, View):
+class Echo:
+    """Pseudo-buffer for csv.writer that hands each row back instead of storing it"""
+    def write(self, value):
+        return value
+
+class ExportRequirementsCSV(LoginRequiredMixin, ProjectAccessMixin, ConditionalGetMixin, View):
+    header = [
+        'ID', 'Title', 'Type', 'Status', 'Priority', 'Description', 
+        'Acceptance Criteria', 'Created By', 'Created At', 'Updated At', 'Category'
+    ]
+    columns = [
+        'identifier', 'title', 'type', 'status', 'priority', 'description',
+        'acceptance_criteria', 'created_by__username', 'created_at', 'updated_at', 'category_name'
+    ]
+    chunk_size = 2000
+    
     def get(self, request, project_id):
-        project = get_object_or_404(Project, pk=project_id)
+        project = self.project
         
-        response = HttpResponse(content_type='text/csv')
+        response = StreamingHttpResponse(self.stream_rows(project), content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="requirements-{project.name}.csv"'
+        return response
+    
+    def stream_rows(self, project):
+        """
+        The CSV in chunks of `chunk_size` rows, sent from the cache. A missing
+        export is streamed from the database by one request, which caches each
+        chunk as it is sent and the chunk count last; concurrent requests send
+        the chunks as they appear, and one of them carries on should it stop.
+        """
+        project_cache = self.get_project_cache()
+        chunk_count = project_cache.get('export')
+        number = 0
+        deadline = time.monotonic() + singleflight.wait_timeout()
+        while chunk_count is None or number < chunk_count:
+            chunk = project_cache.get('export', number, counted=False)
+            if chunk is not None:
+                yield chunk
+                number += 1
+                deadline = time.monotonic() + singleflight.wait_timeout()
+                continue
+            if chunk_count is None:
+                chunk_count = project_cache.get('export', counted=False)
+                if chunk_count is not None:
+                    continue
+            with singleflight.lead(project_cache.key('export'), across_processes=caching.is_shared()) as leader:
+                if leader:
+                    # Missing, evicted since or left unfinished
+                    yield from self.cache_chunks(project, project_cache, start=number)
+                    return
+            if time.monotonic() >= deadline:
+                # The leader is stuck or its client reads slowly; carry on from the database
+                yield from self.render_chunks(project, start=number)
+                return
+            time.sleep(singleflight.POLL_INTERVAL)
+    
+    def cache_chunks(self, project, project_cache, start=0):
+        """The CSV from chunk number `start` on, caching each chunk as it is sent and the chunk count last"""
+        number = start
+        for chunk in self.render_chunks(project, start=start):
+            project_cache.set('export', chunk, number)
+            number += 1
+            yield chunk
+        project_cache.set('export', number)
+    
+    def render_chunks(self, project, start=0):
+        """The CSV from chunk number `start` on; the first chunk starts with the header"""
+        writer = csv.writer(Echo())
+        chunk = [writer.writerow(self.header)] if start == 0 else []
         
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Title', 'Type', 'Status', 'Priority', 'Description', 
-            'Acceptance Criteria', 'Created By', 'Created At', 'Updated At'
-        ])
+        type_display = dict(Requirement.TYPE_CHOICES)
+        status_display = dict(Requirement.STATUS_CHOICES)
+        priority_display = dict(Requirement.PRIORITY_CHOICES)
         
-        requirements = Requirement.objects.filter(project=project)
-        for req in requirements:
-            writer.writerow([
-                req.identifier,
-                req.title,
-                req.get_type_display(),
-                req.get_status_display(),
-                req.get_priority_display(),
-                req.description,
-                req.acceptance_criteria,
-                req.created_by.username if req.created_by else '',
-                req.created_at.strftime('%Y-%m-%d %H:%M'),
-                req.updated_at.strftime('%Y-%m-%d %H:%M')
-            ])
-            
-        return response
+        # A values-only query read through a server-side cursor keeps memory
+        # flat and resolves the creator's username and category name in the same query
+        requirements = rows.annotate(Requirement.objects.filter(project=project), 'category_name')
+        values = requirements.order_by('status_rank', 'priority_rank', 'pk').values_list(*self.columns)
+        if start:
+            values = values[start * self.chunk_size:]
+        rows_in_chunk = 0
+        for (identifier, title, type_, status, priority, description,
+                acceptance_criteria, username, created_at, updated_at, category_name) in values.iterator(chunk_size=self.chunk_size):
+            chunk.append(writer.writerow([
+                identifier,
+                title,
+                type_display.get(type_, type_),
+                status_display.get(status, status),
+                priority_display.get(priority, priority),
+                description,
+                acceptance_criteria,
+                username or '',
+                created_at.strftime('%Y-%m-%d %H:%M'),
+                updated_at.strftime('%Y-%m-%d %H:%M'),
+                category_name or ''
+            ]))
+            rows_in_chunk += 1
+            if rows_in_chunk == self.chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+                rows_in_chunk = 0
+        if chunk:
+            yield ''.join(chunk)
+
+class ImportRequirementsView(LoginRequiredMixin, ProjectAccessMixin, FormView):
+    form_class = RequirementImportForm
+    template_name = 'requirements/requirement_import.html'
+    change = True
+    
+    def get_project(self):
+        return self.project
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['project'] = self.get_project()
+        return context
+    
+    def form_valid(self, form):
+        project = self.get_project()
+        upload = form.cleaned_data['file']
+        
+        # Decode the upload as a stream so large files are never read whole
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        result = RequirementImporter(project, user=self.request.user).run(stream, form.cleaned_data['format'])
+        
+        if result.created:
+            messages.success(self.request, f'Imported {result.created} requirements.')
+        if result.errors:
+            messages.warning(self.request, f'{result.failed} rows could not be imported.')
+        
+        return self.render_to_response(self.get_context_data(form=self.form_class(), result=result))
 
-class RequirementStatusUpdateView(LoginRequiredMixin, View):
+class RequirementStatusUpdateView(LoginRequiredMixin, RequirementAccessMixin, View):
+    change = True
+    
     def post(self, request, pk, status):
-        requirement = get_object_or_404(Requirement, pk=pk)
-        old_status = requirement.get_status_display()
+        requirement = self.get_requirement()
         
         # Validate the status is a valid option
         valid_statuses = dict(Requirement.STATUS_CHOICES)
@@ -178,111 +386,177 @@ class RequirementStatusUpdateView(LoginRequiredMixin, View):
         
         requirement.status = status
         requirement.updated_by = request.user
-        requirement.save()
-        
-        # Create history entry
-        RequirementHistory.objects.create(
-            requirement=requirement,
-            status=status,
-            changed_by=request.user,
-            notes=f"Status updated from {old_status} to {valid_statuses[status]}"
-        )
+        requirement.save(user=request.user)
         
         messages.success(request, f"Requirement status updated to {valid_statuses[status]}")
         return redirect('requirement-detail', pk=requirement.pk)
     
-class ProjectObjectiveCreateView(LoginRequiredMixin, CreateView):
+class ProjectObjectiveCreateView(LoginRequiredMixin, ProjectAccessMixin, CreateView):
     model = ProjectObjective
     fields = ['title', 'description']
     template_name = 'requirements/objective_form.html'
+    change = True
     
     def form_valid(self, form):
-        project = get_object_or_404(Project, pk=self.kwargs.get('project_id'))
-        form.instance.project = project
+        form.instance.project = self.project
         form.instance.created_by = self.request.user
         return super().form_valid(form)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['project'] = get_object_or_404(Project, pk=self.kwargs.get('project_id'))
+        context['project'] = self.project
         return context
     
     def get_success_url(self):
         return reverse('project-detail', kwargs={'pk': self.kwargs.get('project_id')})
 
-class TraceabilityMatrixView(LoginRequiredMixin, View):
+class TraceabilityMatrixView(LoginRequiredMixin, ProjectAccessMixin, ConditionalGetMixin, View):
     template_name = 'requirements/traceability_matrix.html'
     
     def get(self, request, project_id):
-        project = get_object_or_404(Project, pk=project_id)
-        objectives = project.objectives.all()
-        requirements = project.requirements.all()
+        project = self.project
+        threshold = getattr(settings, 'REQUIREMENTS_MATRIX_VIRTUAL_THRESHOLD', 500)
+        context = self.get_project_cache().get_or_set(
+            'matrix', lambda: self.get_matrix_context(project, threshold), threshold
+        )
+        return render(request, self.template_name, {**context, 'project': project, 'max_batch': MAX_BATCH_OPERATIONS})
+    
+    def get_matrix_context(self, project, threshold):
+        # Large projects get a virtual grid that loads tiles from the JSON API
+        requirement_count = project.requirements.count()
+        if requirement_count > threshold:
+            return {
+                'objectives': project.objectives.exists(),
+                'virtual': True,
+                'requirement_count': requirement_count,
+                'tile_rows': 100,
+                'tile_columns': 20,
+            }
         
-        # Group requirements by categories for better organization
-        categories = project.categories.all()
-        categorized_requirements = {}
+        matrix = TraceabilityMatrix(project)
+        return {
+            'objectives': matrix.objectives,
+            'matrix': matrix,
+            'categorized_requirements': matrix.groups(),
+            'column_totals': matrix.column_totals(),
+            'covered_requirements': matrix.covered_requirements(),
+        }
+
+class TraceabilityMatrixTileView(LoginRequiredMixin, ProjectAccessMixin, View):
+    """JSON tiles of the traceability matrix for the virtual grid"""
+    
+    def get(self, request, project_id):
+        project = self.project
+        try:
+            row_start = max(0, int(request.GET.get('row_start', 0)))
+            row_count = int(request.GET.get('row_count', MAX_TILE_ROWS))
+            column_start = max(0, int(request.GET.get('column_start', 0)))
+            column_count = int(request.GET.get('column_count', MAX_TILE_COLUMNS))
+        except ValueError:
+            return JsonResponse({'error': 'Tile bounds must be integers'}, status=400)
         
-        for category in categories:
-            categorized_requirements[category] = requirements.filter(category=category)
+        bounds = (row_start, row_count, column_start, column_count)
+        tile = caching.ProjectCache(project.pk).get_or_set('matrix-tile', lambda: load_tile(project, *bounds), *bounds)
+        return JsonResponse(tile)
+    
+class TraceabilityMatrixLinksView(LoginRequiredMixin, ProjectAccessMixin, View):
+    """
+    Apply a batch of matrix cell changes posted as JSON:
+    {"operations": [{"requirement": 1, "objective": 2, "op": "add" | "remove"}]}
+    """
+    change = True
+    
+    def post(self, request, project_id):
+        project = self.project
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Request body must be JSON'}, status=400)
         
-        # Add uncategorized requirements
-        uncategorized = requirements.filter(category__isnull=True)
-        if uncategorized.exists():
-            categorized_requirements['Uncategorized'] = uncategorized
+        try:
+            changed = apply_link_operations(project, payload.get('operations') if isinstance(payload, dict) else None)
+        except LinkOperationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
-        context = {
-            'project': project,
-            'objectives': objectives,
-            'categorized_requirements': categorized_requirements,
-        }
+        return JsonResponse({'changed': changed})
+    
+class DependencyGraphView(LoginRequiredMixin, ProjectAccessMixin, View):
+    template_name = 'requirements/dependency_graph.html'
+    
+    def get(self, request, project_id):
+        return render(request, self.template_name, {'project': self.project, 'max_nodes': graph.MAX_NODES})
+
+class DependencyGraphDataView(LoginRequiredMixin, ProjectAccessMixin, View):
+    """
+    JSON graph of a project's requirements for the dependency graph view:
+    ?kinds=related,parent&focus=<requirement id>&radius=2&max_nodes=500
+    """
+    
+    def get(self, request, project_id):
+        project = self.project
+        kinds = [kind for kind in request.GET.get('kinds', 'related,parent').split(',') if kind]
+        if not kinds or any(kind not in graph.EDGE_KINDS for kind in kinds):
+            return JsonResponse({'error': f"kinds must be a comma-separated subset of: {', '.join(graph.EDGE_KINDS)}"}, status=400)
+        try:
+            focus = int(request.GET['focus']) if request.GET.get('focus') else None
+            radius = min(max(1, int(request.GET.get('radius', 2))), 10)
+            max_nodes = min(max(1, int(request.GET.get('max_nodes', graph.MAX_NODES))), graph.MAX_NODES_LIMIT)
+        except ValueError:
+            return JsonResponse({'error': 'focus, radius and max_nodes must be integers'}, status=400)
+        
+        project_graph = graph.for_project(project.pk, kinds)
+        if focus is not None and focus not in project_graph.index:
+            return JsonResponse({'error': f"Requirement {focus} is not in this project"}, status=404)
+        return JsonResponse(graph.describe(project_graph, focus, radius, max_nodes))
+
+class RequirementImpactView(LoginRequiredMixin, RequirementAccessMixin, View):
+    """JSON of everything that depends on a requirement, directly or not: ?limit=100"""
+    
+    def get(self, request, pk):
+        requirement = self.get_requirement()
+        try:
+            limit = min(max(0, int(request.GET.get('limit', 100))), graph.MAX_NODES_LIMIT)
+        except ValueError:
+            return JsonResponse({'error': 'limit must be an integer'}, status=400)
         
-        return render(request, self.template_name, context)
+        data = impact.summary(requirement, limit)
+        return JsonResponse({
+            'requirement': requirement.pk,
+            'requirement_count': data['requirement_count'],
+            'requirements': [
+                {'id': row.id, 'identifier': row.identifier, 'title': row.title, 'status': row.status}
+                for row in data['requirements']
+            ],
+            'truncated': data['truncated'],
+            'objectives': [{'id': objective.pk, 'title': objective.title} for objective in data['objectives']],
+        })
+
+class RequirementAddObjectiveView(LoginRequiredMixin, RequirementAccessMixin, View):
+    change = True
     
-class RequirementAddObjectiveView(LoginRequiredMixin, View):
     def post(self, request, pk, objective_id):
-        requirement = get_object_or_404(Requirement, pk=pk)
+        requirement = self.get_requirement()
         objective = get_object_or_404(ProjectObjective, pk=objective_id)
         
-        # Check if the user has permission
-        if requirement.project != objective.project:
+        if requirement.project_id != objective.project_id:
             messages.error(request, "Requirement and objective must belong to the same project.")
-            return redirect('traceability-matrix', project_id=requirement.project.id)
+            return redirect('traceability-matrix', project_id=self.project.pk)
         
         # Add the objective to the requirement
         requirement.objectives.add(objective)
         
         messages.success(request, f"Requirement {requirement.identifier} linked to objective: {objective.title}")
-        return redirect('traceability-matrix', project_id=requirement.project.id)
+        return redirect('traceability-matrix', project_id=self.project.pk)
 
-class RequirementDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class RequirementDeleteView(LoginRequiredMixin, RequirementAccessMixin, UserPassesTestMixin, DeleteView):
     model = Requirement
     template_name = 'requirements/requirement_confirm_delete.html'
     
     def test_func(self):
         """
-        Check if the user is the requirement creator or an admin of the organization
+        Check if the user is the requirement or project creator or an admin of the organization
         """
-        requirement = self.get_object()
-        user = self.request.user
-        
-        # Check if user is requirement creator
-        if requirement.created_by == user:
-            return True
-            
-        # Check if user is project creator
-        if requirement.project.created_by == user:
-            return True
-            
-        # Check if user is an admin in the organization
-        if requirement.project.organization:
-            is_admin = requirement.project.organization.members.filter(
-                user=user, 
-                role='admin'
-            ).exists()
-            if is_admin:
-                return True
-                
-        return False
+        return access.can_delete_requirement(self.request.user, self.get_object())
     
     def handle_no_permission(self):
         if self.request.user.is_authenticated:
@@ -291,6 +565,6 @@ class RequirementDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView)
         return super().handle_no_permission()
         
     def get_success_url(self):
-        project_id = self.object.project.id
+        project_id = self.project.pk
         messages.success(self.request, f'Requirement "{self.object.identifier}: {self.object.title}" was deleted successfully!')
         return reverse('project-detail', kwargs={'pk': project_id})
\ No newline at end of file
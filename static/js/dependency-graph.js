@@ -0,0 +1,183 @@
+// static/js/dependency-graph.js
+// Dependency graph view. The server sends the graph already laid out in
+// levels (columns); this script only places the nodes within each column
+// and draws them as SVG. Large projects arrive clustered by top-level
+// requirement; clicking a node asks for its neighbourhood instead.
+(function() {
+    'use strict';
+
+    var SVG_NS = 'http://www.w3.org/2000/svg';
+    var COLUMN_WIDTH = 220;
+    var ROW_HEIGHT = 44;
+    var NODE_WIDTH = 170;
+    var NODE_HEIGHT = 30;
+    var MARGIN = 20;
+
+    function svgElement(name, attributes) {
+        var element = document.createElementNS(SVG_NS, name);
+        Object.keys(attributes || {}).forEach(function(key) {
+            element.setAttribute(key, attributes[key]);
+        });
+        return element;
+    }
+
+    function GraphView(card) {
+        this.card = card;
+        this.url = card.dataset.graphUrl;
+        this.detailUrl = card.dataset.detailUrl;
+        this.maxNodes = card.dataset.maxNodes;
+        this.canvas = card.querySelector('.graph-canvas');
+        this.summary = card.querySelector('.graph-summary');
+        this.focus = null;
+
+        var self = this;
+        card.querySelectorAll('.graph-kind').forEach(function(input) {
+            input.addEventListener('change', function() { self.load(); });
+        });
+        card.querySelector('.graph-reset').addEventListener('click', function() {
+            self.focus = null;
+            self.load();
+        });
+    }
+
+    GraphView.prototype.kinds = function() {
+        var kinds = [];
+        this.card.querySelectorAll('.graph-kind:checked').forEach(function(input) {
+            kinds.push(input.value);
+        });
+        return kinds;
+    };
+
+    GraphView.prototype.load = function() {
+        var kinds = this.kinds();
+        if (!kinds.length) {
+            this.canvas.textContent = '';
+            this.summary.textContent = 'Choose at least one kind of link.';
+            return;
+        }
+        var params = new URLSearchParams({kinds: kinds.join(','), max_nodes: this.maxNodes});
+        if (this.focus !== null) {
+            params.set('focus', this.focus);
+        }
+        var self = this;
+        fetch(this.url + '?' + params.toString(), {credentials: 'same-origin'})
+            .then(function(response) {
+                return response.json().then(function(data) {
+                    if (!response.ok) {
+                        throw new Error(data.error || 'Loading the graph failed');
+                    }
+                    return data;
+                });
+            })
+            .then(function(data) { self.render(data); })
+            .catch(function(error) { self.summary.textContent = error.message; });
+    };
+
+    GraphView.prototype.layout = function(nodes) {
+        // Nodes of a level share a column, in the order the server sent them
+        var rows = {};
+        var positions = {};
+        var width = 0;
+        var height = 0;
+        nodes.forEach(function(node) {
+            var row = rows[node.level] || 0;
+            rows[node.level] = row + 1;
+            var x = MARGIN + node.level * COLUMN_WIDTH;
+            var y = MARGIN + row * ROW_HEIGHT;
+            positions[node.id] = {x: x, y: y};
+            width = Math.max(width, x + NODE_WIDTH + MARGIN);
+            height = Math.max(height, y + NODE_HEIGHT + MARGIN);
+        });
+        return {positions: positions, width: width, height: height};
+    };
+
+    GraphView.prototype.render = function(data) {
+        var layout = this.layout(data.nodes);
+        var reachable = {};
+        (data.reachable || []).forEach(function(id) { reachable[id] = true; });
+
+        var svg = svgElement('svg', {width: layout.width, height: layout.height});
+        var defs = svgElement('defs');
+        var marker = svgElement('marker', {
+            id: 'graph-arrow', viewBox: '0 0 10 10', refX: 10, refY: 5,
+            markerWidth: 6, markerHeight: 6, orient: 'auto-start-reverse'
+        });
+        marker.appendChild(svgElement('path', {d: 'M 0 0 L 10 5 L 0 10 z', fill: '#6c757d'}));
+        defs.appendChild(marker);
+        svg.appendChild(defs);
+
+        data.edges.forEach(function(edge) {
+            var source = layout.positions[edge[0]];
+            var target = layout.positions[edge[1]];
+            var line = svgElement('line', {
+                x1: source.x + NODE_WIDTH, y1: source.y + NODE_HEIGHT / 2,
+                x2: target.x, y2: target.y + NODE_HEIGHT / 2,
+                stroke: edge[2] === 'parent' ? '#adb5bd' : '#6c757d',
+                'stroke-dasharray': edge[2] === 'parent' ? '4 3' : '',
+                'stroke-width': edge.length > 3 ? Math.min(1 + Math.log2(edge[3]), 6) : 1,
+                'marker-end': 'url(#graph-arrow)'
+            });
+            if (source.x >= target.x) {
+                // Edges within a cycle point backwards; start them from the left side
+                line.setAttribute('x1', source.x);
+                line.setAttribute('x2', target.x + NODE_WIDTH);
+            }
+            svg.appendChild(line);
+        });
+
+        var self = this;
+        data.nodes.forEach(function(node) {
+            var position = layout.positions[node.id];
+            var group = svgElement('g', {transform: 'translate(' + position.x + ',' + position.y + ')'});
+            group.style.cursor = 'pointer';
+            var fill = node.id === data.focus ? '#cfe2ff' : (reachable[node.id] ? '#fff3cd' : '#ffffff');
+            group.appendChild(svgElement('rect', {
+                width: NODE_WIDTH, height: NODE_HEIGHT, rx: 4,
+                fill: fill, stroke: node.cyclic ? '#dc3545' : '#6c757d',
+                'stroke-width': node.cyclic ? 2 : 1
+            }));
+            var label = svgElement('text', {x: 8, y: NODE_HEIGHT / 2 + 4, 'font-size': 12});
+            label.textContent = node.identifier + (node.size > 1 ? ' (+' + (node.size - 1) + ')' : '');
+            group.appendChild(label);
+            var title = svgElement('title');
+            title.textContent = node.identifier + ' - ' + node.title + ' [' + node.status + ']';
+            group.appendChild(title);
+
+            group.addEventListener('click', function() {
+                self.focus = node.id;
+                self.load();
+            });
+            group.addEventListener('dblclick', function() {
+                window.location = self.detailUrl.replace(/0\/$/, node.id + '/');
+            });
+            svg.appendChild(group);
+        });
+
+        this.canvas.textContent = '';
+        this.canvas.appendChild(svg);
+        this.summarize(data);
+    };
+
+    GraphView.prototype.summarize = function(data) {
+        var parts = [data.node_count + ' requirements, ' + data.edge_count + ' links'];
+        if (data.mode === 'clusters') {
+            parts.push('grouped by top-level requirement');
+        } else if (data.mode === 'focus') {
+            parts.push('showing ' + data.nodes.length + ' around the selected requirement, which leads to ' + data.reachable.length);
+        }
+        if (data.truncated) {
+            parts.push('not everything is shown');
+        }
+        if (data.cycles.length) {
+            parts.push(data.cycles.length + ' dependency cycle' + (data.cycles.length === 1 ? '' : 's'));
+        }
+        this.summary.textContent = parts.join('; ') + '.';
+    };
+
+    document.addEventListener('DOMContentLoaded', function() {
+        var card = document.getElementById('dependency-graph');
+        if (card) {
+            new GraphView(card).load();
+        }
+    });
+})();
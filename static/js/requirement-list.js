@@ -0,0 +1,54 @@
+// static/js/requirement-list.js
+// Status tabs on the requirement list fetch their first page of rows the
+// first time they are shown; "Load more" appends the next keyset page.
+(function() {
+    'use strict';
+
+    function loadRows(tbody, url, append) {
+        return fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.text();
+            })
+            .then(function(html) {
+                if (append) {
+                    tbody.insertAdjacentHTML('beforeend', html);
+                } else {
+                    tbody.innerHTML = html;
+                }
+            })
+            .catch(function() {
+                tbody.insertAdjacentHTML('beforeend',
+                    '<tr><td colspan="7" class="text-center text-danger">Could not load requirements.</td></tr>');
+            });
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('a[data-bs-toggle="tab"][data-rows-url]').forEach(function(tab) {
+            tab.addEventListener('shown.bs.tab', function() {
+                var pane = document.querySelector(tab.getAttribute('href'));
+                var tbody = pane && pane.querySelector('tbody[data-lazy-rows]');
+                if (!tbody || tbody.dataset.loaded) {
+                    return;
+                }
+                tbody.dataset.loaded = 'true';
+                loadRows(tbody, tab.dataset.rowsUrl, false);
+            });
+        });
+
+        document.addEventListener('click', function(event) {
+            var button = event.target.closest('tr.load-more button[data-rows-url]');
+            if (!button) {
+                return;
+            }
+            var row = button.closest('tr');
+            var tbody = row.parentNode;
+            button.disabled = true;
+            loadRows(tbody, button.dataset.rowsUrl, true).then(function() {
+                row.remove();
+            });
+        });
+    });
+})();
@@ -0,0 +1,357 @@
+// static/js/traceability-matrix.js
+// Traceability matrix editing. Cell changes are collected locally and sent
+// to the batch link endpoint in as few requests as its batch limit allows;
+// only the changed cells are updated afterwards. Large projects use a virtual-scrolling grid that
+// fetches only the tiles intersecting the viewport.
+(function() {
+    'use strict';
+
+    function cellKey(requirementId, objectiveId) {
+        return requirementId + ':' + objectiveId;
+    }
+
+    // Pending add/remove operations plus the save button that submits them
+    function LinkEditor(card, onChanged) {
+        this.url = card.dataset.linksUrl;
+        this.maxBatch = parseInt(card.dataset.maxBatch, 10) || 1000;
+        this.csrfToken = card.querySelector('input[name=csrfmiddlewaretoken]').value;
+        this.button = card.querySelector('.matrix-save');
+        this.status = card.querySelector('.matrix-status');
+        this.pending = {};
+        this.onChanged = onChanged;
+
+        var self = this;
+        this.button.addEventListener('click', function() { self.save(); });
+    }
+
+    LinkEditor.prototype.toggle = function(requirementId, objectiveId, linked, wanted) {
+        var key = cellKey(requirementId, objectiveId);
+        if (linked === wanted) {
+            delete this.pending[key];
+        } else {
+            this.pending[key] = {requirement: requirementId, objective: objectiveId, op: wanted ? 'add' : 'remove'};
+        }
+        var count = Object.keys(this.pending).length;
+        this.button.disabled = count === 0;
+        this.status.textContent = count ? count + ' unsaved change' + (count === 1 ? '' : 's') : '';
+    };
+
+    LinkEditor.prototype.wanted = function(requirementId, objectiveId, linked) {
+        var operation = this.pending[cellKey(requirementId, objectiveId)];
+        return operation ? operation.op === 'add' : linked;
+    };
+
+    // Batches are sent one after another; each saved batch leaves the pending
+    // set, so a failure keeps only the unsaved operations for a retry
+    LinkEditor.prototype.save = function() {
+        var keys = Object.keys(this.pending);
+        var self = this;
+        this.button.disabled = true;
+
+        function sendFrom(start) {
+            if (start >= keys.length) {
+                self.status.textContent = 'Saved';
+                return;
+            }
+            var batch = keys.slice(start, start + self.maxBatch);
+            fetch(self.url, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: {'Content-Type': 'application/json', 'X-CSRFToken': self.csrfToken},
+                body: JSON.stringify({operations: batch.map(function(key) { return self.pending[key]; })})
+            })
+                .then(function(response) {
+                    return response.json().then(function(data) {
+                        if (!response.ok) {
+                            throw new Error(data.error || 'Saving failed');
+                        }
+                        return data;
+                    });
+                })
+                .then(function(data) {
+                    batch.forEach(function(key) { delete self.pending[key]; });
+                    self.onChanged(data.changed);
+                    sendFrom(start + batch.length);
+                })
+                .catch(function(error) {
+                    self.button.disabled = false;
+                    self.status.textContent = error.message;
+                });
+        }
+        sendFrom(0);
+    };
+
+    // Server-rendered table: one checkbox per cell
+    function TableMatrix(card) {
+        var self = this;
+        this.card = card;
+        this.editor = new LinkEditor(card, function(changed) { self.applyChanges(changed); });
+        card.addEventListener('change', function(event) {
+            var input = event.target;
+            if (input.classList.contains('matrix-link')) {
+                self.editor.toggle(input.dataset.requirement, input.dataset.objective,
+                    input.dataset.linked === '1', input.checked);
+            }
+        });
+    }
+
+    TableMatrix.prototype.adjust = function(selector, delta) {
+        var element = this.card.querySelector(selector);
+        if (element) {
+            element.textContent = parseInt(element.textContent, 10) + delta;
+        }
+    };
+
+    TableMatrix.prototype.applyChanges = function(changed) {
+        changed.forEach(function(cell) {
+            var input = this.card.querySelector(
+                '.matrix-link[data-requirement="' + cell.requirement + '"][data-objective="' + cell.objective + '"]');
+            if (input) {
+                input.dataset.linked = cell.linked ? '1' : '0';
+                input.checked = cell.linked;
+            }
+            this.adjust('[data-coverage="' + cell.requirement + '"]', cell.linked ? 1 : -1);
+            this.adjust('[data-total="' + cell.objective + '"]', cell.linked ? 1 : -1);
+        }, this);
+    };
+
+    var ROW_HEIGHT = 32;
+    var LABEL_WIDTH = 320;
+    var CELL_WIDTH = 120;
+    var COVERAGE_WIDTH = 90;
+
+    function VirtualMatrix(card, grid) {
+        var self = this;
+        this.editor = new LinkEditor(card, function(changed) { self.applyChanges(changed); });
+        this.grid = grid;
+        this.canvas = grid.querySelector('.matrix-canvas');
+        this.tileUrl = grid.dataset.tileUrl;
+        this.detailUrl = grid.dataset.detailUrl;
+        this.tileRows = parseInt(grid.dataset.tileRows, 10);
+        this.tileColumns = parseInt(grid.dataset.tileColumns, 10);
+        this.tiles = {};
+        this.headers = [];
+        this.headerLines = [];
+        this.totalRows = 0;
+        this.totalColumns = 0;
+        this.frame = null;
+
+        grid.addEventListener('scroll', function() { self.schedule(); });
+        window.addEventListener('resize', function() { self.schedule(); });
+        this.fetchTile(0, 0);
+    }
+
+    VirtualMatrix.prototype.fetchTile = function(rowTile, columnTile) {
+        var key = rowTile + ':' + columnTile;
+        if (this.tiles[key]) {
+            return;
+        }
+        this.tiles[key] = 'pending';
+
+        var params = new URLSearchParams({
+            row_start: rowTile * this.tileRows,
+            row_count: this.tileRows,
+            column_start: columnTile * this.tileColumns,
+            column_count: this.tileColumns
+        });
+        var self = this;
+        fetch(this.tileUrl + '?' + params.toString(), {credentials: 'same-origin'})
+            .then(function(response) { return response.json(); })
+            .then(function(tile) {
+                tile.masks = tile.rows.map(function(row) { return BigInt('0x' + row.bits); });
+                self.tiles[key] = tile;
+                if (rowTile === 0 && columnTile === 0) {
+                    self.layout(tile);
+                }
+                self.schedule();
+            })
+            .catch(function() { delete self.tiles[key]; });
+    };
+
+    // Each category section takes one line for its header plus one per row
+    VirtualMatrix.prototype.layout = function(tile) {
+        var line = 0;
+        this.headers = tile.headers;
+        this.headerLines = tile.headers.map(function(header) {
+            var headerLine = line;
+            line += header.count + 1;
+            return headerLine;
+        });
+        this.totalLines = line;
+        this.totalRows = tile.headers.reduce(function(sum, header) { return sum + header.count; }, 0);
+        this.totalColumns = tile.total_columns;
+        this.canvas.style.height = ((this.totalLines + 1) * ROW_HEIGHT) + 'px';
+        this.canvas.style.width = (LABEL_WIDTH + this.totalColumns * CELL_WIDTH + COVERAGE_WIDTH) + 'px';
+    };
+
+    // Returns {section: i} for a category header line or {row: n} for a requirement
+    VirtualMatrix.prototype.lineAt = function(line) {
+        var low = 0;
+        var high = this.headerLines.length - 1;
+        while (low < high) {
+            var middle = (low + high + 1) >> 1;
+            if (this.headerLines[middle] <= line) {
+                low = middle;
+            } else {
+                high = middle - 1;
+            }
+        }
+        if (this.headerLines[low] === line) {
+            return {section: low};
+        }
+        return {row: this.headers[low].start + (line - this.headerLines[low] - 1)};
+    };
+
+    VirtualMatrix.prototype.schedule = function() {
+        var self = this;
+        if (this.frame === null) {
+            this.frame = window.requestAnimationFrame(function() {
+                self.frame = null;
+                self.render();
+            });
+        }
+    };
+
+    VirtualMatrix.prototype.cellTile = function(row, column) {
+        var tile = this.tiles[Math.floor(row / this.tileRows) + ':' + Math.floor(column / this.tileColumns)];
+        return tile && tile !== 'pending' ? tile : null;
+    };
+
+    VirtualMatrix.prototype.rowInfo = function(row) {
+        var tile = this.cellTile(row, 0);
+        return tile ? tile.rows[row - tile.row_start] : null;
+    };
+
+    VirtualMatrix.prototype.element = function(className, left, top, width, text) {
+        var element = document.createElement('div');
+        element.className = className;
+        element.style.left = left + 'px';
+        element.style.top = top + 'px';
+        element.style.width = width + 'px';
+        if (text !== undefined) {
+            element.textContent = text;
+            element.title = text;
+        }
+        this.canvas.appendChild(element);
+        return element;
+    };
+
+    VirtualMatrix.prototype.render = function() {
+        if (!this.totalLines) {
+            return;
+        }
+        var scrollTop = this.grid.scrollTop;
+        var scrollLeft = this.grid.scrollLeft;
+        var firstLine = Math.floor(scrollTop / ROW_HEIGHT);
+        var lastLine = Math.min(this.totalLines - 1, Math.ceil((scrollTop + this.grid.clientHeight) / ROW_HEIGHT));
+        var firstColumn = Math.max(0, Math.floor((scrollLeft - LABEL_WIDTH) / CELL_WIDTH));
+        var lastColumn = Math.min(this.totalColumns - 1, Math.ceil((scrollLeft + this.grid.clientWidth) / CELL_WIDTH));
+
+        this.canvas.textContent = '';
+
+        var line;
+        var column;
+        for (line = firstLine; line <= lastLine; line++) {
+            var position = this.lineAt(line);
+            var top = (line + 1) * ROW_HEIGHT;
+            if (position.section !== undefined) {
+                this.element('matrix-section', 0, top, parseInt(this.canvas.style.width, 10), this.headers[position.section].name);
+                continue;
+            }
+
+            var row = position.row;
+            for (column = firstColumn; column <= lastColumn; column++) {
+                this.fetchTile(Math.floor(row / this.tileRows), Math.floor(column / this.tileColumns));
+                this.renderCell(row, column, top);
+            }
+
+            // Row labels come from the first column of tiles
+            this.fetchTile(Math.floor(row / this.tileRows), 0);
+            var info = this.rowInfo(row);
+            var label = this.element('matrix-label', scrollLeft, top, LABEL_WIDTH);
+            if (info) {
+                var link = document.createElement('a');
+                link.href = this.detailUrl.replace('/0/', '/' + info.id + '/');
+                link.textContent = info.identifier + ' - ' + info.title;
+                label.title = link.textContent;
+                label.appendChild(link);
+                this.element('matrix-cell', LABEL_WIDTH + this.totalColumns * CELL_WIDTH, top, COVERAGE_WIDTH, String(info.coverage));
+            }
+        }
+
+        this.element('matrix-heading', scrollLeft, scrollTop, LABEL_WIDTH, 'Requirements');
+        for (column = firstColumn; column <= lastColumn; column++) {
+            // Column titles and totals come from the first row of tiles
+            this.fetchTile(0, Math.floor(column / this.tileColumns));
+            var tile = this.cellTile(0, column);
+            var objective = tile ? tile.columns[column - tile.column_start] : null;
+            this.element('matrix-heading', LABEL_WIDTH + column * CELL_WIDTH, scrollTop, CELL_WIDTH,
+                objective ? objective.title + ' (' + objective.total + ')' : '');
+        }
+    };
+
+    VirtualMatrix.prototype.renderCell = function(row, column, top) {
+        var tile = this.cellTile(row, column);
+        var cell = this.element('matrix-cell', LABEL_WIDTH + column * CELL_WIDTH, top, CELL_WIDTH);
+        if (!tile) {
+            return;
+        }
+        var info = tile.rows[row - tile.row_start];
+        var objective = tile.columns[column - tile.column_start];
+        if (!info || !objective) {
+            return;
+        }
+        var linked = Boolean((tile.masks[row - tile.row_start] >> BigInt(column - tile.column_start)) & 1n);
+        var wanted = this.editor.wanted(info.id, objective.id, linked);
+        cell.innerHTML = wanted
+            ? '<span class="text-success"><i class="bi bi-check-lg"></i></span>'
+            : '<i class="bi bi-plus text-muted"></i>';
+        if (wanted !== linked) {
+            cell.classList.add('table-warning');
+        }
+        var self = this;
+        cell.addEventListener('click', function() {
+            self.editor.toggle(info.id, objective.id, linked, !wanted);
+            self.schedule();
+        });
+    };
+
+    // Patch the loaded tiles in place instead of refetching them
+    VirtualMatrix.prototype.applyChanges = function(changed) {
+        Object.keys(this.tiles).forEach(function(key) {
+            var tile = this.tiles[key];
+            if (tile === 'pending') {
+                return;
+            }
+            changed.forEach(function(cell) {
+                var delta = cell.linked ? 1 : -1;
+                var rowIndex = tile.rows.findIndex(function(row) { return row.id === cell.requirement; });
+                var columnIndex = tile.columns.findIndex(function(column) { return column.id === cell.objective; });
+                if (rowIndex >= 0 && columnIndex >= 0) {
+                    var bit = 1n << BigInt(columnIndex);
+                    tile.masks[rowIndex] = cell.linked ? tile.masks[rowIndex] | bit : tile.masks[rowIndex] & ~bit;
+                }
+                if (rowIndex >= 0 && tile.column_start === 0) {
+                    tile.rows[rowIndex].coverage += delta;
+                }
+                if (columnIndex >= 0 && tile.row_start === 0) {
+                    tile.columns[columnIndex].total += delta;
+                }
+            });
+        }, this);
+        this.schedule();
+    };
+
+    document.addEventListener('DOMContentLoaded', function() {
+        var card = document.getElementById('matrix');
+        if (!card) {
+            return;
+        }
+        var grid = document.getElementById('matrix-grid');
+        if (grid) {
+            new VirtualMatrix(card, grid);
+        } else {
+            new TableMatrix(card);
+        }
+    });
+})();